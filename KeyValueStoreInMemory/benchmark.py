@@ -0,0 +1,383 @@
+"""
+Benchmarks for InMemoryKVStore.
+
+To run, python3 -m KeyValueStoreInMemory.benchmark [name ...] command from one level above
+KeyValueStoreInMemory folder. Without a name every benchmark runs.
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from KeyValueStoreInMemory.client import AsyncKVClient
+from KeyValueStoreInMemory.server import KVServer
+from KeyValueStoreInMemory.store import InMemoryKVStore
+
+
+def run_threads(num_threads: int, worker) -> float:
+    # Start all workers together and return the wall time until the last one finishes
+    barrier = threading.Barrier(num_threads + 1)
+
+    def target(thread_index):
+        barrier.wait()
+        worker(thread_index)
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def bench_contention(thread_counts=(1, 2, 4, 8, 16, 32), shard_counts=(1, 16, 64), ops_per_thread=20_000):
+    """Write-heavy mix (50% put, 50% get) across thread counts, single lock vs sharded."""
+    print("--- contention: 50% put / 50% get ---")
+    for num_shards in shard_counts:
+        for num_threads in thread_counts:
+            kv = InMemoryKVStore(num_shards=num_shards)
+
+            def worker(thread_index):
+                keys = [f"t{thread_index}-k{i % 1000}" for i in range(ops_per_thread)]
+                for i, key in enumerate(keys):
+                    if i & 1:
+                        kv.get(key)
+                    else:
+                        kv.put(key, "v", 60_000)
+
+            elapsed = run_threads(num_threads, worker)
+            kv.stop()
+            total_ops = num_threads * ops_per_thread
+            print(f"shards={num_shards:>3} threads={num_threads:>3} {total_ops / elapsed:>12,.0f} ops/s")
+
+
+def bench_expiry(num_puts=500_000, hot_keys=100):
+    """Hot keys rewritten with a long TTL: put rate and expiry structure size per backend."""
+    print("--- expiry backends: hot key rewrites ---")
+    for backend in ("heap", "timing_wheel"):
+        kv = InMemoryKVStore(expiry_backend=backend)
+        keys = [f"hot-{i % hot_keys}" for i in range(num_puts)]
+        start = time.perf_counter()
+        for key in keys:
+            kv.put(key, "v", 3_600_000)
+        elapsed = time.perf_counter() - start
+        kv.stop()
+        entries = sum(len(shard.expiry) for shard in kv.shards)
+        print(f"{backend:>12}: {num_puts / elapsed:>12,.0f} puts/s, {entries:>9,} expiry entries for {len(kv):,} keys")
+
+
+def bench_cleanup(num_keys=500_000, ttl_ms=200):
+    """Mass expiry: worst get() latency seen by a reader while the sweep runs, full vs incremental."""
+    print("--- cleanup: mass expiry ---")
+    for budget_ms in (None, 2):
+        kv = InMemoryKVStore(cleanup_interval=0.05, cleanup_budget_ms=budget_ms)
+        for i in range(num_keys):
+            kv.put(f"k{i}", "v", ttl_ms)
+        kv.put("live", "v", 60_000)
+
+        worst_get_ms = 0.0
+        while len(kv) > 1:
+            start = time.perf_counter()
+            kv.get("live")
+            worst_get_ms = max(worst_get_ms, (time.perf_counter() - start) * 1000)
+            time.sleep(0.0001)
+        kv.stop()
+        mode = "full" if budget_ms is None else f"incremental {budget_ms}ms"
+        print(f"{mode:>18}: worst get {worst_get_ms:8.3f} ms, {kv.cleanup_stats}")
+
+
+def bench_eviction(num_ops=300_000, keyspace=100_000, capacity=2_000):
+    """Read-through cache on a skewed key distribution: hit ratio and throughput per policy."""
+    print("--- eviction: cache holding a fraction of a skewed keyspace ---")
+    rng = random.Random(42)
+    keys = [f"k{int(rng.paretovariate(0.3)) % keyspace}" for _ in range(num_ops)]
+    for policy in ("lru", "lfu", "volatile-ttl"):
+        kv = InMemoryKVStore(max_keys=capacity, eviction_policy=policy)
+        start = time.perf_counter()
+        for key in keys:
+            if kv.get(key) is None:
+                kv.put(key, "value-from-database", 600_000)
+        elapsed = time.perf_counter() - start
+        kv.stop()
+        stats = kv.stats()
+        print(f"{policy:>12}: hit ratio {stats['hit_ratio']:.3f}, {stats['evictions']:>8,} evictions, "
+              f"{num_ops / elapsed:>10,.0f} ops/s")
+
+
+def bench_batch(batch_size=200, rounds=2_000, num_shards=16):
+    """get_many / put_many against looping over get / put."""
+    print(f"--- batch: {batch_size} keys per request, {num_shards} shards ---")
+    kv = InMemoryKVStore(num_shards=num_shards)
+    batches = [[f"user:{(r * batch_size + i) % 50_000}" for i in range(batch_size)] for r in range(rounds)]
+    total = batch_size * rounds
+
+    start = time.perf_counter()
+    for keys in batches:
+        for key in keys:
+            kv.put(key, "v", 60_000)
+    loop_put = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for keys in batches:
+        kv.put_many([(key, "v") for key in keys], 60_000)
+    batch_put = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for keys in batches:
+        [kv.get(key) for key in keys]
+    loop_get = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for keys in batches:
+        kv.get_many(keys)
+    batch_get = time.perf_counter() - start
+    kv.stop()
+
+    print(f"put loop {total / loop_put:>12,.0f} keys/s | put_many {total / batch_put:>12,.0f} keys/s")
+    print(f"get loop {total / loop_get:>12,.0f} keys/s | get_many {total / batch_get:>12,.0f} keys/s")
+
+
+def bench_aof(num_threads=8, puts_per_thread=5_000):
+    """put throughput with the append-only file off and under each fsync policy."""
+    print(f"--- aof: {num_threads} writer threads ---")
+    with tempfile.TemporaryDirectory() as directory:
+        for fsync in (None, "never", "everysec", "always"):
+            path = os.path.join(directory, f"{fsync}.aof")
+            kv = InMemoryKVStore(num_shards=16, aof_path=path if fsync else None, aof_fsync=fsync or "everysec")
+
+            def worker(thread_index):
+                for i in range(puts_per_thread):
+                    kv.put(f"t{thread_index}-k{i}", "value", 60_000)
+
+            elapsed = run_threads(num_threads, worker)
+            kv.stop()
+            print(f"{fsync or 'off':>9}: {num_threads * puts_per_thread / elapsed:>10,.0f} puts/s")
+
+
+def bench_snapshot(num_keys=300_000):
+    """Warm start: AOF replay vs mmap snapshot (time to first get and to full hydration)."""
+    print(f"--- snapshot: warm start with {num_keys:,} keys ---")
+    with tempfile.TemporaryDirectory() as directory:
+        aof_path = os.path.join(directory, "store.aof")
+        snapshot_path = os.path.join(directory, "store.snap")
+        kv = InMemoryKVStore(num_shards=16, aof_path=aof_path, aof_fsync="never")
+        kv.put_many([(f"key:{i}", f"value-{i}" * 4) for i in range(num_keys)])
+        start = time.perf_counter()
+        kv.save_snapshot(snapshot_path)
+        print(f"save_snapshot  {time.perf_counter() - start:8.3f} s, {os.path.getsize(snapshot_path):,} bytes")
+        kv.stop()
+
+        start = time.perf_counter()
+        kv = InMemoryKVStore(num_shards=16, aof_path=aof_path)
+        kv.get("key:12345")
+        print(f"aof replay     {time.perf_counter() - start:8.3f} s to first get")
+        kv.stop()
+
+        start = time.perf_counter()
+        kv = InMemoryKVStore(num_shards=16, snapshot_path=snapshot_path)
+        kv.get("key:12345")
+        print(f"snapshot mmap  {time.perf_counter() - start:8.3f} s to first get")
+        kv._hydrated.wait()
+        print(f"               {time.perf_counter() - start:8.3f} s until every key is in memory")
+        kv.stop()
+
+
+def _serve(ready):
+    # Server process for bench_server, reports its port through the queue
+    async def main():
+        store = InMemoryKVStore(num_shards=16)
+        server = KVServer(store, port=0)
+        await server.start()
+        ready.put(server.port)
+        await server.serve_forever()
+    asyncio.run(main())
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _load(port: int, concurrency: int, requests_per_task: int, depth: int):
+    client = AsyncKVClient("127.0.0.1", port, pool_size=concurrency)
+    latencies = []
+
+    async def task(task_index):
+        for i in range(0, requests_per_task, depth):
+            commands = []
+            for j in range(depth):
+                key = f"key:{task_index}:{(i + j) % 100}"
+                commands.append(("SET", key, "value") if (i + j) % 5 == 0 else ("GET", key))
+            start = time.perf_counter()
+            await client.pipeline(commands)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(task(t) for t in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return concurrency * requests_per_task / elapsed, latencies
+
+
+def bench_server(concurrency=32, requests_per_task=2_000):
+    """Load generator against the asyncio server on localhost: 80% GET / 20% SET."""
+    print(f"--- server: {concurrency} concurrent clients on localhost ---")
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(ready,), daemon=True)
+    process.start()
+    port = ready.get()
+    try:
+        for depth in (1, 16, 64):
+            throughput, latencies = asyncio.run(_load(port, concurrency, requests_per_task, depth))
+            print(f"pipeline depth {depth:>3}: {throughput:>10,.0f} commands/s, "
+                  f"p50 {percentile(latencies, 0.50):7.3f} ms, p99 {percentile(latencies, 0.99):7.3f} ms per round trip")
+    finally:
+        process.terminate()
+
+
+def bench_clock(num_ops=500_000):
+    """Per-operation cost of the clock on get / put: time.time(), monotonic_ns, cached coarse clock."""
+    print("--- clock: get + put per operation ---")
+    keys = [f"k{i % 10_000}" for i in range(num_ops)]
+    baseline = None
+    for source, resolution_ms in (("wall", None), ("monotonic", None), ("monotonic", 1)):
+        kv = InMemoryKVStore(clock_source=source, clock_resolution_ms=resolution_ms)
+        start = time.perf_counter()
+        for key in keys:
+            kv.put(key, "v", 60_000)
+            kv.get(key)
+        per_op_ns = (time.perf_counter() - start) / (2 * num_ops) * 1e9
+        kv.stop()
+        baseline = baseline or per_op_ns
+        label = f"{source}, {'cached ' + str(resolution_ms) + 'ms' if resolution_ms else 'read every call'}"
+        print(f"{label:>28}: {per_op_ns:7.0f} ns/op ({per_op_ns - baseline:+5.0f} ns vs time.time(), less is faster)")
+
+
+def bench_memory(num_keys=500_000):
+    """Bytes per key held by the store (keys and values excluded), tuple dict vs compact columns."""
+    print("--- memory: tracemalloc bytes per key, keys and values not counted ---")
+    keys = [f"user:{i}" for i in range(num_keys)]
+    values = [f"v{i}" for i in range(num_keys)]
+    for ttl in (None, 60_000):
+        for backend in ("heap", "timing_wheel"):
+            results = []
+            for compact in (False, True):
+                kv = InMemoryKVStore(expiry_backend=backend, compact=compact)
+                tracemalloc.start()
+                before = tracemalloc.get_traced_memory()[0]
+                for key, value in zip(keys, values):
+                    kv.put(key, value, ttl)
+                used = tracemalloc.get_traced_memory()[0] - before
+                tracemalloc.stop()
+                kv.stop()
+                results.append(used / num_keys)
+            label = f"{'no ttl' if ttl is None else 'ttl'}, {backend}"
+            print(f"{label:>20}: {results[0]:6.1f} B/key -> compact {results[1]:6.1f} B/key "
+                  f"({1 - results[1] / results[0]:.0%} less)")
+    del keys, values
+
+
+def bench_readers(thread_counts=(1, 2, 4, 8, 16, 32), ops_per_thread=20_000, num_keys=10_000):
+    """95% get / 5% put across thread counts, shard lock on every get vs read_optimized lock-free gets."""
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"--- readers: 95% get / 5% put, {sys.version.split()[0]}, GIL {'enabled' if gil_enabled else 'disabled'} ---")
+    for num_shards in (1, 16):
+        for num_threads in thread_counts:
+            results = []
+            for read_optimized in (False, True):
+                kv = InMemoryKVStore(num_shards=num_shards, read_optimized=read_optimized)
+                for i in range(num_keys):
+                    kv.put(f"k{i}", "v", 60_000)
+
+                def worker(thread_index):
+                    rng = random.Random(thread_index)
+                    keys = [f"k{rng.randrange(num_keys)}" for _ in range(ops_per_thread)]
+                    for i, key in enumerate(keys):
+                        if i % 20 == 0:
+                            kv.put(key, "v", 60_000)
+                        else:
+                            kv.get(key)
+
+                elapsed = run_threads(num_threads, worker)
+                kv.stop()
+                results.append(num_threads * ops_per_thread / elapsed)
+            print(f"shards={num_shards:>3} threads={num_threads:>3} locked {results[0]:>12,.0f} ops/s   "
+                  f"read_optimized {results[1]:>12,.0f} ops/s ({results[1] / results[0]:.2f}x)")
+
+    if gil_enabled:
+        # Threads only run gets in parallel without the GIL; rerun on a free-threaded build if one is installed
+        for name in ("python3.14t", "python3.13t"):
+            interpreter = shutil.which(name)
+            if interpreter is not None:
+                subprocess.run([interpreter, "-m", "KeyValueStoreInMemory.benchmark", "readers"], check=False)
+                break
+        else:
+            print("no free-threaded CPython (python3.13t / python3.14t) found, skipped")
+
+
+def bench_notifications(num_puts=200_000):
+    """put cost with no subscriber, a fast subscriber, and a slow one that drops or blocks."""
+    print("--- notifications: put with keyspace subscribers ---")
+    keys = [f"k{i % 10_000}" for i in range(num_puts)]
+    baseline = None
+    for label, overflow, delay in (("no subscriber", None, 0), ("fast", "drop", 0),
+                                   ("slow, drop", "drop", 0.05), ("slow, block", "block", 0.05)):
+        kv = InMemoryKVStore()
+        received = 0
+        subscription = None
+        if overflow is not None:
+            subscription = kv.subscribe(capacity=10_000, overflow=overflow)
+            kv.notifier.max_pending = 50_000
+
+            def consume():
+                nonlocal received
+                while True:
+                    batch = subscription.get_batch()
+                    if not batch and subscription.closed:
+                        return
+                    received += len(batch)
+                    time.sleep(delay)
+
+            consumer = threading.Thread(target=consume, daemon=True)
+            consumer.start()
+        start = time.perf_counter()
+        for key in keys:
+            kv.put(key, "v")
+        per_put_ns = (time.perf_counter() - start) / num_puts * 1e9
+        kv.stop()
+        if subscription is not None:
+            consumer.join()
+        baseline = baseline or per_put_ns
+        dropped = subscription.dropped if subscription is not None else 0
+        print(f"{label:>14}: {per_put_ns:6.0f} ns/put ({per_put_ns - baseline:+5.0f} ns), "
+              f"received {received:>7,}, dropped {dropped:>7,}")
+
+
+BENCHMARKS = {
+    "contention": bench_contention,
+    "expiry": bench_expiry,
+    "cleanup": bench_cleanup,
+    "eviction": bench_eviction,
+    "batch": bench_batch,
+    "aof": bench_aof,
+    "snapshot": bench_snapshot,
+    "server": bench_server,
+    "clock": bench_clock,
+    "memory": bench_memory,
+    "readers": bench_readers,
+    "notifications": bench_notifications,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(BENCHMARKS):
+        BENCHMARKS[name]()
@@ -0,0 +1,99 @@
+"""
+asyncio client for KVServer with a connection pool and pipelining.
+
+    client = AsyncKVClient("127.0.0.1", 6380, pool_size=8)
+    await client.set("key", "value", px=5000)
+    await client.get("key")
+    await client.pipeline([("GET", "a"), ("GET", "b"), ("SET", "c", "1")])
+    await client.close()
+"""
+import asyncio
+
+from KeyValueStoreInMemory.resp import ResponseError, encode_command, read_reply
+
+
+class Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+
+    async def execute_many(self, commands: list[tuple]) -> list:
+        # One write for all commands, then read the replies in order
+        self.writer.write(b"".join(encode_command(*command) for command in commands))
+        await self.writer.drain()
+        return [await read_reply(self.reader) for _ in commands]
+
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncKVClient:
+    def __init__(self, host: str = "127.0.0.1", port: int = 6380, pool_size: int = 8):
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.idle = asyncio.Queue() # connections ready for use
+        self.opened = 0
+
+
+    async def _acquire(self) -> Connection:
+        if self.idle.empty() and self.opened < self.pool_size:
+            self.opened += 1
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                self.opened -= 1
+                raise
+            return Connection(reader, writer)
+        return await self.idle.get()
+
+
+    async def pipeline(self, commands: list[tuple]) -> list:
+        # Replies in command order; a -ERR reply comes back as a ResponseError instance
+        connection = await self._acquire()
+        try:
+            replies = await connection.execute_many(commands)
+        except Exception:
+            # The stream may be half read, do not hand it out again
+            connection.close()
+            self.opened -= 1
+            raise
+        self.idle.put_nowait(connection)
+        return replies
+
+
+    async def execute(self, *command):
+        (reply,) = await self.pipeline([command])
+        if isinstance(reply, ResponseError):
+            raise reply
+        return reply
+
+
+    async def ping(self) -> str:
+        return await self.execute("PING")
+
+
+    async def get(self, key: str) -> str | None:
+        return await self.execute("GET", key)
+
+
+    async def set(self, key: str, value: str, px: int | None = None):
+        if px is None:
+            return await self.execute("SET", key, value)
+        return await self.execute("SET", key, value, "PX", px)
+
+
+    async def delete(self, *keys: str) -> int:
+        return await self.execute("DEL", *keys)
+
+
+    async def mget(self, keys: list[str]) -> list[str | None]:
+        return await self.execute("MGET", *keys)
+
+
+    async def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+        self.opened = 0
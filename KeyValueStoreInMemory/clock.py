@@ -0,0 +1,60 @@
+"""
+Millisecond clock used for every expiry check in InMemoryKVStore.
+
+source          "monotonic" (default) never jumps when the wall clock is changed (NTP, DST, manual),
+                "wall" is int(time.time() * 1000), what the store read before this clock
+resolution_ms   None reads the source on every call. A number starts a daemon thread that refreshes
+                clock.now_ms at that resolution, so the hot path is a plain attribute read.
+                Expiry then becomes accurate to +- resolution_ms.
+
+Expiry times written to disk (AOF, snapshot) are wall-clock milliseconds: to_wall / from_wall convert.
+"""
+import threading
+import time
+
+
+class Clock:
+    def __init__(self, source: str = "monotonic", resolution_ms: int | None = None):
+        if source == "monotonic":
+            self._read_ns = time.monotonic_ns
+        elif source == "wall":
+            self._read_ns = time.time_ns
+        else:
+            raise Exception(f"No clock source found for name: {source}")
+        self.source = source
+        self.resolution_ms = resolution_ms
+        self.coarse = resolution_ms is not None
+        # wall = local + offset, fixed when the clock is created
+        self.offset_ms = 0 if source == "wall" else time.time_ns() // 1_000_000 - self.read()
+        self.now_ms = self.read()
+
+        self._stopped = threading.Event()
+        if self.coarse:
+            self._ticker = threading.Thread(target=self._tick, daemon=True)
+            self._ticker.start()
+
+
+    def read(self) -> int:
+        return self._read_ns() // 1_000_000
+
+
+    def now(self) -> int:
+        return self.now_ms if self.coarse else self.read()
+
+
+    def _tick(self):
+        interval = self.resolution_ms / 1000
+        while not self._stopped.wait(interval):
+            self.now_ms = self.read()
+
+
+    def to_wall(self, millis: int) -> int:
+        return millis + self.offset_ms
+
+
+    def from_wall(self, millis: int) -> int:
+        return millis - self.offset_ms
+
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,75 @@
+"""
+Compact entry table for InMemoryKVStore(compact=True).
+
+The default shard dict keeps a (value, expiry_time) tuple per key, 56 bytes on top of the dict slot,
+key and value. CompactTable stores the same mapping in two columns keyed the same way:
+    values      key -> value, every key
+    expiries    key -> expiry_time, only keys with a TTL (missing means NO_EXPIRY)
+A key without TTL then costs one dict slot, a key with TTL two dict slots and no tuple.
+
+It behaves like the dict it replaces (get, [], in, pop, items, len), tuples are only built on reads.
+An entry is written as two dict slots, so it is only read under the shard lock: InMemoryKVStore
+rejects compact=True together with read_optimized=True, whose lock-free get could see the new value
+with the old expiry (an expired key for a key just written) or the reverse.
+"""
+from KeyValueStoreInMemory.eviction import NO_EXPIRY
+
+_MISSING = object()
+
+
+class CompactTable:
+    __slots__ = ("values", "expiries")
+
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+
+
+    def get(self, key: str, default=None):
+        value = self.values.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        return value, self.expiries.get(key, NO_EXPIRY)
+
+
+    def __getitem__(self, key: str) -> tuple:
+        return self.values[key], self.expiries.get(key, NO_EXPIRY)
+
+
+    def __setitem__(self, key: str, entry: tuple):
+        value, expiry_time = entry
+        self.values[key] = value
+        if expiry_time == NO_EXPIRY:
+            self.expiries.pop(key, None)
+        else:
+            self.expiries[key] = expiry_time
+
+
+    def pop(self, key: str) -> tuple:
+        value = self.values.pop(key)
+        return value, self.expiries.pop(key, NO_EXPIRY)
+
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.values
+
+
+    def __len__(self):
+        return len(self.values)
+
+
+    def __iter__(self):
+        return iter(self.values)
+
+
+    def items(self):
+        expiries = self.expiries
+        for key, value in self.values.items():
+            yield key, (value, expiries.get(key, NO_EXPIRY))
+
+
+    def copy(self) -> "CompactTable":
+        table = CompactTable()
+        table.values = self.values.copy()
+        table.expiries = self.expiries.copy()
+        return table
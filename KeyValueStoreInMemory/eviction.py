@@ -0,0 +1,165 @@
+"""
+Eviction policies - pick a victim when a shard is over max_keys / max_memory_bytes.
+
+All of them are approximated like Redis: sample a handful of random keys and evict the worst one,
+so every operation stays O(1) no matter how many keys the shard holds.
+
+Policy          victim among the sample
+lru             least recently accessed
+lfu             least frequently accessed (logarithmic counter that decays over time)
+volatile-ttl    nearest expiry, only keys that have a TTL are candidates
+"""
+from abc import ABC, abstractmethod
+import random
+import sys
+import time
+
+NO_EXPIRY = sys.maxsize # expiry_time of keys stored without a TTL
+
+
+def entry_size(key: str, value) -> int:
+    # Shallow size of key and value, good enough to budget memory
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class KeyPool:
+    """Set of keys with O(1) add, remove and random sampling."""
+
+    def __init__(self):
+        self.keys = []
+        self.index = {} # key -> position in self.keys
+
+    def add(self, key: str):
+        if key not in self.index:
+            self.index[key] = len(self.keys)
+            self.keys.append(key)
+
+    def remove(self, key: str):
+        position = self.index.pop(key, None)
+        if position is None:
+            return
+        last = self.keys.pop()
+        if position < len(self.keys):
+            self.keys[position] = last
+            self.index[last] = position
+
+    def sample(self, count: int) -> list[str]:
+        if not self.keys:
+            return []
+        return random.choices(self.keys, k=count)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class EvictionPolicy(ABC):
+    def __init__(self, sample_size: int = 5):
+        self.sample_size = sample_size
+        self.pool = KeyPool()
+
+    @abstractmethod
+    def on_write(self, key: str, expiry_time: int):
+        pass
+
+    def on_access(self, key: str):
+        pass
+
+    def on_remove(self, key: str):
+        self.pool.remove(key)
+
+    @abstractmethod
+    def victim(self, store: dict) -> str | None:
+        # store is the shard dict, key -> (value, expiry_time)
+        pass
+
+
+class LRUPolicy(EvictionPolicy):
+    def __init__(self, sample_size: int = 5):
+        super().__init__(sample_size)
+        self.clock = 0 # logical clock, bumped on every access
+        self.last_access = {} # key -> clock value
+
+    def on_write(self, key: str, expiry_time: int):
+        self.pool.add(key)
+        self.on_access(key)
+
+    def on_access(self, key: str):
+        self.clock += 1
+        self.last_access[key] = self.clock
+
+    def on_remove(self, key: str):
+        super().on_remove(key)
+        self.last_access.pop(key, None)
+
+    def victim(self, store: dict) -> str | None:
+        sample = self.pool.sample(self.sample_size)
+        return min(sample, key=self.last_access.__getitem__, default=None)
+
+
+class LFUPolicy(EvictionPolicy):
+    # Same scheme as Redis: an 8 bit counter that grows logarithmically and loses
+    # one point for every decay_minutes the key was not touched
+    INITIAL_COUNT = 5
+    MAX_COUNT = 255
+
+    def __init__(self, sample_size: int = 5, log_factor: int = 10, decay_minutes: int = 1):
+        super().__init__(sample_size)
+        self.log_factor = log_factor
+        self.decay_minutes = decay_minutes
+        self.counters = {} # key -> (count, minute of last decay)
+
+    def _decayed(self, key: str, now_minute: int) -> int:
+        count, last_minute = self.counters[key]
+        periods = (now_minute - last_minute) // self.decay_minutes
+        return max(0, count - periods)
+
+    def on_write(self, key: str, expiry_time: int):
+        self.pool.add(key)
+        if key in self.counters:
+            self.on_access(key)
+        else:
+            self.counters[key] = (self.INITIAL_COUNT, int(time.monotonic() // 60))
+
+    def on_access(self, key: str):
+        now_minute = int(time.monotonic() // 60)
+        count = self._decayed(key, now_minute)
+        if count < self.MAX_COUNT:
+            base = max(0, count - self.INITIAL_COUNT)
+            if random.random() < 1.0 / (base * self.log_factor + 1):
+                count += 1
+        self.counters[key] = (count, now_minute)
+
+    def on_remove(self, key: str):
+        super().on_remove(key)
+        self.counters.pop(key, None)
+
+    def victim(self, store: dict) -> str | None:
+        now_minute = int(time.monotonic() // 60)
+        sample = self.pool.sample(self.sample_size)
+        return min(sample, key=lambda key: self._decayed(key, now_minute), default=None)
+
+
+class VolatileTTLPolicy(EvictionPolicy):
+    def on_write(self, key: str, expiry_time: int):
+        # Keys without a TTL are never evicted by this policy
+        if expiry_time == NO_EXPIRY:
+            self.pool.remove(key)
+        else:
+            self.pool.add(key)
+
+    def victim(self, store: dict) -> str | None:
+        sample = self.pool.sample(self.sample_size)
+        return min(sample, key=lambda key: store[key][1], default=None)
+
+
+class EvictionPolicyFactory:
+    @staticmethod
+    def get_policy(name: str) -> EvictionPolicy:
+        if name == "lru":
+            return LRUPolicy()
+        elif name == "lfu":
+            return LFUPolicy()
+        elif name == "volatile-ttl":
+            return VolatileTTLPolicy()
+        else:
+            raise Exception(f"No eviction policy found for name: {name}")
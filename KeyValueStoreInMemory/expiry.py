@@ -0,0 +1,197 @@
+"""
+Expiry backends - decide which keys are due for deletion. Every shard owns one.
+
+Backend         schedule        reschedule              memory
+HeapExpiry      O(log N)        push again (stale)      one entry per put
+TimingWheel     O(1)            replaces old deadline   one entry per live key
+
+"""
+from abc import ABC, abstractmethod
+import heapq
+
+
+class ExpiryBackend(ABC):
+    @abstractmethod
+    def schedule(self, key: str, expiry_time: int):
+        pass
+
+    @abstractmethod
+    def cancel(self, key: str):
+        pass
+
+    @abstractmethod
+    def pop_expired(self, now: int, limit: int | None = None) -> list[str]:
+        # Keys whose deadline is < now. Callers re-check the store, a key may have been rewritten.
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+
+class HeapExpiry(ExpiryBackend):
+    def __init__(self, now: int = 0):
+        self.min_heap = [] # [(expiry_time, key)]
+
+    def schedule(self, key: str, expiry_time: int):
+        # Old deadlines of the key stay in the heap until they are popped
+        heapq.heappush(self.min_heap, (expiry_time, key))
+
+    def cancel(self, key: str):
+        # A heap cannot drop an arbitrary entry cheaply, cleanup skips it later
+        pass
+
+    def pop_expired(self, now: int, limit: int | None = None) -> list[str]:
+        expired = []
+        while self.min_heap and self.min_heap[0][0] < now:
+            if limit is not None and len(expired) >= limit:
+                break
+            _, key = heapq.heappop(self.min_heap)
+            expired.append(key)
+        return expired
+
+    def __len__(self):
+        return len(self.min_heap)
+
+
+class _Slot(dict):
+    # key -> expiry_time, remembering which level it belongs to
+    __slots__ = ("level",)
+
+    def __init__(self, level: int):
+        super().__init__()
+        self.level = level
+
+
+class TimingWheelExpiry(ExpiryBackend):
+    """
+    Hierarchical timing wheel (Varghese & Lauck, as in the Linux kernel timers).
+
+    Level 0 has wheel_size slots of resolution_ms each, every higher level is wheel_size times
+    coarser. A key sits in exactly one slot, so rescheduling replaces its old deadline.
+    When a lower level wraps around, the matching slot of the level above is cascaded down.
+    Deadlines beyond the whole span park in the top level and are re-placed on cascade.
+    """
+
+    def __init__(self, now: int, resolution_ms: int = 10, wheel_size: int = 64, levels: int = 4):
+        if wheel_size & (wheel_size - 1):
+            raise ValueError("wheel_size must be a power of two")
+        self.resolution_ms = resolution_ms
+        self.bits = wheel_size.bit_length() - 1
+        self.mask = wheel_size - 1
+        self.levels = levels
+        self.span = 1 << (self.bits * levels)
+        self.wheels = [[_Slot(level) for _ in range(wheel_size)] for level in range(levels)]
+        self.counts = [0] * (levels + 1) # entries per level, the last one counts self.due
+        self.due = _Slot(levels) # expired keys not handed out yet
+        self.location = {} # key -> the slot dict currently holding it
+        self.current_tick = now // resolution_ms # last processed tick
+
+    def _place(self, key: str, expiry_time: int):
+        # +1 so a slot is only processed once its whole time range has passed
+        tick = expiry_time // self.resolution_ms + 1
+        delta = tick - (self.current_tick + 1)
+        if delta < 0:
+            # Its slot has already been processed
+            self.due[key] = expiry_time
+            self.location[key] = self.due
+            self.counts[self.levels] += 1
+            return
+        if delta >= self.span:
+            tick, delta = self.current_tick + self.span, self.span - 1
+
+        level = 0
+        while delta >= 1 << (self.bits * (level + 1)):
+            level += 1
+        slot = self.wheels[level][(tick >> (self.bits * level)) & self.mask]
+        slot[key] = expiry_time
+        self.location[key] = slot
+        self.counts[level] += 1
+
+    def _cascade(self, level: int, tick: int):
+        index = (tick >> (self.bits * level)) & self.mask
+        slot = self.wheels[level][index]
+        self.wheels[level][index] = _Slot(level)
+        self.counts[level] -= len(slot)
+        for key, expiry_time in slot.items():
+            self._place(key, expiry_time)
+        return index
+
+    def _next_cascade(self, level: int) -> int:
+        # First tick after current_tick at which a non-empty slot of this level is cascaded.
+        # Stops at the wrap-around, where the level above cascades into this one.
+        shift = self.bits * level
+        index = (self.current_tick >> shift) & self.mask
+        block_start = (self.current_tick >> (shift + self.bits)) << (shift + self.bits)
+        for next_index in range(index + 1, self.mask + 1):
+            if self.wheels[level][next_index]:
+                return block_start + (next_index << shift)
+        return block_start + (1 << (shift + self.bits))
+
+    def _advance(self, now_tick: int):
+        while self.current_tick < now_tick:
+            # Below the lowest non-empty level nothing happens until that level's next cascade,
+            # so long idle stretches are skipped instead of walked tick by tick
+            lowest = 0
+            while lowest < self.levels and self.counts[lowest] == 0:
+                lowest += 1
+            if lowest == self.levels:
+                self.current_tick = now_tick
+                return
+            if lowest > 0:
+                self.current_tick = min(self._next_cascade(lowest) - 1, now_tick)
+                if self.current_tick == now_tick:
+                    return
+
+            tick = self.current_tick + 1
+            # current_tick is still tick - 1 while cascading, so entries are re-placed relative to tick
+            level = 1
+            while level < self.levels and (tick >> (self.bits * (level - 1))) & self.mask == 0:
+                if self._cascade(level, tick) != 0:
+                    break
+                level += 1
+            self.current_tick = tick
+
+            index = tick & self.mask
+            slot = self.wheels[0][index]
+            if slot:
+                self.wheels[0][index] = _Slot(0)
+                self.counts[0] -= len(slot)
+                self.counts[self.levels] += len(slot)
+                for key, expiry_time in slot.items():
+                    self.due[key] = expiry_time
+                    self.location[key] = self.due
+
+    def schedule(self, key: str, expiry_time: int):
+        self.cancel(key)
+        self._place(key, expiry_time)
+
+    def cancel(self, key: str):
+        slot = self.location.pop(key, None)
+        if slot is not None:
+            del slot[key]
+            self.counts[slot.level] -= 1
+
+    def pop_expired(self, now: int, limit: int | None = None) -> list[str]:
+        self._advance(now // self.resolution_ms)
+        expired = []
+        while self.due and (limit is None or len(expired) < limit):
+            key, _ = self.due.popitem()
+            del self.location[key]
+            self.counts[self.levels] -= 1
+            expired.append(key)
+        return expired
+
+    def __len__(self):
+        return len(self.location)
+
+
+class ExpiryBackendFactory:
+    @staticmethod
+    def get_backend(name: str, now: int) -> ExpiryBackend:
+        if name == "heap":
+            return HeapExpiry(now)
+        elif name == "timing_wheel":
+            return TimingWheelExpiry(now)
+        else:
+            raise Exception(f"No expiry backend found for name: {name}")
@@ -0,0 +1,212 @@
+"""
+Keyspace notifications for InMemoryKVStore.
+
+    subscription = kv.subscribe(pattern="user:*", events={"set", "del"})
+    for event, key in subscription:             # blocking generator, ends when closed
+        ...
+    async for event, key in subscription.stream():   # same from asyncio
+        ...
+
+Events: "set", "del", "expired" (by a get or by cleanup), "evicted".
+
+Like the AOF, the store only appends (event, key) to a deque while it holds a shard lock. A dispatcher
+thread drains the deque every flush_interval and hands every subscriber its matching events as one batch.
+Each subscriber has a bounded buffer of `capacity` events; when it is full:
+    drop        events that do not fit are discarded and counted in subscription.dropped
+    block       the dispatcher waits for room, and writers wait (outside the shard lock) once
+                max_pending events are queued, so a slow subscriber slows writers down instead
+"""
+import asyncio
+from collections import deque
+from fnmatch import fnmatchcase
+import threading
+
+EVENTS = ("set", "del", "expired", "evicted")
+OVERFLOW_POLICIES = ("drop", "block")
+
+
+class Subscription:
+    def __init__(self, notifier: "Notifier", pattern: str | None = None, events: set[str] | None = None,
+                 capacity: int = 1024, overflow: str = "drop"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        if events is not None and not set(events) <= set(EVENTS):
+            raise ValueError(f"events must be a subset of {EVENTS}")
+        self.notifier = notifier
+        self.pattern = pattern
+        self.events = set(events) if events is not None else None
+        self.capacity = capacity
+        self.overflow = overflow
+        self.buffer = deque() # ring of at most capacity (event, key) tuples
+        self.cond = threading.Condition()
+        self.async_waiters = [] # (loop, future) of stream() consumers waiting for events
+        self.dropped = 0
+        self.closed = False
+
+
+    def _matches(self, event: str, key: str) -> bool:
+        return ((self.events is None or event in self.events)
+                and (self.pattern is None or fnmatchcase(key, self.pattern)))
+
+
+    def _deliver(self, batch: list[tuple[str, str]]):
+        # Runs on the dispatcher thread
+        if self.events is not None or self.pattern is not None:
+            batch = [(event, key) for event, key in batch if self._matches(event, key)]
+        if not batch:
+            return
+        with self.cond:
+            position = 0
+            while position < len(batch) and not self.closed:
+                room = self.capacity - len(self.buffer)
+                if room > 0:
+                    self.buffer.extend(batch[position:position + room])
+                    position += room
+                    self._wake()
+                elif self.overflow == "drop" or not self.notifier.running:
+                    self.dropped += len(batch) - position
+                    break
+                else:
+                    self.cond.wait()
+
+
+    def _wake(self):
+        # Caller holds self.cond
+        self.cond.notify_all()
+        for loop, future in self.async_waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+        self.async_waiters = []
+
+
+    def get_batch(self, max_events: int | None = None, timeout: float | None = None) -> list[tuple[str, str]]:
+        # Waits for at least one event (or timeout / close) and returns everything buffered, up to max_events
+        with self.cond:
+            if not self.buffer and not self.closed:
+                self.cond.wait(timeout)
+            return self._take(max_events)
+
+
+    def _take(self, max_events: int | None = None) -> list[tuple[str, str]]:
+        # Caller holds self.cond
+        count = len(self.buffer) if max_events is None else min(max_events, len(self.buffer))
+        batch = [self.buffer.popleft() for _ in range(count)]
+        if batch:
+            self.cond.notify_all() # a blocked dispatcher has room again
+        return batch
+
+
+    def __iter__(self):
+        while True:
+            batch = self.get_batch()
+            if not batch and self.closed:
+                return
+            yield from batch
+
+
+    async def get_batch_async(self, max_events: int | None = None) -> list[tuple[str, str]]:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.cond:
+                batch = self._take(max_events)
+                if batch or self.closed:
+                    return batch
+                future = loop.create_future()
+                self.async_waiters.append((loop, future))
+            await future
+
+
+    async def stream(self):
+        while True:
+            batch = await self.get_batch_async()
+            if not batch and self.closed:
+                return
+            for event in batch:
+                yield event
+
+
+    def close(self):
+        self.notifier.unsubscribe(self)
+        with self.cond:
+            self.closed = True
+            self._wake()
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Notifier:
+    def __init__(self, flush_interval: float = 0.005, max_pending: int = 100_000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = deque() # (event, key) waiting for the dispatcher
+        self.subscriptions = []
+        self.blocking = False # any "block" subscriber, checked by every write
+        self.cond = threading.Condition()
+        self.running = True
+        self.dispatcher_thread = threading.Thread(target=self._dispatcher, daemon=True)
+        self.dispatcher_thread.start()
+
+
+    def emit(self, event: str, key: str):
+        # Called under a shard lock: O(1), no filtering, no subscriber is touched
+        self.pending.append((event, key))
+
+
+    def wait_for_room(self):
+        # Backpressure for "block" subscribers, called by writers after releasing the shard lock
+        with self.cond:
+            while len(self.pending) > self.max_pending and self.running:
+                self.cond.notify_all()
+                self.cond.wait(self.flush_interval)
+
+
+    def subscribe(self, pattern: str | None = None, events: set[str] | None = None,
+                  capacity: int = 1024, overflow: str = "drop") -> Subscription:
+        subscription = Subscription(self, pattern, events, capacity, overflow)
+        with self.cond:
+            # Copy on write, the dispatcher iterates the list without the lock
+            self.subscriptions = self.subscriptions + [subscription]
+            self.blocking = any(s.overflow == "block" for s in self.subscriptions)
+        return subscription
+
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.cond:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+            self.blocking = any(s.overflow == "block" for s in self.subscriptions)
+
+
+    def _dispatcher(self):
+        while True:
+            with self.cond:
+                # Sleep even when events are pending, so every pass carries a whole flush_interval worth
+                if self.running:
+                    self.cond.wait(self.flush_interval)
+                running = self.running
+            pending = self.pending
+            batch = [pending.popleft() for _ in range(len(pending))]
+            if batch:
+                for subscription in self.subscriptions:
+                    subscription._deliver(batch)
+                with self.cond:
+                    self.cond.notify_all() # writers waiting in wait_for_room
+            if not running:
+                return
+
+
+    def close(self):
+        # Events still pending are delivered, a full "block" subscriber drops them instead of waiting
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        for subscription in self.subscriptions:
+            with subscription.cond:
+                subscription.cond.notify_all()
+        self.dispatcher_thread.join()
+        for subscription in self.subscriptions:
+            with subscription.cond:
+                subscription.closed = True
+                subscription._wake()
+        self.subscriptions = []
@@ -0,0 +1,281 @@
+"""
+Append-only file (AOF) for InMemoryKVStore.
+
+Every put / delete is appended as one JSON line with the absolute expiry time:
+    ["P", key, value, expiry_time]      expiry_time is null for keys without TTL
+    ["D", key]
+
+The store only appends a tuple to an in-memory deque while it holds a shard lock. A background
+writer drains the deque in groups, writes them with one write() call and fsyncs per policy:
+    always      fsync every group, put/delete wait (outside the lock) until their group is on disk
+    everysec    fsync at most once a second, up to a second of writes can be lost
+    never       leave flushing to the OS
+While writes keep coming the writer looks at the deque every flush_interval. Once a pass finds nothing,
+it sleeps until the next append wakes it (or the everysec fsync of the last writes is due), so an idle
+store costs no wakeups.
+
+Rewrite compacts the file: the current contents of the store are written to a temp file which
+replaces the log atomically. Records appended while that happens go to the new file afterwards.
+
+Snapshot cut: the store marks the point its snapshot copies (mark_snapshot, under every shard lock) and,
+once the snapshot file is on disk, calls snapshot_saved: the writer drops everything before the mark,
+keeping only the records the snapshot does not hold. A crash in between replays the whole log on top
+of the new snapshot, which is harmless: every record sets or deletes a key outright.
+"""
+from collections import deque
+import json
+import os
+import threading
+import time
+
+FSYNC_POLICIES = ("always", "everysec", "never")
+SNAPSHOT_MARK = ("S",) # in the pending deque only, never written
+
+
+def replay(path: str):
+    # Yields (op, key, value, expiry_time) from an AOF. A torn last line from a crash is skipped and cut
+    # off the file, so the records appended after the restart start on a line of their own.
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as f:
+        end = 0 # end of the last whole record
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("no end of line")
+                record = json.loads(line)
+            except ValueError:
+                f.truncate(end)
+                return
+            end += len(line)
+            if record[0] == "P":
+                yield "P", record[1], record[2], record[3]
+            else:
+                yield "D", record[1], None, None
+
+
+class AppendOnlyFile:
+    def __init__(self, path: str, fsync: str = "everysec", snapshot=None,
+                 flush_interval: float = 0.005, rewrite_min_bytes: int = 64 * 1024 * 1024,
+                 rewrite_growth: float = 1.0, to_wall=None):
+        # snapshot: callable returning (key, value, wall expiry_time) of every live key, used by rewrite
+        # to_wall: converts the store's expiry times to wall-clock milliseconds before they are written
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.path = path
+        self.fsync = fsync
+        self.snapshot = snapshot
+        self.to_wall = to_wall
+        self.flush_interval = flush_interval
+        # Rewrite once the file is rewrite_min_bytes and has grown by rewrite_growth since the last rewrite
+        self.rewrite_min_bytes = rewrite_min_bytes
+        self.rewrite_growth = rewrite_growth
+
+        self.pending = deque() # records waiting for the writer
+        self.file = open(path, "ab")
+        self.size_after_rewrite = self.file.tell()
+        self.last_fsync = time.monotonic()
+        self.unsynced = False # written since the last fsync
+
+        # Group commit bookkeeping: a writer pass that starts after a record was appended
+        # always drains it, so waiting for passes_done > passes_started (read after the append) is enough
+        self.cond = threading.Condition()
+        self.passes_started = 0
+        self.passes_done = 0
+        self.rewrite_requested = False
+        self.mark_offset = None # file offset of the last snapshot mark, None once the file was rewritten
+        self.cut_requested = False
+        self.idle = False # the writer sleeps until an append wakes it
+        self.running = True
+        self.writer_thread = threading.Thread(target=self._writer, daemon=True)
+        self.writer_thread.start()
+
+
+    def append_put(self, key: str, value, expiry_time: int | None):
+        # Called under a shard lock: O(1), no I/O, no encoding. Takes self.cond only to wake an idle writer.
+        self.pending.append(("P", key, value, expiry_time))
+        if self.idle:
+            self._wake()
+
+
+    def append_delete(self, key: str):
+        self.pending.append(("D", key))
+        if self.idle:
+            self._wake()
+
+
+    def _wake(self):
+        # The first append after a quiet spell; the ones after it find the writer awake
+        with self.cond:
+            if self.idle:
+                self.idle = False
+                self.cond.notify_all()
+
+
+    def wait_durable(self):
+        # Blocks until everything appended so far is written (and fsynced with "always")
+        with self.cond:
+            target = self.passes_started + 1
+            self.cond.notify_all()
+            while self.passes_done < target and self.running:
+                self.cond.wait()
+
+
+    def rewrite(self):
+        with self.cond:
+            self.rewrite_requested = True
+            self.cond.notify_all()
+
+
+    def mark_snapshot(self):
+        # Called with every shard lock held, at the moment the snapshot copies the shards
+        self.pending.append(SNAPSHOT_MARK)
+        if self.idle:
+            self._wake()
+
+
+    def snapshot_saved(self):
+        # The snapshot taken at the last mark is on disk: the records before the mark can go
+        with self.cond:
+            self.cut_requested = True
+            self.cond.notify_all()
+
+
+    def _drain(self) -> int:
+        records = []
+        written = 0
+        pending = self.pending
+        while pending:
+            record = pending.popleft()
+            if record is SNAPSHOT_MARK:
+                written += self._write(records)
+                records = []
+                self.mark_offset = self.file.tell()
+            else:
+                records.append(record)
+        return written + self._write(records)
+
+
+    def _write(self, records: list) -> int:
+        if records:
+            self.file.write("".join(json.dumps(self._on_disk(record)) + "\n" for record in records).encode())
+            self.file.flush()
+        return len(records)
+
+
+    def _on_disk(self, record: tuple) -> tuple:
+        if record[0] == "P" and record[3] is not None and self.to_wall is not None:
+            return ("P", record[1], record[2], self.to_wall(record[3]))
+        return record
+
+
+    def _writer(self):
+        written = 0
+        while True:
+            with self.cond:
+                if not self.pending and self.running and not self.rewrite_requested and not self.cut_requested:
+                    if written:
+                        # Writes are coming in: give the next group flush_interval to gather
+                        self.cond.wait(self.flush_interval)
+                    else:
+                        # Quiet: sleep until an append, or until the everysec fsync of the last writes is due.
+                        # idle is set before pending is looked at again, so an append either is seen here
+                        # or sees idle and wakes the writer.
+                        self.idle = True
+                        if not self.pending:
+                            self.cond.wait(self._fsync_due())
+                        self.idle = False
+                running = self.running
+                self.passes_started += 1
+                current_pass = self.passes_started
+
+            written = self._drain()
+            if written:
+                self.unsynced = True
+            now = time.monotonic()
+            # everysec: also on a pass that wrote nothing, so the last writes before a quiet spell get synced
+            if self.unsynced and (self.fsync == "always" or (self.fsync == "everysec" and now - self.last_fsync >= 1)):
+                os.fsync(self.file.fileno())
+                self.last_fsync = now
+                self.unsynced = False
+
+            with self.cond:
+                self.passes_done = current_pass
+                self.cond.notify_all()
+
+            if not running:
+                return
+            if self.cut_requested:
+                self._cut()
+            if self.rewrite_requested or self._should_rewrite():
+                self._rewrite()
+
+
+    def _fsync_due(self) -> float | None:
+        # Seconds until the everysec fsync of unsynced writes, None when there is none to wait for
+        if self.fsync != "everysec" or not self.unsynced:
+            return None
+        return max(0.0, self.last_fsync + 1 - time.monotonic())
+
+
+    def _should_rewrite(self) -> bool:
+        if self.snapshot is None:
+            return False
+        size = self.file.tell()
+        return size >= self.rewrite_min_bytes and size >= self.size_after_rewrite * (1 + self.rewrite_growth)
+
+
+    def _rewrite(self):
+        # Runs on the writer thread, so nothing else touches self.file meanwhile
+        self.rewrite_requested = False
+        if self.snapshot is None:
+            return
+        self._drain()
+        temp_path = self.path + ".rewrite"
+        with open(temp_path, "wb") as f:
+            batch = []
+            for key, value, expiry_time in self.snapshot():
+                batch.append(json.dumps(("P", key, value, expiry_time)) + "\n")
+                if len(batch) >= 10_000:
+                    f.write("".join(batch).encode())
+                    batch = []
+            f.write("".join(batch).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, "ab")
+        self.size_after_rewrite = self.file.tell()
+        self.mark_offset = None # the file holds everything now, there is nothing before a mark to drop
+
+
+    def _cut(self):
+        # Runs on the writer thread: replaces the file with what was written after the snapshot mark
+        self.cut_requested = False
+        self._drain()
+        if self.mark_offset is None:
+            return
+        temp_path = self.path + ".cut"
+        with open(self.path, "rb") as source, open(temp_path, "wb") as f:
+            source.seek(self.mark_offset)
+            while chunk := source.read(1024 * 1024):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, "ab")
+        self.size_after_rewrite = self.file.tell()
+        self.mark_offset = None
+        self.unsynced = False
+
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.writer_thread.join()
+        self._drain()
+        if self.fsync != "never":
+            os.fsync(self.file.fileno())
+        self.file.close()
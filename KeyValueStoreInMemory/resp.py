@@ -0,0 +1,138 @@
+"""
+RESP (REdis Serialization Protocol) subset shared by server.py and client.py.
+
+Requests are arrays of bulk strings:  *2\r\n$3\r\nGET\r\n$3\r\nkey\r\n
+Inline commands (GET key\r\n) are accepted too, handy with telnet / nc.
+Replies: +simple  -error  :integer  $bulk ($-1 for None)  *array
+"""
+import asyncio
+
+CRLF = b"\r\n"
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class ResponseError(Exception):
+    # -ERR reply from the server
+    pass
+
+
+class SimpleString(str):
+    # Sent as +value instead of a bulk string
+    pass
+
+
+OK = SimpleString("OK")
+
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def encode_reply(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, ResponseError):
+        return b"-ERR %s\r\n" % str(value).encode()
+    if isinstance(value, SimpleString):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(item) for item in value)
+    if isinstance(value, str):
+        value = value.encode("utf-8", "surrogateescape")
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _length(digits) -> int:
+    # The number after '*' or '$' in a request: an argument count or a byte length, never negative
+    if not digits.isdigit():
+        raise ProtocolError(f"invalid length {bytes(digits)!r}")
+    return int(digits)
+
+
+def parse_requests(buffer: bytearray) -> tuple[list[list[bytes]], int]:
+    # Every complete command in buffer, plus how many bytes they used. A partial one is left for later.
+    commands = []
+    position = 0
+    size = len(buffer)
+    while position < size:
+        if buffer[position] != ord("*"):
+            end = buffer.find(b"\n", position)
+            if end < 0:
+                break
+            line = bytes(buffer[position:end]).strip()
+            if line:
+                commands.append(line.split())
+            position = end + 1
+            continue
+
+        end = buffer.find(CRLF, position)
+        if end < 0:
+            break
+        count = _length(buffer[position + 1:end])
+        cursor = end + 2
+        args = []
+        for _ in range(count):
+            end = buffer.find(CRLF, cursor)
+            if end < 0:
+                break
+            if buffer[cursor] != ord("$"):
+                raise ProtocolError("expected '$'")
+            length = _length(buffer[cursor + 1:end])
+            start = end + 2
+            if start + length + 2 > size:
+                break
+            args.append(bytes(buffer[start:start + length]))
+            cursor = start + length + 2
+        if len(args) < count:
+            break
+        commands.append(args)
+        position = cursor
+    return commands, position
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("connection closed by server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        return ResponseError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2].decode("utf-8", "surrogateescape")
+    if kind == b"*":
+        return [await read_reply(reader) for _ in range(int(payload))]
+    raise ProtocolError(f"unexpected reply {line!r}")
+
+
+# ------------------- TEST CASE -------------------
+if __name__ == "__main__":
+    commands, used = parse_requests(bytearray(encode_command("SET", "k", "v") + b"*2\r\n$3\r\nGET\r\n$1\r\nk"))
+    assert commands == [[b"SET", b"k", b"v"]] and used == len(encode_command("SET", "k", "v")) # GET not complete yet
+    # A length that is negative or not a number would leave the server waiting for bytes that never come
+    for request in (b"*2\r\n$-1\r\n", b"*1\r\n$-5\r\nGET\r\n", b"*-1\r\n", b"*x\r\n", b"*1\r\n$\r\nGET\r\n"):
+        try:
+            parse_requests(bytearray(request))
+        except ProtocolError as e:
+            print(f"{request!r}: {e}")
+        else:
+            raise AssertionError(f"{request!r} was accepted")
@@ -0,0 +1,150 @@
+"""
+asyncio TCP front-end for InMemoryKVStore, speaking a RESP subset (see resp.py).
+
+Commands: PING, GET key, SET key value [EX seconds | PX millis], DEL key [key ...],
+          MGET key [key ...], MSET key value [key value ...], DBSIZE
+
+Pipelining: everything a client sent is parsed in one go, runs of consecutive GETs become one
+get_many call, and all replies go back with a single write.
+
+Store calls run on the event loop: they only take a shard lock for a moment. A write can wait, though:
+for its fsync with aof_fsync="always", and for room when a subscriber with overflow="block" fell behind.
+While the store is set up like that, each batch runs in the loop's default thread pool instead; other
+clients keep being served meanwhile, and writes of concurrent batches share one fsync (group commit).
+
+To run, python3 -m KeyValueStoreInMemory.server [port] command from one level above KeyValueStoreInMemory folder
+"""
+import asyncio
+import sys
+
+from KeyValueStoreInMemory.resp import OK, ProtocolError, ResponseError, SimpleString, encode_reply, parse_requests
+from KeyValueStoreInMemory.store import InMemoryKVStore
+
+
+def _text(arg: bytes) -> str:
+    return arg.decode("utf-8", "surrogateescape")
+
+
+class KVServer:
+    def __init__(self, store: InMemoryKVStore, host: str = "127.0.0.1", port: int = 6380):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.server = None
+
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                buffer += data
+                try:
+                    commands, consumed = parse_requests(buffer)
+                except (ProtocolError, ValueError) as e:
+                    writer.write(encode_reply(ResponseError(f"protocol error: {e}")))
+                    break
+                del buffer[:consumed]
+                if commands:
+                    if self.blocking():
+                        reply = await asyncio.get_running_loop().run_in_executor(None, self.execute_batch, commands)
+                    else:
+                        reply = self.execute_batch(commands)
+                    writer.write(reply)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+    def blocking(self) -> bool:
+        # Whether a write may wait; checked per batch, a "block" subscriber can come and go at any time
+        store = self.store
+        return ((store.aof is not None and store.aof.fsync == "always")
+                or (store.notifier is not None and store.notifier.blocking))
+
+
+    def execute_batch(self, commands: list[list[bytes]]) -> bytes:
+        replies = []
+        index = 0
+        while index < len(commands):
+            # Coalesce a run of GETs into one get_many: one clock read, one lock per shard
+            end = index
+            while end < len(commands) and len(commands[end]) == 2 and commands[end][0].upper() == b"GET":
+                end += 1
+            if end - index > 1:
+                keys = [_text(command[1]) for command in commands[index:end]]
+                replies.extend(encode_reply(value) for value in self.store.get_many(keys))
+                index = end
+                continue
+            replies.append(encode_reply(self.execute(commands[index])))
+            index += 1
+        return b"".join(replies)
+
+
+    def execute(self, command: list[bytes]):
+        if not command:
+            return ResponseError("empty command")
+        name = command[0].upper()
+        args = [_text(arg) for arg in command[1:]]
+        try:
+            if name == b"PING":
+                return SimpleString("PONG") if not args else args[0]
+            elif name == b"GET" and len(args) == 1:
+                return self.store.get(args[0])
+            elif name == b"SET" and len(args) in (2, 4):
+                ttl = None
+                if len(args) == 4:
+                    unit = args[2].upper()
+                    if unit not in ("EX", "PX"):
+                        return ResponseError("syntax error")
+                    ttl = int(args[3]) * (1000 if unit == "EX" else 1)
+                self.store.put(args[0], args[1], ttl)
+                return OK
+            elif name == b"DEL" and args:
+                return self.store.delete_many(args)
+            elif name == b"MGET" and args:
+                return self.store.get_many(args)
+            elif name == b"MSET" and args and len(args) % 2 == 0:
+                self.store.put_many(list(zip(args[::2], args[1::2])))
+                return OK
+            elif name == b"DBSIZE" and not args:
+                return len(self.store)
+            return ResponseError(f"unknown command or wrong number of arguments for '{_text(name)}'")
+        except (ValueError, MemoryError) as e:
+            return ResponseError(str(e))
+
+
+async def main(port: int):
+    store = InMemoryKVStore(num_shards=16)
+    server = KVServer(store, port=port)
+    await server.start()
+    print(f"Listening on {server.host}:{server.port}")
+    try:
+        await server.serve_forever()
+    finally:
+        store.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 6380))
@@ -0,0 +1,176 @@
+"""
+Point-in-time binary snapshot of InMemoryKVStore.
+
+Layout (native byte order):
+
+    header      magic "KVSNAP01" | count u64 | expiry_offset u64 | index_offset u64
+    data        per entry: key_len u32 | key utf-8 | tag u8 | value_len u32 | value bytes
+    expiries    count x i64, -1 for keys without TTL
+    index       count x u64 key hash | count x u64 entry offset
+
+Entries are written in key hash order, so the position of a hash in the index is also the entry's
+position in the expiry column. Loading maps the file with mmap and only reads the header: a lookup is
+a binary search over the hash column, and a value is decoded the first time it is read.
+"""
+from array import array
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+from bisect import bisect_left
+
+MAGIC = b"KVSNAP01"
+HEADER = struct.Struct("=8sQQQ")
+LENGTH = struct.Struct("=I")
+VALUE_HEADER = struct.Struct("=BI")
+NO_EXPIRY_ON_DISK = -1
+
+TAG_STR, TAG_BYTES, TAG_PICKLE = 0, 1, 2
+
+
+def key_hash(key: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def _encode_value(value) -> tuple[int, bytes]:
+    if isinstance(value, str):
+        return TAG_STR, value.encode()
+    if isinstance(value, bytes):
+        return TAG_BYTES, value
+    return TAG_PICKLE, pickle.dumps(value)
+
+
+def write_snapshot(path: str, entries: list[tuple[str, object, int | None]]):
+    # entries: (key, value, expiry_time or None). Written to a temp file and renamed into place.
+    entries = sorted(((key_hash(key), key, value, expiry_time) for key, value, expiry_time in entries),
+                     key=lambda entry: entry[0])
+    hashes = array("Q")
+    offsets = array("Q")
+    expiries = array("q")
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0, 0))
+        offset = HEADER.size
+        chunk = []
+        for hashed, key, value, expiry_time in entries:
+            key_bytes = key.encode()
+            tag, value_bytes = _encode_value(value)
+            record = b"".join((LENGTH.pack(len(key_bytes)), key_bytes,
+                               VALUE_HEADER.pack(tag, len(value_bytes)), value_bytes))
+            hashes.append(hashed)
+            offsets.append(offset)
+            expiries.append(NO_EXPIRY_ON_DISK if expiry_time is None else expiry_time)
+            chunk.append(record)
+            offset += len(record)
+            if len(chunk) >= 10_000:
+                f.write(b"".join(chunk))
+                chunk = []
+        f.write(b"".join(chunk))
+
+        expiry_offset = offset
+        f.write(expiries.tobytes())
+        index_offset = expiry_offset + len(expiries) * expiries.itemsize
+        f.write(hashes.tobytes())
+        f.write(offsets.tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(entries), expiry_offset, index_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class SnapshotReader:
+    """Read-only view over a snapshot file. Opening it costs one mmap and a header read."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, expiry_offset, index_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        view = memoryview(self.mm)
+        self.expiries = view[expiry_offset:expiry_offset + 8 * self.count].cast("q")
+        self.hashes = view[index_offset:index_offset + 8 * self.count].cast("Q")
+        self.offsets = view[index_offset + 8 * self.count:index_offset + 16 * self.count].cast("Q")
+
+
+    def find(self, key: str) -> int | None:
+        # O(log N) over the hash column, then compare keys among equal hashes
+        hashed = key_hash(key)
+        position = bisect_left(self.hashes, hashed)
+        while position < self.count and self.hashes[position] == hashed:
+            if self.key_at(position) == key:
+                return position
+            position += 1
+        return None
+
+
+    def key_at(self, position: int) -> str:
+        offset = self.offsets[position]
+        (length,) = LENGTH.unpack_from(self.mm, offset)
+        return self.mm[offset + 4:offset + 4 + length].decode()
+
+
+    def _value_span(self, position: int) -> tuple[int, int, int]:
+        offset = self.offsets[position]
+        (key_length,) = LENGTH.unpack_from(self.mm, offset)
+        value_offset = offset + 4 + key_length
+        tag, length = VALUE_HEADER.unpack_from(self.mm, value_offset)
+        return tag, value_offset + VALUE_HEADER.size, length
+
+
+    def value_at(self, position: int):
+        tag, start, length = self._value_span(position)
+        raw = self.mm[start:start + length]
+        if tag == TAG_STR:
+            return raw.decode()
+        if tag == TAG_BYTES:
+            return raw
+        return pickle.loads(raw)
+
+
+    def expiry_at(self, position: int) -> int | None:
+        expiry_time = self.expiries[position]
+        return None if expiry_time == NO_EXPIRY_ON_DISK else expiry_time
+
+
+    def lazy_value(self, position: int) -> "LazyValue":
+        _, _, length = self._value_span(position)
+        return LazyValue(self, position, length)
+
+
+    def entries(self, start: int, stop: int):
+        # (key, LazyValue, expiry_time or None) for positions [start, stop), one pass over the data
+        mm, offsets, expiries = self.mm, self.offsets, self.expiries
+        unpack_length, unpack_value = LENGTH.unpack_from, VALUE_HEADER.unpack_from
+        for position in range(start, stop):
+            offset = offsets[position]
+            (key_length,) = unpack_length(mm, offset)
+            key = mm[offset + 4:offset + 4 + key_length].decode()
+            _, length = unpack_value(mm, offset + 4 + key_length)
+            expiry_time = expiries[position]
+            yield key, LazyValue(self, position, length), None if expiry_time == NO_EXPIRY_ON_DISK else expiry_time
+
+
+    def __len__(self):
+        return self.count
+
+
+class LazyValue:
+    """Placeholder for a value still sitting in the mapped snapshot."""
+    __slots__ = ("reader", "position", "length")
+
+    def __init__(self, reader: SnapshotReader, position: int, length: int):
+        self.reader = reader
+        self.position = position
+        self.length = length
+
+    def decode(self):
+        return self.reader.value_at(self.position)
+
+    def __sizeof__(self):
+        # Budget the decoded size so memory limits hold before values are touched
+        return self.length + 49
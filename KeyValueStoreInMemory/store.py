@@ -1,67 +1,663 @@
+"""
+InMemoryKVStore: sharded key-value store with TTLs, eviction, AOF / snapshot persistence and keyspace
+notifications. The modules it is built from are imported through the KeyValueStoreInMemory package, so
+the demo at the bottom does not run as python3 store.py from inside the folder.
+
+To run, python3 -m KeyValueStoreInMemory.store command from one level above KeyValueStoreInMemory folder
+"""
+from collections import deque
+import os
 import threading
 import time
-import heapq
 
-def current_millis():
-    return int(time.time() * 1000)
+from KeyValueStoreInMemory.clock import Clock
+from KeyValueStoreInMemory.compact import CompactTable
+from KeyValueStoreInMemory.eviction import NO_EXPIRY, EvictionPolicyFactory, entry_size
+from KeyValueStoreInMemory.expiry import ExpiryBackendFactory
+from KeyValueStoreInMemory.notifications import Notifier, Subscription
+from KeyValueStoreInMemory.persistence import AppendOnlyFile, replay
+from KeyValueStoreInMemory.snapshot import LazyValue, SnapshotReader, write_snapshot
 
-class InMemoryKVStore:
-    def __init__(self, cleanup_interval = 1):
-        self.store = {} # key -> {value, expiryTime}
-        self.min_heap = [] # [(expiry_time, key)]
+_LOCKED = object() # returned by Shard._read when the get has to take the lock
+
+class CleanupStats:
+    """Counters of the expiry sweeps, readable while the store is running."""
+
+    def __init__(self):
+        self.ticks = 0
+        self.reclaimed_last_tick = 0
+        self.reclaimed_total = 0
+        self.max_reclaimed_per_tick = 0
+        self.max_lock_hold_ms = 0.0 # longest single stretch cleanup held a shard lock
+        self.backlog = False # last tick ran out of budget with expired keys left
+
+
+    def record_tick(self, reclaimed: int, max_lock_hold_ms: float, backlog: bool):
+        self.ticks += 1
+        self.reclaimed_last_tick = reclaimed
+        self.reclaimed_total += reclaimed
+        self.max_reclaimed_per_tick = max(self.max_reclaimed_per_tick, reclaimed)
+        self.max_lock_hold_ms = max(self.max_lock_hold_ms, max_lock_hold_ms)
+        self.backlog = backlog
+
+
+    def __repr__(self):
+        return (f"CleanupStats(ticks={self.ticks}, reclaimed_last_tick={self.reclaimed_last_tick}, "
+                f"reclaimed_total={self.reclaimed_total}, max_lock_hold_ms={self.max_lock_hold_ms:.3f})")
+
+
+class Shard:
+    """One independent slice of the keyspace with its own dict, expiry backend and lock."""
+
+    def __init__(self, expiry_backend: str = "heap", max_keys: int | None = None,
+                 max_memory_bytes: int | None = None, eviction_policy: str = "lru", clock: Clock | None = None,
+                 compact: bool = False, read_optimized: bool = False):
+        # key -> (value, expiryTime). CompactTable keeps the same mapping without a tuple per key, see compact.py
+        self.compact = compact
+        self.store = CompactTable() if compact else {}
+        self.clock = clock or Clock()
+        self.expiry = ExpiryBackendFactory.get_backend(expiry_backend, self.clock.now())
         self.lock = threading.Lock()
+
+        # Memory bound, only tracked when a limit is set
+        self.max_keys = max_keys
+        self.max_memory_bytes = max_memory_bytes
+        self.eviction = None
+        if max_keys is not None or max_memory_bytes is not None:
+            self.eviction = EvictionPolicyFactory.get_policy(eviction_policy)
+        self.track_memory = max_memory_bytes is not None
+        self.used_bytes = 0
+        self.aof = None # AppendOnlyFile shared by all shards, set by the store
+        self.notifier = None # Notifier shared by all shards, set on the first subscribe
+        # While a snapshot is being loaded, keys not yet copied into self.store are looked up in it.
+        # shadowed holds keys removed meanwhile, so the snapshot copy of them is ignored.
+        self.snapshot = None
+        self.shadowed = set()
+
+        # read_optimized: get reads the dict without the lock. Single dict reads and writes are atomic
+        # and an entry is one tuple, so a reader sees either the old or the new (value, expiry) pair.
+        # Anything a read would change is recorded in lossy buffers and applied by the next writer or cleanup.
+        self.read_optimized = read_optimized
+        self.expired_marks = deque(maxlen=4096) # keys a lock-free get found expired
+        self.accesses = deque(maxlen=4096) # keys read lock-free, for the eviction policy
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+
+    def _apply_reads(self):
+        # Caller holds self.lock. Replays lock-free reads into the eviction policy, keys gone since are skipped.
+        accesses = self.accesses
+        while accesses:
+            key = accesses.popleft()
+            if key in self.store:
+                self.eviction.on_access(key)
+
+
+    def _remove(self, key: str):
+        # Caller holds self.lock
+        value, _ = self.store.pop(key)
+        if self.snapshot is not None:
+            self.shadowed.add(key)
+        self.expiry.cancel(key)
+        if self.track_memory:
+            self.used_bytes -= entry_size(key, value)
+        if self.eviction:
+            self.eviction.on_remove(key)
+
+
+    def _over_limit(self, key: str, size: int) -> bool:
+        old = self.store.get(key)
+        if self.max_keys is not None and old is None and len(self.store) >= self.max_keys:
+            return True
+        if self.max_memory_bytes is not None:
+            old_size = entry_size(key, old[0]) if old is not None else 0
+            return self.used_bytes - old_size + size > self.max_memory_bytes
+        return False
+
+
+    def _make_room(self, key: str, size: int):
+        # O(1) per evicted key, the policy only looks at a small random sample
+        if self.accesses:
+            self._apply_reads()
+        while self._over_limit(key, size):
+            victim = self.eviction.victim(self.store)
+            if victim is None:
+                raise MemoryError(f"Shard is full and the eviction policy has no candidate for {key}")
+            self._remove(victim)
+            self.evictions += 1
+            if self.aof is not None:
+                self.aof.append_delete(victim)
+            if self.notifier is not None:
+                self.notifier.emit("evicted", victim)
+
+
+    def _insert(self, key: str, value: str, expiry_time: int):
+        # Caller holds self.lock. O (log N) with the heap backend, O(1) with the timing wheel
+        if self.eviction:
+            self._make_room(key, entry_size(key, value) if self.track_memory else 0)
+        if self.track_memory:
+            old = self.store.get(key)
+            if old is not None:
+                self.used_bytes -= entry_size(key, old[0])
+            self.used_bytes += entry_size(key, value)
+        self.store[key] = (value, expiry_time)
+        if expiry_time == NO_EXPIRY:
+            self.expiry.cancel(key)
+        else:
+            self.expiry.schedule(key, expiry_time)
+        if self.eviction:
+            self.eviction.on_write(key, expiry_time)
+
+
+    def _put(self, key: str, value: str, expiry_time: int):
+        # Caller holds self.lock
+        self._insert(key, value, expiry_time)
+        if self.aof is not None:
+            self.aof.append_put(key, value, None if expiry_time == NO_EXPIRY else expiry_time)
+        if self.notifier is not None:
+            self.notifier.emit("set", key)
+
+
+    def _delete(self, key: str) -> bool:
+        # Caller holds self.lock. Returns whether the key was in memory.
+        removed = key in self.store
+        if removed:
+            self._remove(key)
+        elif self.snapshot is not None:
+            # Not loaded from the snapshot yet
+            self.shadowed.add(key)
+        else:
+            return False
+        if self.aof is not None:
+            self.aof.append_delete(key)
+        if self.notifier is not None:
+            self.notifier.emit("del", key)
+        return removed
+
+
+    def _fault_in(self, key: str):
+        # Caller holds self.lock. Copies one key from the snapshot still being loaded.
+        if key in self.shadowed:
+            return None
+        position = self.snapshot.find(key)
+        if position is None:
+            return None
+        expiry_time = self.snapshot.expiry_at(position)
+        expiry_time = NO_EXPIRY if expiry_time is None else self.clock.from_wall(expiry_time)
+        self._insert(key, self.snapshot.lazy_value(position), expiry_time)
+        return self.store.get(key)
+
+
+    def _hydrate(self, key: str, value: LazyValue, expiry_time: int):
+        # Caller holds self.lock. Keys written or removed since the snapshot was opened win.
+        if key not in self.store and key not in self.shadowed:
+            self._insert(key, value, expiry_time)
+
+
+    def _get(self, key: str, now: int) -> str | None:
+        # Caller holds self.lock. O(1)
+        entry = self.store.get(key)
+        if entry is None and self.snapshot is not None:
+            entry = self._fault_in(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expiry = entry
+        if expiry < now:
+            self._remove(key)
+            self.expired += 1
+            self.misses += 1
+            if self.notifier is not None:
+                self.notifier.emit("expired", key)
+            return None
+        if type(value) is LazyValue:
+            # First read of a value loaded from a snapshot
+            decoded = value.decode()
+            self.store[key] = (decoded, expiry)
+            if self.track_memory:
+                self.used_bytes += entry_size(key, decoded) - entry_size(key, value)
+            value = decoded
+        self.hits += 1
+        if self.eviction:
+            self.eviction.on_access(key)
+        return value
+
+
+    def put(self, key: str, value: str, expiry_time: int):
+        with self.lock:
+            self._put(key, value, expiry_time)
+
+
+    def _read(self, key: str, now: int):
+        # Lock-free get. Never modifies the store: an expired key is only marked for cleanup.
+        # Snapshot faults and values still LazyValue need the lock and return _LOCKED.
+        entry = self.store.get(key)
+        if entry is None:
+            if self.snapshot is not None:
+                return _LOCKED
+            self.misses += 1
+            return None
+        value, expiry = entry
+        if type(value) is LazyValue:
+            return _LOCKED
+        if expiry < now:
+            self.expired_marks.append(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.eviction:
+            self.accesses.append(key)
+        return value
+
+
+    def get(self, key: str, now: int) -> str | None:
+        if self.read_optimized:
+            value = self._read(key, now)
+            if value is not _LOCKED:
+                return value
+        with self.lock:
+            return self._get(key, now)
+
+
+    def delete(self, key: str):
+        with self.lock:
+            self._delete(key)
+
+
+    def put_many(self, items: list[tuple[str, str]], expiry_time: int):
+        with self.lock:
+            for key, value in items:
+                self._put(key, value, expiry_time)
+
+
+    def get_many(self, keys: list[str], now: int) -> list[str | None]:
+        if self.read_optimized:
+            values = [self._read(key, now) for key in keys]
+            if _LOCKED not in values:
+                return values
+            with self.lock:
+                return [self._get(key, now) if value is _LOCKED else value for key, value in zip(keys, values)]
+        with self.lock:
+            return [self._get(key, now) for key in keys]
+
+
+    def delete_many(self, keys: list[str]) -> int:
+        with self.lock:
+            return sum(self._delete(key) for key in keys)
+
+
+    def cleanup(self, now: int, limit: int | None = None) -> tuple[int, bool, float]:
+        # Returns (keys reclaimed, whether more expired keys may be left, lock hold in ms)
+        with self.lock:
+            start = time.perf_counter()
+            expired = self.expiry.pop_expired(now, limit)
+            reclaimed = 0
+            if self.read_optimized:
+                expired.extend(self._take_marks(limit))
+                if self.eviction and self.accesses:
+                    self._apply_reads()
+            for key in expired:
+                # The heap may hand back an old deadline of a key that was rewritten since
+                if key in self.store and self.store[key][1] < now:
+                    self._remove(key)
+                    reclaimed += 1
+                    if self.notifier is not None:
+                        self.notifier.emit("expired", key)
+            self.expired += reclaimed
+            hold_ms = (time.perf_counter() - start) * 1000
+        return reclaimed, limit is not None and len(expired) >= limit, hold_ms
+
+
+    def _take_marks(self, limit: int | None) -> list[str]:
+        marks = self.expired_marks
+        taken = []
+        while marks and (limit is None or len(taken) < limit):
+            taken.append(marks.popleft())
+        return taken
+
+
+    def __len__(self):
+        # With read_optimized, expired keys stay counted until cleanup deletes them
+        return len(self.store)
+
+
+class InMemoryKVStore:
+    def __init__(self, cleanup_interval = 1, num_shards = 1, expiry_backend = "heap",
+                 cleanup_budget_ms = None, cleanup_batch_size = 200,
+                 max_keys = None, max_memory_bytes = None, eviction_policy = "lru",
+                 aof_path = None, aof_fsync = "everysec", snapshot_path = None,
+                 clock_source = "monotonic", clock_resolution_ms = None, compact = False,
+                 read_optimized = False):
+        # Every shard has its own lock, so writers on different shards never wait on each other.
+        # num_shards = 1 behaves exactly like a single global lock.
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        if compact and read_optimized:
+            # A compact entry is two dict slots: a lock-free get could pair a value with another put's expiry
+            raise ValueError("compact and read_optimized cannot be used together")
+        # All expiry math uses this clock (see clock.py). The default monotonic source is immune to
+        # wall-clock jumps; clock_resolution_ms turns every read on the hot path into an attribute read.
+        self.clock = Clock(clock_source, clock_resolution_ms)
+        # expiry_backend: "heap" (lazy, stale entries on overwrite) or "timing_wheel" (O(1) reschedule)
+        # max_keys / max_memory_bytes are split evenly across shards, each evicts on its own.
+        # eviction_policy: "lru", "lfu" or "volatile-ttl" (see eviction.py)
+        shard_max_keys = -(-max_keys // num_shards) if max_keys is not None else None
+        shard_max_bytes = -(-max_memory_bytes // num_shards) if max_memory_bytes is not None else None
+        # compact = True stores values and expiries in separate dicts, fewer bytes per key (see compact.py)
+        # read_optimized = True: get never takes the shard lock, expired keys it finds are left to cleanup.
+        # Writers still take the lock. Meant for read-heavy workloads, see Shard._read
+        self.shards = [Shard(expiry_backend, shard_max_keys, shard_max_bytes, eviction_policy, self.clock, compact,
+                             read_optimized)
+                       for _ in range(num_shards)]
+        self.num_shards = num_shards
         self.cleanup_interval = cleanup_interval
+        # cleanup_budget_ms = None sweeps everything in one go. Otherwise every tick works for at most
+        # cleanup_budget_ms and releases the shard lock after each batch of cleanup_batch_size keys.
+        self.cleanup_budget_ms = cleanup_budget_ms
+        self.cleanup_batch_size = cleanup_batch_size
+        self.cleanup_stats = CleanupStats()
         self.running = True
+        self._stopped = threading.Event()
+        self.notifier = None
+        self._subscribe_lock = threading.Lock()
+
+        # Optional snapshot: mapped right away and copied into the shards by a background thread,
+        # keys not copied yet are read straight from the mapped file
+        self._hydrated = threading.Event()
+        self.snapshot_path = snapshot_path
+        self._snapshot_lock = threading.Lock() # one save_snapshot at a time, for the AOF cut
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            reader = SnapshotReader(snapshot_path)
+            for shard in self.shards:
+                shard.snapshot = reader
+            threading.Thread(target=self._hydrate_snapshot, args=(reader,), daemon=True).start()
+        else:
+            self._hydrated.set()
+
+        # Optional append-only file, applied on top of the snapshot: replayed here, then every put / delete is appended to it.
+        # aof_fsync: "always", "everysec" or "never" (see persistence.py)
+        self.aof = None
+        if aof_path is not None:
+            self._load_aof(aof_path)
+            self.aof = AppendOnlyFile(aof_path, aof_fsync, snapshot=self._live_items, to_wall=self.clock.to_wall)
+            for shard in self.shards:
+                shard.aof = self.aof
 
         # Start background cleanup thread
         self.cleanup_thread = threading.Thread(target=self._background_cleanup, daemon=True)
         self.cleanup_thread.start()
 
 
-    def put(self, key: str, value: str, ttl: int):
-        # O (log N) due to heap
-        expiry_time = current_millis() + ttl
-        with self.lock:
-            self.store[key] = (value, expiry_time)
-            heapq.heappush(self.min_heap, (expiry_time, key))
+    def _shard_for(self, key: str) -> Shard:
+        if self.num_shards == 1:
+            return self.shards[0]
+        return self.shards[hash(key) % self.num_shards]
+
+
+    def put(self, key: str, value: str, ttl: int | None = None):
+        # O(log N) with the heap backend, N being the size of one shard. O(1) with the timing wheel
+        # ttl = None keeps the key until it is deleted or evicted
+        if ttl is None:
+            expiry_time = NO_EXPIRY
+        else:
+            clock = self.clock
+            expiry_time = (clock.now_ms if clock.coarse else clock.read()) + ttl
+        self._shard_for(key).put(key, value, expiry_time)
+        self._after_write()
 
 
     def get(self, key: str) -> str | None:
         # O(1)
-        with self.lock:
-            if key not in self.store:
-                return None
-            value, expiry = self.store[key]
-            if expiry < current_millis():
-                del self.store[key]
-                return None
-            return value
+        clock = self.clock
+        return self._shard_for(key).get(key, clock.now_ms if clock.coarse else clock.read())
         
     
     def delete(self, key: str):
-        with self.lock:
-            if key in self.store:
-                del self.store[key]
+        self._shard_for(key).delete(key)
+        self._after_write()
+
+
+    def _after_write(self):
+        # No shard lock is held here.
+        # With aof_fsync="always" a write returns once its group is fsynced.
+        if self.aof is not None and self.aof.fsync == "always":
+            self.aof.wait_durable()
+        # A "block" subscriber that fell behind holds writers back here
+        if self.notifier is not None and self.notifier.blocking:
+            self.notifier.wait_for_room()
+
+
+    def subscribe(self, pattern: str | None = None, events: set[str] | None = None,
+                  capacity: int = 1024, overflow: str = "drop") -> Subscription:
+        # Keyspace notifications, see notifications.py. Only changes after this call are delivered.
+        with self._subscribe_lock:
+            if self.notifier is None:
+                self.notifier = Notifier()
+                for shard in self.shards:
+                    shard.notifier = self.notifier
+        return self.notifier.subscribe(pattern, events, capacity, overflow)
+
+
+    def _positions_by_shard(self, keys: list[str]) -> dict[int, list[int]]:
+        # shard index -> positions in keys, so every shard is locked once per batch
+        positions = {}
+        for position, key in enumerate(keys):
+            positions.setdefault(hash(key) % self.num_shards, []).append(position)
+        return positions
+
+
+    def get_many(self, keys: list[str]) -> list[str | None]:
+        # One clock read and one lock acquisition per shard; values come back in input order
+        now = self.clock.now()
+        if self.num_shards == 1:
+            return self.shards[0].get_many(keys, now)
+        values = [None] * len(keys)
+        for shard_index, positions in self._positions_by_shard(keys).items():
+            shard_values = self.shards[shard_index].get_many([keys[p] for p in positions], now)
+            for position, value in zip(positions, shard_values):
+                values[position] = value
+        return values
+
+
+    def put_many(self, items: dict[str, str] | list[tuple[str, str]], ttl: int | None = None):
+        # Same ttl for the whole batch
+        expiry_time = NO_EXPIRY if ttl is None else self.clock.now() + ttl
+        items = list(items.items()) if isinstance(items, dict) else list(items)
+        if self.num_shards == 1:
+            self.shards[0].put_many(items, expiry_time)
+        else:
+            keys = [key for key, _ in items]
+            for shard_index, positions in self._positions_by_shard(keys).items():
+                self.shards[shard_index].put_many([items[p] for p in positions], expiry_time)
+        self._after_write()
+
+
+    def delete_many(self, keys: list[str]) -> int:
+        # Returns how many of the keys were removed
+        if self.num_shards == 1:
+            removed = self.shards[0].delete_many(keys)
+        else:
+            removed = 0
+            for shard_index, positions in self._positions_by_shard(keys).items():
+                removed += self.shards[shard_index].delete_many([keys[p] for p in positions])
+        self._after_write()
+        return removed
+
+
+    def _load_aof(self, path: str):
+        # Entries already expired are skipped. Expiry times on disk are wall-clock.
+        now = self.clock.now()
+        for op, key, value, expiry_time in replay(path):
+            shard = self._shard_for(key)
+            if expiry_time is not None:
+                expiry_time = self.clock.from_wall(expiry_time)
+            with shard.lock:
+                if op == "P" and (expiry_time is None or expiry_time >= now):
+                    shard._put(key, value, NO_EXPIRY if expiry_time is None else expiry_time)
+                else:
+                    shard._delete(key)
+
+
+    def _hydrate_snapshot(self, reader: SnapshotReader, chunk_size: int = 10_000):
+        # Decodes keys chunk by chunk and takes every shard lock once per chunk. Values stay lazy.
+        now = self.clock.now()
+        for start in range(0, len(reader), chunk_size):
+            entries_by_shard = {}
+            for key, value, expiry_time in reader.entries(start, min(start + chunk_size, len(reader))):
+                if expiry_time is None:
+                    expiry_time = NO_EXPIRY
+                else:
+                    expiry_time = self.clock.from_wall(expiry_time)
+                    if expiry_time < now:
+                        continue
+                entries_by_shard.setdefault(hash(key) % self.num_shards, []).append((key, value, expiry_time))
+            for shard_index, entries in entries_by_shard.items():
+                shard = self.shards[shard_index]
+                with shard.lock:
+                    for key, value, expiry_time in entries:
+                        shard._hydrate(key, value, expiry_time)
+        for shard in self.shards:
+            with shard.lock:
+                shard.snapshot = None
+                shard.shadowed = set()
+        self._hydrated.set()
+
+
+    def _live_items(self):
+        # Used by AOF rewrite: copies one shard at a time under its lock, yields outside of it
+        self._hydrated.wait()
+        now = self.clock.now()
+        for shard in self.shards:
+            with shard.lock:
+                items = list(shard.store.items())
+            for key, (value, expiry_time) in items:
+                if expiry_time >= now:
+                    if type(value) is LazyValue:
+                        value = value.decode()
+                    yield key, value, None if expiry_time == NO_EXPIRY else self.clock.to_wall(expiry_time)
+
+
+    def save_snapshot(self, path: str):
+        # Point-in-time view: all shard locks are held only while the dicts are copied,
+        # encoding and writing happen after writers are let go.
+        # A snapshot to the store's own snapshot_path is what a restart loads, so the AOF is then cut to the
+        # records written after the copy; a snapshot anywhere else leaves the AOF whole.
+        with self._snapshot_lock:
+            cut_aof = (self.aof is not None and self.snapshot_path is not None
+                       and os.path.abspath(path) == os.path.abspath(self.snapshot_path))
+            self._hydrated.wait()
+            for shard in self.shards:
+                shard.lock.acquire()
+            try:
+                copies = [shard.store.copy() for shard in self.shards]
+                if cut_aof:
+                    self.aof.mark_snapshot()
+            finally:
+                for shard in self.shards:
+                    shard.lock.release()
+            self._write_snapshot(path, copies)
+            if cut_aof:
+                self.aof.snapshot_saved()
+
+
+    def _write_snapshot(self, path: str, copies: list):
+        # Encodes the shard copies outside of every lock
+        now = self.clock.now()
+        entries = []
+        for copy in copies:
+            for key, (value, expiry_time) in copy.items():
+                if expiry_time >= now:
+                    if type(value) is LazyValue:
+                        value = value.decode()
+                    entries.append((key, value, None if expiry_time == NO_EXPIRY else self.clock.to_wall(expiry_time)))
+        write_snapshot(path, entries)
+
+
+    def rewrite_aof(self):
+        # Compact the append-only file in the background
+        if self.aof is not None:
+            self.aof.rewrite()
 
     
     def _background_cleanup(self):
+        # Like Redis active expiry: while ticks leave expired keys behind, run them faster and faster
+        interval = self.cleanup_interval
         while self.running:
-            self.cleanup()
-            time.sleep(self.cleanup_interval)
+            if self.cleanup():
+                interval = max(interval / 2, 0.001)
+            else:
+                interval = self.cleanup_interval
+            self._stopped.wait(interval)
 
 
-    def cleanup(self):
-        # Background thread calls this
-        with self.lock:
-            while self.min_heap and self.min_heap[0][0] < current_millis():
-                _, key = heapq.heappop(self.min_heap)
-                if key in self.store and self.store[key][1] < current_millis():
-                    del self.store[key]
+    def cleanup(self) -> bool:
+        # Background thread calls this, locking one shard at a time. Returns True if expired keys are left.
+        if self.cleanup_budget_ms is None:
+            reclaimed, max_hold_ms = 0, 0.0
+            for shard in self.shards:
+                shard_reclaimed, _, hold_ms = shard.cleanup(self.clock.now())
+                reclaimed += shard_reclaimed
+                max_hold_ms = max(max_hold_ms, hold_ms)
+            self.cleanup_stats.record_tick(reclaimed, max_hold_ms, False)
+            return False
+        return self._incremental_cleanup()
+
+
+    def _incremental_cleanup(self) -> bool:
+        # Round robin over shards in small batches until the time budget is spent
+        deadline = time.perf_counter() + self.cleanup_budget_ms / 1000
+        now = self.clock.now()
+        pending = list(self.shards)
+        reclaimed, max_hold_ms = 0, 0.0
+        while pending and time.perf_counter() < deadline:
+            still_pending = []
+            for index, shard in enumerate(pending):
+                shard_reclaimed, more, hold_ms = shard.cleanup(now, self.cleanup_batch_size)
+                reclaimed += shard_reclaimed
+                max_hold_ms = max(max_hold_ms, hold_ms)
+                if more:
+                    still_pending.append(shard)
+                if time.perf_counter() >= deadline:
+                    still_pending.extend(pending[index + 1:])
+                    break
+            pending = still_pending
+        backlog = bool(pending)
+        self.cleanup_stats.record_tick(reclaimed, max_hold_ms, backlog)
+        return backlog
+
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+
+    def stats(self) -> dict:
+        # Summed over shards. Counters are read without the shard locks, so they are a close estimate.
+        hits = sum(shard.hits for shard in self.shards)
+        misses = sum(shard.misses for shard in self.shards)
+        return {
+            "keys": len(self),
+            # Value sizes are only tracked when max_memory_bytes is set
+            "used_bytes": sum(shard.used_bytes for shard in self.shards) if self.shards[0].track_memory else None,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": sum(shard.evictions for shard in self.shards),
+            "expired": sum(shard.expired for shard in self.shards),
+        }
 
     
     def stop(self):
         self.running = False
+        self._stopped.set()
         self.cleanup_thread.join()
+        if self.aof is not None:
+            self.aof.close()
+        if self.notifier is not None:
+            self.notifier.close()
+        self.clock.stop()
 
 
 # ------------------- TEST CASE -------------------
@@ -1,7 +1,15 @@
+from collections import deque
 from enum import Enum
 from datetime import datetime, timedelta
+from itertools import product
 from typing import List, Optional, Dict
 
+from LibraryManagementSystem.search_index import InvertedIndex, tokenize
+from LibraryManagementSystem.suggest import PrefixIndex, WordCorrector
+
+# To run, python3 -m LibraryManagementSystem.basic_with_reservation command from one level above
+# LibraryManagementSystem folder.
+
 
 """
 BOOK CLASSES - States, Book, and BookItem
@@ -127,8 +135,6 @@ class Reservation:
         self.timestamp = timestamp or datetime.now()
 
 
-from collections import deque
-
 class ReservationManager:
     def __init__(self):
         # Maps book title -> queue of Reservation objects
@@ -180,45 +186,105 @@ class Library:
 
 
 
+FUZZY_ALTERNATIVES = 3 # closest words tried for a mistyped word
+FUZZY_VARIANTS = 8 # corrected queries run, fewest edits first
+
 class Catalog:
     def __init__(self):
         self.books_by_title = {}
         self.books_by_author = {}
         self.books_by_subject = {}
+        self.books: List[Book] = [] # position = book number in the search index
+        self.index = InvertedIndex() # words of title, author, subject, publisher (search_index.py)
+        # Search box: completions of titles / authors, corrections of mistyped words (suggest.py)
+        self.title_prefixes = PrefixIndex(self.books_by_title)
+        self.author_prefixes = PrefixIndex(self.books_by_author)
+        self.corrector = WordCorrector()
 
     def add_book(self, book: Book):
         # dict_name.setdefault(key, value)
         self.books_by_title.setdefault(book.title.lower(), []).append(book)
         self.books_by_author.setdefault(book.author.lower(), []).append(book)
         self.books_by_subject.setdefault(book.subject.lower(), []).append(book)
+        self.books.append(book)
+        for word in self.index.add(len(self.books) - 1, book):
+            self.corrector.add(word)
+        self.title_prefixes.add(book.title.lower())
+        self.author_prefixes.add(book.author.lower())
 
+    # Exact match on the whole title / author / subject, any case
     def search_by_title(self, title: str):
-        return self.search_by_title.get(title.lower(), [])
+        return self.books_by_title.get(title.lower(), [])
     
     def search_by_author(self, author: str):
-        return self.search_by_author.get(author.lower(), [])
+        return self.books_by_author.get(author.lower(), [])
     
     def search_by_subject(self, subject: str):
-        return self.search_by_subject.get(subject.lower(), [])
+        return self.books_by_subject.get(subject.lower(), [])
+
+    def search(self, query: str, mode: str = "and", fields: Optional[List[str]] = None, limit: Optional[int] = 10) -> List[Book]:
+        # Books with the words of the query anywhere in their title, author, subject or publisher, best match
+        # first. mode "and": every word, "or": any word. fields: only look in these, e.g. ["author"]
+        return [self.books[number] for _, number in self.index.search(query, mode, fields, limit)]
+
+    def autocomplete(self, prefix: str, field: str = "title", limit: int = 10) -> List[str]:
+        # Titles (or authors) starting with what was typed so far, the ones with the most books first
+        if field not in ("title", "author"):
+            raise Exception(f"No autocomplete found for field: {field}")
+        prefixes, books_by_key = ((self.title_prefixes, self.books_by_title) if field == "title"
+                                  else (self.author_prefixes, self.books_by_author))
+        return [getattr(books_by_key[key][0], field) for key in prefixes.complete(prefix, limit)]
+
+    def fuzzy_search(self, query: str, fields: Optional[List[str]] = None, limit: int = 10, max_distance: Optional[int] = None) -> List[Book]:
+        # search() forgiving typos: a word not in the catalog is replaced by its closest words (at most
+        # FUZZY_ALTERNATIVES of them, the most common first). Fewer edits first, then best match.
+        alternatives = []
+        for word in dict.fromkeys(tokenize(query)):
+            corrections = self.corrector.corrections(word, max_distance) # [(0, word)] if in the catalog
+            corrections.sort(key=lambda correction: -self.index.document_frequency(correction[1]))
+            if corrections: # a word with no close word is left out of the query
+                alternatives.append(corrections[:FUZZY_ALTERNATIVES])
+        variants = sorted(((sum(edits for edits, _ in variant), [word for _, word in variant])
+                           for variant in product(*alternatives)), key=lambda variant: variant[0])
+        found = {} # book number -> (edits, -score)
+        for edits, words in variants[:FUZZY_VARIANTS]:
+            if found and len(found) >= limit and edits > max(rank[0] for rank in found.values()):
+                break # every book still to come has more edits than the ones found
+            for score, number in self.index.search(" ".join(words), "and", fields, limit):
+                found.setdefault(number, (edits, -score))
+        return [self.books[number] for number in sorted(found, key=lambda number: (found[number], number))[:limit]]
         
         
 
-
-book = Book("Sapiens", "Yuval Harari", "History", "Penguin")
-copy1 = BookItem("B001", book, "Rack-1")
-book.add_book_item(copy1)
-
-alice = Member("alice123", "pass", "Alice", "alice@example.com")
-bob = Member("bob456", "pass", "Bob", "bob@example.com")
-
-library = Library()
-library.catalog.add_book(book)
-library.add_member(alice)
-library.add_member(bob)
-
-alice.borrow_book(copy1)              # Alice borrows
-bob.reserve_book(book, library)      # Bob reserves
-alice.return_book(copy1, library)    # Bob gets it reserved
+if __name__ == "__main__":
+    book = Book("Sapiens", "Yuval Harari", "History", "Penguin")
+    copy1 = BookItem("B001", book, "Rack-1")
+    book.add_book_item(copy1)
+
+    alice = Member("alice123", "pass", "Alice", "alice@example.com")
+    bob = Member("bob456", "pass", "Bob", "bob@example.com")
+
+    library = Library()
+    library.catalog.add_book(book)
+    library.catalog.add_book(Book("Homo Deus", "Yuval Noah Harari", "History", "Harvill Secker"))
+    library.catalog.add_book(Book("A Brief History of Time", "Stephen Hawking", "Physics", "Bantam"))
+    library.add_member(alice)
+    library.add_member(bob)
+
+    alice.borrow_book(copy1)              # Alice borrows
+    bob.reserve_book(book, library)      # Bob reserves
+    alice.return_book(copy1, library)    # Bob gets it reserved
+
+    print([b.title for b in library.catalog.search_by_author("yuval harari")]) # ['Sapiens']
+    print([b.title for b in library.catalog.search("harari history")])         # both Harari books
+    print([b.title for b in library.catalog.search("history", fields=["title"])]) # ['A Brief History of Time']
+    print([b.title for b in library.catalog.search("hawking sapiens", mode="or")])
+    print(library.catalog.autocomplete("yu", field="author"))                  # ['Yuval Harari', 'Yuval Noah Harari']
+    print([b.title for b in library.catalog.fuzzy_search("stephen hawkins")])  # ['A Brief History of Time']
+    print([b.title for b in library.catalog.fuzzy_search("hraari", fields=["author"])])
+    assert library.catalog.search("history", limit=0) == [] # nothing asked for, nothing to rank
+    assert library.catalog.search("harari history", limit=0) == []
+    assert library.catalog.fuzzy_search("hawkins", limit=0) == []
 
 
 
@@ -0,0 +1,185 @@
+"""
+Benchmarks for the library catalog search.
+
+To run, python3 -m LibraryManagementSystem.benchmark [name ...] command from one level above
+LibraryManagementSystem folder. Without a name every benchmark runs.
+"""
+from itertools import accumulate
+import random
+import resource
+import statistics
+import sys
+import time
+
+from LibraryManagementSystem.basic_with_reservation import Book, Catalog
+from LibraryManagementSystem.search_index import tokenize
+from LibraryManagementSystem.suggest import default_distance, edit_distance
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "ten", "vo", "shi", "del", "an", "or", "bel", "qu", "zan", "ti", "mor",
+             "ef", "gra", "ny", "pol", "sun", "ith", "ver", "do", "ce"]
+STOP_WORDS = ["the", "of", "and", "a", "in", "to"]
+
+
+def make_words(count: int, rng: random.Random) -> list[str]:
+    # count different made-up words of 2 to 4 syllables
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def build_catalog(num_books: int, seed: int = 1, vocabulary: int = 50_000) -> tuple[Catalog, float]:
+    # Titles of 2-6 words drawn Zipf-like from the vocabulary (a few very common, most rare) plus stop
+    # words; 200k authors, 300 subjects, 200 publishers. Returns the catalog and seconds spent in add_book.
+    rng = random.Random(seed)
+    words = make_words(vocabulary, rng)
+    cumulative = list(accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+    first_names = [word.capitalize() for word in make_words(2_000, rng)]
+    last_names = [word.capitalize() for word in make_words(50_000, rng)]
+    authors = [f"{rng.choice(first_names)} {rng.choice(last_names)}" for _ in range(200_000)]
+    subjects = [" ".join(rng.sample(words[:2_000], rng.randint(1, 2))).title() for _ in range(300)]
+    publishers = [f"{rng.choice(last_names)} {rng.choice(['Press', 'Books', 'House', 'Publishing'])}" for _ in range(200)]
+
+    catalog = Catalog()
+    adding = 0.0
+    batch = 100_000
+    for first in range(0, num_books, batch):
+        books = []
+        for _ in range(min(batch, num_books - first)):
+            title_words = rng.choices(words, cum_weights=cumulative, k=rng.randint(2, 6))
+            if rng.random() < 0.4:
+                title_words.insert(rng.randrange(len(title_words)), rng.choice(STOP_WORDS))
+            books.append(Book(" ".join(title_words).title(), rng.choice(authors), rng.choice(subjects), rng.choice(publishers)))
+        start = time.perf_counter()
+        for book in books:
+            catalog.add_book(book)
+        adding += time.perf_counter() - start
+    return catalog, adding
+
+
+def time_queries(catalog: Catalog, queries: list[str], **options) -> tuple[float, float, float]:
+    # Median and worst latency in ms and mean number of hits (before limit)
+    latencies, hits = [], []
+    for query in queries:
+        start = time.perf_counter()
+        catalog.search(query, **options)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        hits.append(len(catalog.search(query, limit=None, **options)))
+    return statistics.median(latencies), max(latencies), statistics.mean(hits)
+
+
+def bench_search(num_books=5_000_000, num_queries=50):
+    """Query latency by kind of query on a large catalog, against scanning every book."""
+    print(f"--- search: {num_books:,} books, top 10 of each query ---")
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    catalog, adding = build_catalog(num_books)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = catalog.index
+    parts = [numbers for word_parts in index.postings.values() for numbers in word_parts.values()]
+    print(f"add_book {adding / num_books * 1e6:.1f} us per book (exact-match dicts + index), "
+          f"{len(index.postings):,} words, {sum(map(len, parts)):,} postings in "
+          f"{sum(len(numbers) * numbers.itemsize for numbers in parts) / 2**20:,.0f} MB of arrays, "
+          f"process grew {(rss_after - rss_before) / 1024:,.0f} MB")
+
+    rng = random.Random(3)
+    by_frequency = sorted(index.postings, key=index.document_frequency)
+    rare = by_frequency[:len(by_frequency) // 2] # in a handful of books
+    middle = by_frequency[len(by_frequency) // 2:-200]
+    common = by_frequency[-200:] # stop words, top title words, subjects, publishers
+    authors = [book.author for book in rng.sample(catalog.books, num_queries)]
+    kinds = [
+        ("1 rare word", [rng.choice(rare) for _ in range(num_queries)], {}),
+        ("1 common word", [rng.choice(common) for _ in range(num_queries)], {}),
+        ("author name, author field", authors, {"fields": ["author"]}),
+        ("rare AND common", [f"{rng.choice(rare)} {rng.choice(common)}" for _ in range(num_queries)], {}),
+        ("2 mid words AND", [f"{rng.choice(middle)} {rng.choice(middle)}" for _ in range(num_queries)], {}),
+        ("2 common words AND", [f"{rng.choice(common)} {rng.choice(common)}" for _ in range(num_queries)], {}),
+        ("3 mid words OR", [" ".join(rng.choices(middle, k=3)) for _ in range(num_queries)], {"mode": "or"}),
+        ("2 common words OR", [f"{rng.choice(common)} {rng.choice(common)}" for _ in range(num_queries)], {"mode": "or"}),
+    ]
+    for name, queries, options in kinds:
+        median, worst, hits = time_queries(catalog, queries, **options)
+        print(f"  {name:<28} median {median:8.3f} ms, worst {worst:8.3f} ms, {hits:>12,.0f} hits on average")
+
+    # What a search without the index costs: look at every book's words once
+    word = rng.choice(rare)
+    start = time.perf_counter()
+    found = [book for book in catalog.books
+             if word in tokenize(f"{book.title} {book.author} {book.subject} {book.publisher}")]
+    print(f"  scan of every book for 1 word: {(time.perf_counter() - start) * 1e3:,.0f} ms ({len(found)} hits)")
+
+
+def typo(word: str, rng: random.Random) -> str:
+    # One slip of the finger: a letter replaced, dropped, doubled or swapped with the next
+    i = rng.randrange(len(word) - 1)
+    kind = rng.choice(["replace", "drop", "double", "swap"])
+    if kind == "replace":
+        return word[:i] + rng.choice([c for c in "aeioulnrst" if c != word[i]]) + word[i + 1:]
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def bench_suggest(num_books=5_000_000, num_queries=200, typed=8):
+    """Search box on a large catalog: completions on every keystroke, and lookups with a typo."""
+    print(f"--- suggest: {num_books:,} books, completions of the first {typed} keystrokes, lookups with one typo ---")
+    catalog, adding = build_catalog(num_books)
+    print(f"add_book {adding / num_books * 1e6:.1f} us per book, {len(catalog.title_prefixes):,} titles in "
+          f"{len(catalog.title_prefixes.runs)} runs ({len(catalog.title_prefixes.top):,} wide prefixes), "
+          f"{len(catalog.author_prefixes):,} authors, {len(catalog.corrector.words):,} words")
+
+    rng = random.Random(4)
+    for field in ("title", "author"):
+        typing = [getattr(book, field) for book in rng.sample(catalog.books, num_queries)]
+        for attempt in ("first", "again"): # the first time a wide prefix is asked for it is ranked in full
+            latencies = [[] for _ in range(typed)]
+            for text in typing:
+                for length in range(1, typed + 1):
+                    start = time.perf_counter()
+                    catalog.autocomplete(text[:length], field)
+                    latencies[length - 1].append((time.perf_counter() - start) * 1e3)
+            print(f"  {field:<6} {attempt:<5} " + ", ".join(
+                f"{length + 1}: {statistics.median(times):.3f}/{max(times):.2f}" for length, times in enumerate(latencies))
+                  + " ms (median/worst by letters typed)")
+
+    authors = [book.author for book in rng.sample(catalog.books, num_queries)]
+    titles = [book for book in rng.sample(catalog.books, num_queries)]
+    cases = [
+        ("author, typo in last name", [(f"{author.split()[0]} {typo(author.split()[1], rng)}", author) for author in authors],
+         {"fields": ["author"]}, lambda book, author: book.author == author),
+        ("last name only, typo", [(typo(author.split()[1], rng), author) for author in authors],
+         {"fields": ["author"]}, lambda book, author: book.author == author),
+        ("2 title words, 1 typo", [(" ".join([typo(words[0], rng)] + words[1:2]), book) for book in titles
+                                   for words in [sorted(tokenize(book.title), key=len, reverse=True)]],
+         {"fields": ["title"]}, lambda found, book: found is book),
+    ]
+    for name, queries, options, wanted in cases:
+        latencies, hits = [], 0
+        for query, target in queries:
+            start = time.perf_counter()
+            found = catalog.fuzzy_search(query, **options)
+            latencies.append((time.perf_counter() - start) * 1e3)
+            hits += any(wanted(book, target) for book in found)
+        print(f"  {name:<26} median {statistics.median(latencies):6.3f} ms, worst {max(latencies):7.3f} ms, "
+              f"right book in the top 10 for {hits / len(queries):.0%}")
+
+    # What the trigram filter saves: edit distance to every author name instead
+    query = typo(authors[0], rng).lower()
+    start = time.perf_counter()
+    close = [author for author in catalog.books_by_author
+             if edit_distance(query, author, default_distance(query)) <= default_distance(query)]
+    print(f"  edit distance to every one of {len(catalog.books_by_author):,} authors: "
+          f"{(time.perf_counter() - start) * 1e3:,.0f} ms ({len(close)} close)")
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "suggest": bench_suggest,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(BENCHMARKS):
+        BENCHMARKS[name]()
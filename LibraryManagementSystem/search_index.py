@@ -0,0 +1,169 @@
+"""
+Full-text search over the catalog: an inverted index of the words in title, author, subject and publisher.
+
+Every book gets a number (its position in Catalog.books). Per word the index keeps its posting list split
+by field mask (one bit per field of FIELDS: the fields the word is in for that book), each part an
+array("I") of book numbers. Books are only ever appended, so add() appends to the end and every part stays
+sorted with no re-sorting; 4 bytes per posting, no Python object per entry.
+
+Ranking: each word a book matches adds idf * (sum of FIELD_WEIGHTS of the fields it is in), so a rare
+word counts more than a common one and a title match more than a publisher match. Equal scores keep
+catalog order. idf comes from the list lengths at query time, nothing is recomputed on add().
+All books of one part get the same score for the word, which is what the split is for:
+
+    and     books with every word. The books of the rarest word are walked part by part, best first,
+            and looked up in the parts of the others (bisect from where the last lookup ended), which
+            also tells their score. A part whose best possible score cannot make the top limit is not
+            walked, and a part is left at the first book that cannot: one common word costs O(limit)
+            instead of its whole list
+    or      books with any word, O(total length of the lists)
+    fields  only count a word found in these fields, e.g. ["author"]
+
+Words are \\w+ runs, lowercased. No stemming and no stop words: "the" is in the index with a low idf.
+"""
+from array import array
+from bisect import bisect_left
+import heapq
+import math
+from operator import itemgetter
+import re
+
+FIELDS = ["title", "author", "subject", "publisher"]
+FIELD_WEIGHTS = {"title": 3.0, "author": 2.0, "subject": 1.0, "publisher": 0.5}
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    words = text.lower().split()
+    if all(map(str.isalnum, words)): # no punctuation, the same words as the regex at half the cost
+        return words
+    return WORD.findall(text.lower())
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.postings = {} # word -> {field mask: array of book numbers, ascending}
+        self.size = 0 # books added
+        # Sum of the weights of the fields in a mask, for every mask
+        self.mask_weights = [sum(FIELD_WEIGHTS[field] for bit, field in enumerate(FIELDS) if mask >> bit & 1)
+                             for mask in range(1 << len(FIELDS))]
+
+
+    def add(self, number: int, book) -> list[str]:
+        # number: the book's position in the catalog, more than any added before. Returns the words the
+        # index did not have yet.
+        if number < self.size:
+            raise Exception(f"Book {number} added out of order, the index has {self.size} books")
+        masks = {}
+        get = masks.get
+        for bit, field in enumerate(FIELDS):
+            for word in tokenize(getattr(book, field)):
+                masks[word] = get(word, 0) | 1 << bit
+        postings = self.postings
+        new_words = []
+        for word, mask in masks.items():
+            parts = postings.get(word)
+            if parts is None:
+                parts = postings[word] = {}
+                new_words.append(word)
+            numbers = parts.get(mask)
+            if numbers is None:
+                numbers = parts[mask] = array("I")
+            numbers.append(number)
+        self.size = number + 1
+        return new_words
+
+
+    def document_frequency(self, word: str) -> int:
+        return sum(map(len, self.postings.get(word, {}).values()))
+
+
+    def _parts(self, word: str, field_mask: int) -> list[tuple]:
+        # (score the word gives, book numbers) per field mask it was seen with, best first.
+        # Masks with none of the fields asked for are left out.
+        idf = math.log(1 + self.size / self.document_frequency(word))
+        parts = [(idf * self.mask_weights[mask & field_mask], numbers)
+                 for mask, numbers in self.postings[word].items() if mask & field_mask]
+        parts.sort(key=itemgetter(0), reverse=True)
+        return parts
+
+
+    def search(self, query: str, mode: str = "and", fields: list | None = None, limit: int | None = 10) -> list[tuple]:
+        # (score, book number) best first, at most limit of them
+        if mode not in ("and", "or"):
+            raise Exception(f"No search mode found for name: {mode}")
+        if limit is not None and limit < 0:
+            raise Exception(f"Search limit must not be negative: {limit}")
+        if limit == 0:
+            return []
+        field_mask = 0
+        for field in fields or FIELDS:
+            if field not in FIELDS:
+                raise Exception(f"No search field found for name: {field}")
+            field_mask |= 1 << FIELDS.index(field)
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        if mode == "and":
+            if any(word not in self.postings for word in words):
+                return []
+            scores = self._search_and(words, field_mask, limit)
+        else:
+            scores = self._search_or([word for word in words if word in self.postings], field_mask)
+        # (score, -number): ties go to the book added first
+        if limit is None:
+            return [(score, -negative) for score, negative in sorted(scores, reverse=True)]
+        return [(score, -negative) for score, negative in heapq.nlargest(limit, scores)]
+
+
+    def _search_and(self, words: list[str], field_mask: int, limit: int | None) -> list[tuple]:
+        # The word in the fewest books drives: its books, best part first, are looked up in the parts of the
+        # other words (a bisect per part, starting where the last lookup ended) and scored by the parts they
+        # are found in. O(books of the rarest word * parts of the others) at worst. With a limit, a part is
+        # skipped once its best possible score cannot make the top limit, and left as soon as one of its
+        # books cannot (the ones after it lose the tie too).
+        word_parts = [self._parts(word, field_mask) for word in words]
+        if not all(word_parts):
+            return [] # a word not in any of the fields asked for
+        word_parts.sort(key=lambda parts: sum(len(numbers) for _, numbers in parts))
+        driver, others = word_parts[0], word_parts[1:]
+        scores = [] # with a limit a heap of the best (score, -number) so far, scores[0] the one to beat
+        for score, numbers in driver:
+            bound = score # the most a book of this part can score, summed in the same order as its total
+            for parts in others:
+                bound += parts[0][0]
+            if limit is not None and len(scores) == limit and bound < scores[0][0]:
+                break # parts come best first
+            starts = [[0] * len(parts) for parts in others]
+            for number in numbers:
+                if limit is not None and len(scores) == limit and (bound, -number) < scores[0]:
+                    break
+                total = score
+                for parts, hints in zip(others, starts):
+                    for i, (part_score, part_numbers) in enumerate(parts):
+                        position = bisect_left(part_numbers, number, hints[i])
+                        hints[i] = position # the next number is bigger, its search starts here
+                        if position < len(part_numbers) and part_numbers[position] == number:
+                            total += part_score
+                            break
+                    else:
+                        break # not in this word
+                else:
+                    if limit is None:
+                        scores.append((total, -number))
+                    elif len(scores) < limit:
+                        heapq.heappush(scores, (total, -number))
+                    elif (total, -number) > scores[0]:
+                        heapq.heapreplace(scores, (total, -number))
+        return scores
+
+
+    def _search_or(self, words: list[str], field_mask: int) -> list[tuple]:
+        totals = {}
+        get = totals.get
+        for word in words:
+            for score, numbers in self._parts(word, field_mask):
+                for number in numbers:
+                    totals[number] = get(number, 0.0) + score
+        return [(score, -number) for number, score in totals.items()]
+
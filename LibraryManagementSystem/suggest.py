@@ -0,0 +1,209 @@
+"""
+Search box helpers for the catalog: completing a title / author as it is typed, and finding words typed wrong.
+
+PrefixIndex, over the keys of Catalog.books_by_title or books_by_author (lowercased whole strings):
+    keys        sorted runs, merged like a binary counter: a new key is a run of one, and while the run
+                before is no longer it merges into it. About log2(keys) runs, O(log n) amortized per key,
+                no sort of the whole list on add
+    complete    the keys starting with the prefix are one bisect range per run. They are ranked by number
+                of books (then alphabetically); the count is len(books_by_key[key]), nothing is copied
+    top         a prefix matching more than `wide` keys keeps its best cache_size keys, kept up to date
+                on add. To know when a prefix gets there, keys are counted for the prefixes one letter
+                longer than a wide one (a short walk down the key on add); one crossing `wide` is ranked
+                from its wide + 1 keys once. So a completion reads a cached list or ranks no more than
+                `wide` keys, whatever was asked before
+
+WordCorrector, over the words of the search index (title, author, subject and publisher words): typos are
+corrected word by word, and the vocabulary is far smaller than the catalog.
+    filter      trigrams of "^^word$$" -> word ids, per position in the word and word length. A word within
+                d edits has at least (trigrams of the query - 4d) of the query's trigrams, each no more than
+                d positions away (an edit changes at most 3 trigrams, swapping two letters 4, and shifts
+                the rest by at most 1). Candidates are counted over those posting lists only, for lengths
+                within d, and no other word is looked at
+    verify      edit distance of each candidate, stopping once it is over d. Swapping two neighbouring
+                letters counts as one edit, a common typo ("hraari")
+    closest     words one edit away are looked for before two: with 4 trigrams an edit the filter for two
+                edits lets through many more words, and a word with one typo does not pay for that
+"""
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+import heapq
+from itertools import chain
+
+END = "\U0010ffff" # sorts after every character, prefix + END is past every key starting with prefix
+
+
+class PrefixIndex:
+    def __init__(self, books_by_key: dict, cache_size: int = 32, wide: int = 256):
+        # books_by_key: lowercased key -> books, the catalog's dict (not copied)
+        self.books_by_key = books_by_key
+        self.runs = [] # sorted lists of keys, every key in one of them, longest first
+        self.top = {} # wide prefix -> its best keys, at most cache_size
+        self.counts = {"": 0} # prefix -> keys starting with it, for the prefixes one letter longer than a wide one
+        self.cache_size = cache_size
+        self.wide = wide
+
+
+    def _rank(self, key: str) -> tuple:
+        # Smaller is better: more books first, then alphabetical
+        return (-len(self.books_by_key[key]), key)
+
+
+    def _range(self, prefix: str) -> list[str]:
+        # Keys starting with prefix, one bisect range per run
+        return list(chain.from_iterable(run[bisect_left(run, prefix):bisect_left(run, prefix + END)] for run in self.runs))
+
+
+    def add(self, key: str):
+        # After a book with this key went into books_by_key
+        books_by_key = self.books_by_key
+        count = len(books_by_key[key])
+        if count == 1: # new key
+            run = [key]
+            runs = self.runs
+            while runs and len(runs[-1]) <= len(run):
+                run = sorted(runs.pop() + run) # two sorted runs, sorted() merges them in one pass
+            runs.append(run)
+        top = self.top
+        for length in range(len(key) + 1): # from "", an empty box
+            prefix = key[:length]
+            entry = top.get(prefix)
+            if entry is None:
+                # The first prefix that is not wide: counted, as its parent is wide
+                if count == 1:
+                    self.counts[prefix] = self.counts.get(prefix, 0) + 1
+                    if self.counts[prefix] > self.wide:
+                        self._widen(prefix)
+                return
+            if len(entry) >= self.cache_size:
+                # Books are only added, so a key only moves up. One that does not beat the last of a full
+                # entry is not in it (it would be ahead of the last) and does not get in.
+                last = entry[-1]
+                last_count = len(books_by_key[last])
+                if count < last_count or (count == last_count and key > last):
+                    continue
+            if key in entry:
+                entry.sort(key=self._rank)
+            else:
+                insort(entry, key, key=self._rank)
+                del entry[self.cache_size:]
+
+
+    def _widen(self, prefix: str):
+        # prefix now has wide + 1 keys: rank them once, from now on add() keeps its best up to date.
+        # The prefixes one letter longer start being counted.
+        del self.counts[prefix]
+        keys = self._range(prefix)
+        self.top[prefix] = heapq.nsmallest(self.cache_size, keys, key=self._rank)
+        children = Counter(key[:len(prefix) + 1] for key in keys if len(key) > len(prefix))
+        self.counts.update(children)
+        for child, count in children.items():
+            if count > self.wide:
+                self._widen(child)
+
+
+    def __len__(self):
+        return sum(map(len, self.runs))
+
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        # Keys starting with prefix, best first. A wide prefix reads its cached best, any other one has
+        # no more than `wide` keys to rank.
+        prefix = prefix.lower()
+        entry = self.top.get(prefix)
+        if entry is not None and limit <= self.cache_size:
+            return entry[:limit]
+        return heapq.nsmallest(limit, self._range(prefix), key=self._rank)
+
+
+def trigrams(word: str) -> list[str]:
+    # The trigram starting at each position of "^^word$$"
+    padded = f"^^{word}$$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def default_distance(word: str) -> int:
+    # Edits allowed for a word typed: none for very short words, they match too much
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # Levenshtein distance with a swap of neighbouring letters as one edit; limit + 1 once it is over limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = current[j - 1] + 1
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if previous[j - 1] + (char_a != char_b) < cost:
+                cost = previous[j - 1] + (char_a != char_b)
+            if before is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b and before[j - 2] + 1 < cost:
+                cost = before[j - 2] + 1
+            current[j] = cost
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class WordCorrector:
+    def __init__(self):
+        self.words = [] # word id -> word
+        self.word_ids = {} # word -> word id
+        self.grams = {} # (trigram, position, word length) -> array of word ids
+        self.by_length = {} # word length -> array of word ids, when a word is too short to filter by trigrams
+
+
+    def add(self, word: str):
+        # A word new to the vocabulary
+        word_id = len(self.words)
+        self.words.append(word)
+        self.word_ids[word] = word_id
+        for position, gram in enumerate(trigrams(word)):
+            key = (gram, position, len(word))
+            ids = self.grams.get(key)
+            if ids is None:
+                ids = self.grams[key] = array("I")
+            ids.append(word_id)
+        self.by_length.setdefault(len(word), array("I")).append(word_id)
+
+
+    def corrections(self, word: str, max_distance: int | None = None) -> list[tuple[int, str]]:
+        # (edits, vocabulary word) for the words closest to word, all at the same number of edits, no more
+        # than max_distance; [] if there are none
+        if word in self.word_ids:
+            return [(0, word)]
+        if max_distance is None:
+            max_distance = default_distance(word)
+        for distance in range(1, max_distance + 1):
+            found = [(distance, candidate) for candidate in self._candidates(word, distance)
+                     if edit_distance(word, candidate, distance) == distance]
+            if found:
+                found.sort()
+                return found
+        return []
+
+
+    def _candidates(self, word: str, distance: int):
+        # Words that may be within distance edits of word: a superset, each one to be checked
+        lengths = range(max(1, len(word) - distance), len(word) + distance + 1)
+        grams = trigrams(word)
+        needed = len(grams) - 4 * distance
+        if needed <= 0: # too short for the trigrams to rule anything out
+            return (self.words[word_id] for length in lengths for word_id in self.by_length.get(length, ()))
+        shared = Counter()
+        get = self.grams.get
+        for position, gram in enumerate(grams):
+            for near in range(max(0, position - distance), position + distance + 1):
+                for length in lengths:
+                    ids = get((gram, near, length))
+                    if ids is not None:
+                        shared.update(ids)
+        return (self.words[word_id] for word_id, count in shared.items() if count >= needed)
@@ -0,0 +1,99 @@
+"""
+Which spot a car may take when the type it asked for is full, and which one it prefers.
+
+A car of type T may take the spot types of COMPATIBLE_TYPES[T], in that order (level 0 is T itself):
+Compact -> Large -> TruckSpot. A policy turns (level, distance from the gate) into a cost, the
+cheapest free spot wins:
+
+Policy              Cost                                Effect
+exact               only level 0                        the old behaviour, None when T is full
+prefer_exact        level first, then distance          a bigger spot only when no spot of the smaller type is free
+nearest             distance first, then level          the nearest spot the car fits in
+upgrade_penalty     distance + penalty * level          a bigger spot only when it is penalty closer
+
+SpotIndex.allocate_compatible answers any of them with one query: the top of each compatible type's heap
+is that type's nearest free spot, so comparing those (at most three) tops and popping the winner is
+O(log n), with no spot stored twice.
+"""
+from abc import ABC, abstractmethod
+
+COMPATIBLE_TYPES = {
+    "Handicapped": ["Handicapped"],
+    "Compact": ["Compact", "Large", "TruckSpot"],
+    "Large": ["Large", "TruckSpot"],
+    "TruckSpot": ["TruckSpot"],
+}
+
+DISTANCE_BITS = 32
+
+
+class AllocationPolicy(ABC):
+    def __init__(self, compatible_types: dict | None = None):
+        self.compatible_types = compatible_types or COMPATIBLE_TYPES
+
+
+    def spot_types(self, spot_type) -> list:
+        # Types a car asking for spot_type may take, preferred first
+        return self.compatible_types.get(spot_type, [spot_type])
+
+
+    @abstractmethod
+    def cost(self, level: int, distance: int) -> int:
+        # Must grow with distance and not shrink with level: the search stops at the first level whose
+        # cost at distance 0 is no better than the best spot found so far
+        pass
+
+
+class ExactTypePolicy(AllocationPolicy):
+    def spot_types(self, spot_type) -> list:
+        return [spot_type]
+
+
+    def cost(self, level: int, distance: int) -> int:
+        return distance
+
+
+class PreferExactPolicy(AllocationPolicy):
+    def cost(self, level: int, distance: int) -> int:
+        return level << DISTANCE_BITS | distance
+
+
+class NearestCompatiblePolicy(AllocationPolicy):
+    def cost(self, level: int, distance: int) -> int:
+        return distance << 8 | level # equal distance: the smaller type
+
+
+class UpgradePenaltyPolicy(AllocationPolicy):
+    def __init__(self, penalty: int = 100, compatible_types: dict | None = None):
+        # penalty: extra distance a bigger spot counts as, per level
+        super().__init__(compatible_types)
+        self.penalty = penalty
+
+
+    def cost(self, level: int, distance: int) -> int:
+        return (distance + self.penalty * level) << 8 | level
+
+
+class AllocationPolicyFactory:
+    _policies = {} # name -> policy, policies hold no state that changes
+
+    @staticmethod
+    def get_policy(name: str) -> AllocationPolicy:
+        policy = AllocationPolicyFactory._policies.get(name)
+        if policy is None:
+            policy = AllocationPolicyFactory._create(name)
+            AllocationPolicyFactory._policies[name] = policy
+        return policy
+
+    @staticmethod
+    def _create(name: str) -> AllocationPolicy:
+        if name == "exact":
+            return ExactTypePolicy()
+        elif name == "prefer_exact":
+            return PreferExactPolicy()
+        elif name == "nearest":
+            return NearestCompatiblePolicy()
+        elif name == "upgrade_penalty":
+            return UpgradePenaltyPolicy()
+        else:
+            raise Exception(f"No allocation policy found for name: {name}")
@@ -0,0 +1,128 @@
+"""
+Availability board: free / occupied counters per gate and spot type, kept up to date on every
+reserve and release instead of walking spot_id_map.
+
+A spot reachable from several gates counts at each of them. SpotIndex calls spot_added / spot_taken /
+spot_freed while it holds the spot type's lock, so the counters of a type change one spot at a time.
+
+Displays either poll snapshot() (one call for the whole board) or subscribe():
+    subscription = manager.subscribe_availability()
+    for changes in subscription:        # {(gate_id, spot_type): (free, occupied)}
+        ...
+Changes are coalesced per (gate, type): a display that falls behind gets the latest numbers in one
+dict, never a backlog, so a subscription holds at most gates x types entries.
+"""
+from collections import defaultdict
+import threading
+
+
+class AvailabilitySubscription:
+    def __init__(self, board: "AvailabilityBoard"):
+        self.board = board
+        self.pending = {} # (gate_id, spot_type) -> (free, occupied), latest value only
+        self.cond = threading.Condition()
+        self.closed = False
+
+
+    def _push(self, changes: dict):
+        with self.cond:
+            if not self.pending:
+                self.cond.notify_all() # a waiting display only needs waking for the first change
+            self.pending.update(changes)
+
+
+    def get_changes(self, timeout: float | None = None) -> dict:
+        # Waits for at least one change (or timeout / close) and returns everything changed since the last call
+        with self.cond:
+            if not self.pending and not self.closed:
+                self.cond.wait(timeout)
+            changes, self.pending = self.pending, {}
+        return changes
+
+
+    def __iter__(self):
+        while True:
+            changes = self.get_changes()
+            if not changes and self.closed:
+                return
+            yield changes
+
+
+    def close(self):
+        self.board.unsubscribe(self)
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class AvailabilityBoard:
+    def __init__(self):
+        self.free = defaultdict(int) # (gate_id, spot_type) -> free spots
+        self.total = defaultdict(int) # (gate_id, spot_type) -> spots
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+
+    def spot_added(self, gate_ids, spot_type, is_free: bool):
+        for gate_id in gate_ids:
+            self.total[(gate_id, spot_type)] += 1
+            if is_free:
+                self.free[(gate_id, spot_type)] += 1
+        self._publish(gate_ids, spot_type)
+
+
+    def spot_taken(self, gate_ids, spot_type):
+        for gate_id in gate_ids:
+            self.free[(gate_id, spot_type)] -= 1
+        self._publish(gate_ids, spot_type)
+
+
+    def spot_freed(self, gate_ids, spot_type):
+        for gate_id in gate_ids:
+            self.free[(gate_id, spot_type)] += 1
+        self._publish(gate_ids, spot_type)
+
+
+    def _publish(self, gate_ids, spot_type):
+        subscriptions = self.subscriptions
+        if not subscriptions:
+            return
+        changes = {}
+        for gate_id in gate_ids:
+            key = (gate_id, spot_type)
+            changes[key] = (self.free[key], self.total[key] - self.free[key])
+        for subscription in subscriptions:
+            subscription._push(changes)
+
+
+    def free_spots(self, gate_id, spot_type) -> int:
+        # O(1)
+        return self.free.get((gate_id, spot_type), 0)
+
+
+    def occupied_spots(self, gate_id, spot_type) -> int:
+        key = (gate_id, spot_type)
+        return self.total.get(key, 0) - self.free.get(key, 0)
+
+
+    def snapshot(self) -> dict:
+        # gate_id -> spot_type -> {"free": n, "occupied": n}. The caller holds the type locks
+        # (see SpotIndex.availability_board) for a board where no type is caught mid-change.
+        board = defaultdict(dict)
+        for (gate_id, spot_type), total in list(self.total.items()):
+            free = self.free[(gate_id, spot_type)]
+            board[gate_id][spot_type] = {"free": free, "occupied": total - free}
+        return dict(board)
+
+
+    def subscribe(self) -> AvailabilitySubscription:
+        subscription = AvailabilitySubscription(self)
+        with self.lock:
+            # Copy on write, publishers iterate the list without the lock
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+
+    def unsubscribe(self, subscription: AvailabilitySubscription):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
@@ -0,0 +1,684 @@
+"""
+Benchmarks for the ParkingLot allocation code.
+
+To run, python3 -m ParkingLot.benchmark_7 [name ...] command from one level above ParkingLot folder.
+Without a name every benchmark runs.
+"""
+import asyncio
+from datetime import datetime
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from ParkingLot.allocation_policy_14 import COMPATIBLE_TYPES, AllocationPolicyFactory
+from ParkingLot.journal_13 import LotJournal
+from ParkingLot.lot_registry_9 import LotRegistry, PartitionedLotRegistry
+from ParkingLot.parking_lot_manager_2 import Gate, ParkingLotManager
+from ParkingLot.parking_spot_1 import CompactSpot, HandicappedSpot, LargeSpot, TruckSpot
+from ParkingLot.parking_ticket_3 import ParkingTicket
+from ParkingLot.pricing_strategy_5 import DEFAULT_RATE_TABLE, PricingStrategyFactory, RateTable, np
+from ParkingLot.parking_terminal_4 import EntryTerminal, ExitTerminal
+from ParkingLot.simulator_12 import Scenario, VirtualClock, run_scenario, run_scenarios
+from ParkingLot.ticket_repository_11 import TicketRepository
+
+GATES = ["gate-A", "gate-B", "gate-C", "gate-D"]
+SPOT_CLASSES = [HandicappedSpot, CompactSpot, LargeSpot, TruckSpot]
+SPOT_MIX = [0.05, 0.6, 0.3, 0.05] # share of each spot class in the lot
+
+
+def build_lot(num_spots: int, seed: int = 1, manager: ParkingLotManager | None = None) -> ParkingLotManager:
+    # Fresh manager with num_spots spread over GATES, distances 1..1000. Spot ids start at 1 (0 would
+    # become a uuid), so the same seed builds the same lot in every run.
+    manager = manager or ParkingLotManager()
+    rng = random.Random(seed)
+    for gate_id in GATES:
+        manager.add_gate(Gate(gate_id, gate_id))
+    for i in range(num_spots):
+        spot_class = rng.choices(SPOT_CLASSES, SPOT_MIX)[0]
+        manager.add_parking_spot(GATES[i % len(GATES)], spot_class(spot_id=i + 1), rng.randint(1, 1000))
+    return manager
+
+
+def bench_churn(num_spots=50_000, num_events=2_000_000, target_occupancy=0.9):
+    """Entry / exit events on a nearly full lot. Before released spots were pushed back, every
+    spot could be handed out only once, so the lot reported "no spots" after one turnover."""
+    print(f"--- churn: {num_events:,} entry/exit events on {num_spots:,} spots, ~{target_occupancy:.0%} full ---")
+    manager = build_lot(num_spots)
+    rng = random.Random(2)
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    parked = [] # spot ids currently reserved
+    for spot_type in rng.choices(spot_types, SPOT_MIX, k=int(num_spots * target_occupancy)):
+        spot = manager.get_nearest_available_spot(rng.choice(GATES), spot_type)
+        if spot is not None:
+            parked.append(spot.spot_id)
+    rejected = 0
+
+    start = time.perf_counter()
+    for _ in range(num_events):
+        if len(parked) >= num_spots * target_occupancy or rng.random() < 0.5:
+            # A random car leaves
+            index = rng.randrange(len(parked))
+            parked[index], parked[-1] = parked[-1], parked[index]
+            manager.release_spot_by_id(parked.pop())
+        else:
+            spot_type = rng.choices(spot_types, SPOT_MIX)[0]
+            spot = manager.get_nearest_available_spot(rng.choice(GATES), spot_type)
+            if spot is None:
+                rejected += 1
+            else:
+                parked.append(spot.spot_id)
+    elapsed = time.perf_counter() - start
+
+    print(f"{num_events / elapsed:>12,.0f} events/s, {elapsed / num_events * 1e6:.2f} us/event, "
+          f"{rejected:,} entries rejected, {len(parked):,} cars parked at the end")
+
+
+def build_matrix_lot(num_spots: int, num_gates: int, seed: int = 1) -> ParkingLotManager:
+    # Every spot reachable from every gate: spots on a 1000 x 1000 grid, gates on its border,
+    # distance = manhattan distance
+    manager = ParkingLotManager()
+    rng = random.Random(seed)
+    gates = []
+    for g in range(num_gates):
+        position = g * 4000 // num_gates
+        side, offset = divmod(position, 1000)
+        x, y = [(offset, 0), (1000, offset), (1000 - offset, 1000), (0, 1000 - offset)][side]
+        gates.append((f"gate-{g}", x, y))
+        manager.add_gate(Gate(f"gate-{g}", f"gate-{g}"))
+    for i in range(num_spots):
+        x, y = rng.randrange(1000), rng.randrange(1000)
+        spot_class = rng.choices(SPOT_CLASSES, SPOT_MIX)[0]
+        manager.add_parking_spot_for_gates(spot_class(spot_id=i + 1),
+                                           {gate_id: abs(x - gx) + abs(y - gy) for gate_id, gx, gy in gates})
+    return manager
+
+
+def bench_gates(num_spots=50_000, gate_counts=(2, 8, 32), num_events=300_000, target_occupancy=0.9):
+    """Shared index: every spot has a distance to every gate, cars enter through random gates."""
+    print(f"--- gates: {num_events:,} entry/exit events, {num_spots:,} spots reachable from every gate ---")
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    for num_gates in gate_counts:
+        build_start = time.perf_counter()
+        manager = build_matrix_lot(num_spots, num_gates)
+        build_seconds = time.perf_counter() - build_start
+        gate_ids = list(manager.gates)
+        rng = random.Random(2)
+        parked = []
+        for spot_type in rng.choices(spot_types, SPOT_MIX, k=int(num_spots * target_occupancy)):
+            spot = manager.get_nearest_available_spot(rng.choice(gate_ids), spot_type)
+            if spot is not None:
+                parked.append(spot.spot_id)
+
+        entry_seconds = exit_seconds = 0.0
+        entries = exits = 0
+        for _ in range(num_events):
+            if len(parked) >= num_spots * target_occupancy or rng.random() < 0.5:
+                index = rng.randrange(len(parked))
+                parked[index], parked[-1] = parked[-1], parked[index]
+                spot_id = parked.pop()
+                start = time.perf_counter()
+                manager.release_spot_by_id(spot_id)
+                exit_seconds += time.perf_counter() - start
+                exits += 1
+            else:
+                gate_id, spot_type = rng.choice(gate_ids), rng.choices(spot_types, SPOT_MIX)[0]
+                start = time.perf_counter()
+                spot = manager.get_nearest_available_spot(gate_id, spot_type)
+                entry_seconds += time.perf_counter() - start
+                entries += 1
+                if spot is not None:
+                    parked.append(spot.spot_id)
+        heap_entries = sum(len(heap) for heaps in manager.spot_index.heaps.values() for heap in heaps.values())
+        print(f"gates={num_gates:>3} build {build_seconds:5.1f}s  entry {entry_seconds / entries * 1e6:5.2f} us  "
+              f"exit {exit_seconds / exits * 1e6:5.2f} us  heap entries {heap_entries / num_spots:5.2f} per spot")
+
+
+class AllocationChecker:
+    """Records who holds every spot and fails loudly if a spot is handed out twice."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.owner = {} # spot_id -> terminal holding it
+        self.allocations = 0
+
+    def allocated(self, spot_id, terminal):
+        with self.lock:
+            if spot_id in self.owner:
+                raise Exception(f"Spot {spot_id} given to {terminal} while held by {self.owner[spot_id]}")
+            self.owner[spot_id] = terminal
+            self.allocations += 1
+
+    def releasing(self, spot_id):
+        # Called before the release, afterwards another terminal may get the spot right away
+        with self.lock:
+            del self.owner[spot_id]
+
+    def verify(self, manager: ParkingLotManager):
+        reserved = sum(spot.is_reserved for spot in manager.spot_id_map.values())
+        if reserved != len(self.owner):
+            raise Exception(f"{reserved} spots reserved but {len(self.owner)} held by terminals")
+
+
+def _terminal_events(manager, checker, terminal, rng, gate_ids, spot_types, parked):
+    # One entry or exit; parked is the terminal's own list of spot ids
+    if parked and rng.random() < 0.5:
+        spot_id = parked.pop(rng.randrange(len(parked)))
+        checker.releasing(spot_id)
+        manager.release_spot_by_id(spot_id)
+    else:
+        spot = manager.get_nearest_available_spot(rng.choice(gate_ids), rng.choices(spot_types, SPOT_MIX)[0])
+        if spot is not None:
+            checker.allocated(spot.spot_id, terminal)
+            parked.append(spot.spot_id)
+
+
+def bench_terminals(num_spots=5_000, thread_counts=(1, 4, 16, 32), events_per_terminal=20_000, num_tasks=32):
+    """Stress test: many terminals allocating and releasing at once, no spot may be held twice.
+    The lot is small so terminals keep fighting over the same spots."""
+    print(f"--- terminals: concurrent entry/exit on {num_spots:,} spots, double allocation check ---")
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    for num_threads in thread_counts:
+        manager = build_matrix_lot(num_spots, 4)
+        gate_ids = list(manager.gates)
+        checker = AllocationChecker()
+        barrier = threading.Barrier(num_threads + 1)
+        errors = []
+
+        def terminal(index):
+            rng = random.Random(index)
+            parked = []
+            barrier.wait()
+            try:
+                for _ in range(events_per_terminal):
+                    _terminal_events(manager, checker, f"terminal-{index}", rng, gate_ids, spot_types, parked)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=terminal, args=(i,)) for i in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+        checker.verify(manager)
+        print(f"threads={num_threads:>3} {num_threads * events_per_terminal / elapsed:>10,.0f} events/s, "
+              f"{checker.allocations:,} allocations, no double allocation")
+
+    async def run_tasks():
+        manager = build_matrix_lot(num_spots, 4)
+        gate_ids = list(manager.gates)
+        checker = AllocationChecker()
+
+        async def terminal(index):
+            rng = random.Random(index)
+            parked = []
+            for _ in range(events_per_terminal):
+                _terminal_events(manager, checker, f"task-{index}", rng, gate_ids, spot_types, parked)
+                await asyncio.sleep(0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(terminal(i) for i in range(num_tasks)))
+        elapsed = time.perf_counter() - start
+        checker.verify(manager)
+        print(f"asyncio tasks={num_tasks:>3} {num_tasks * events_per_terminal / elapsed:>10,.0f} events/s, "
+              f"{checker.allocations:,} allocations, no double allocation")
+
+    asyncio.run(run_tasks())
+
+
+def bench_lots(num_lots=200, spots_per_lot=500, partition_counts=(1, 2, 4), num_events=20_000, num_threads=16):
+    """Operator-wide registry: entries / exits routed by lot, in process and across worker processes,
+    plus the cross-lot nearest free lot query."""
+    print(f"--- lots: {num_lots} lots x {spots_per_lot} spots, {num_threads} client threads "
+          f"({os.cpu_count()} CPUs) ---")
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    rng = random.Random(1)
+    lot_rows = {}
+    for lot in range(num_lots):
+        rows = []
+        for i in range(spots_per_lot):
+            spot_class = rng.choices(SPOT_CLASSES, SPOT_MIX)[0]
+            rows.append((spot_class(spot_id=i), {gate_id: rng.randint(1, 500) for gate_id in GATES}))
+        lot_rows[f"lot-{lot}"] = rows
+
+    def run(registry, label):
+        for lot_id, rows in lot_rows.items():
+            manager = registry.add_lot(lot_id, (rng.uniform(0, 100), rng.uniform(0, 100)))
+            for gate_id in GATES:
+                manager.add_gate(Gate(gate_id, gate_id))
+            if isinstance(registry, PartitionedLotRegistry):
+                registry.add_parking_spots(lot_id, rows)
+            else:
+                for spot, distances in rows:
+                    manager.add_parking_spot_for_gates(spot, distances)
+        lot_ids = list(lot_rows)
+        per_thread = num_events // num_threads
+
+        def client(index):
+            client_rng = random.Random(index)
+            parked = []
+            for _ in range(per_thread):
+                if parked and client_rng.random() < 0.5:
+                    lot_id, spot_id = parked.pop(client_rng.randrange(len(parked)))
+                    registry.get(lot_id).release_spot_by_id(spot_id)
+                else:
+                    lot_id = client_rng.choice(lot_ids)
+                    spot = registry.get(lot_id).get_nearest_available_spot(
+                        client_rng.choice(GATES), client_rng.choices(spot_types, SPOT_MIX)[0])
+                    if spot is not None:
+                        parked.append((lot_id, spot.spot_id))
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(num_threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(1_000):
+            registry.nearest_lot_with_capacity("Large", (rng.uniform(0, 100), rng.uniform(0, 100)))
+        query_us = (time.perf_counter() - start) / 1_000 * 1e6
+        line = (f"{label:>16}: {per_thread * num_threads / elapsed:>9,.0f} events/s, "
+                f"nearest lot with a free Large spot {query_us:6.1f} us")
+
+        if isinstance(registry, PartitionedLotRegistry):
+            # Same traffic in batches of batch_size requests, one round trip per partition
+            batch_size = 1_000
+            parked = []
+            start = time.perf_counter()
+            for _ in range(num_events // batch_size):
+                requests = [(lot_id, "release", spot_id) for lot_id, spot_id in parked]
+                requests += [(rng.choice(lot_ids), "allocate", rng.choice(GATES), rng.choices(spot_types, SPOT_MIX)[0])
+                             for _ in range(batch_size - len(requests))]
+                results = registry.execute_many(requests)
+                parked = [(request[0], spot.spot_id) for request, spot in zip(requests, results)
+                          if request[1] == "allocate" and spot is not None][:batch_size // 2]
+            line += f", batched {num_events // batch_size * batch_size / (time.perf_counter() - start):>9,.0f} events/s"
+        print(line)
+
+    run(LotRegistry(), "in process")
+    for num_partitions in partition_counts:
+        registry = PartitionedLotRegistry(num_partitions)
+        try:
+            run(registry, f"{num_partitions} partition(s)")
+        finally:
+            registry.close()
+
+
+def bench_board(num_spots=50_000, num_gates=4, num_events=200_000):
+    """Availability board: counting free spots per gate & type by walking every spot vs the O(1)
+    counters, and what keeping a display subscribed costs every entry / exit."""
+    print(f"--- board: availability per gate & type, {num_spots:,} spots, {num_gates} gates ---")
+    manager = build_matrix_lot(num_spots, num_gates)
+    index = manager.spot_index
+
+    start = time.perf_counter()
+    counts = {}
+    for spot_id, spot in manager.spot_id_map.items():
+        if not spot.is_reserved:
+            number = index.number_by_id[spot_id]
+            for gate_id in index.gates[number]:
+                counts[(gate_id, spot.get_type())] = counts.get((gate_id, spot.get_type()), 0) + 1
+    scan_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(1_000):
+        manager.availability_board()
+    board_us = (time.perf_counter() - start) / 1_000 * 1e6
+    print(f"walking spot_id_map {scan_ms:8.1f} ms per board, availability_board() {board_us:6.1f} us per board")
+
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    gate_ids = list(manager.gates)
+    for subscribed in (False, True):
+        rng = random.Random(3)
+        subscription = manager.subscribe_availability() if subscribed else None
+        updates = 0
+        if subscription is not None:
+            def display():
+                nonlocal updates
+                for changes in subscription:
+                    updates += 1
+                    time.sleep(0.01) # a display redraws at most 100 times a second
+
+            display_thread = threading.Thread(target=display, daemon=True)
+            display_thread.start()
+        parked = []
+        start = time.perf_counter()
+        for _ in range(num_events):
+            if parked and rng.random() < 0.5:
+                manager.release_spot_by_id(parked.pop(rng.randrange(len(parked))))
+            else:
+                spot = manager.get_nearest_available_spot(rng.choice(gate_ids), rng.choices(spot_types, SPOT_MIX)[0])
+                if spot is not None:
+                    parked.append(spot.spot_id)
+        per_event_us = (time.perf_counter() - start) / num_events * 1e6
+        for spot_id in parked:
+            manager.release_spot_by_id(spot_id)
+        if subscription is not None:
+            subscription.close()
+            display_thread.join()
+        print(f"{'with a subscribed display' if subscribed else 'no subscriber':>26}: {per_event_us:5.2f} us per "
+              f"entry/exit" + (f", display redrew {updates} times" if subscribed else ""))
+
+
+def bench_pricing(num_tickets=1_000_000):
+    """End-of-day settlement: one fare at a time through the strategies (as accept_ticket does, with and
+    without the cached strategy objects) vs RateTable.prices() on columns."""
+    print(f"--- pricing: {num_tickets:,} tickets, NumPy {'available' if np is not None else 'not installed'} ---")
+    rng = random.Random(4)
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    types = rng.choices(spot_types, SPOT_MIX, k=num_tickets)
+    hours = [max(1, int(rng.expovariate(1 / 3))) for _ in range(num_tickets)]
+    entry_hours = [rng.randrange(24) for _ in range(num_tickets)]
+
+    def timed(label, price_all):
+        start = time.perf_counter()
+        fares = price_all()
+        elapsed = time.perf_counter() - start
+        print(f"{label:>34}: {elapsed * 1000:8.1f} ms, {num_tickets / elapsed / 1e6:6.2f} M tickets/s")
+        return fares
+
+    uncached = timed("new strategy per ticket", lambda: [
+        PricingStrategyFactory._create(spot_type).calculate_price(hours_parked)
+        for spot_type, hours_parked in zip(types, hours)])
+    cached = timed("cached strategy per ticket", lambda: [
+        PricingStrategyFactory.get_strategy(spot_type).calculate_price(hours_parked)
+        for spot_type, hours_parked in zip(types, hours)])
+    batch = timed("RateTable.prices(), pure Python", lambda: DEFAULT_RATE_TABLE._prices_python(types, hours, None))
+    if np is not None:
+        columns = (np.array(types), np.array(hours))
+        vectorized = timed("RateTable.prices(), NumPy", lambda: DEFAULT_RATE_TABLE._prices_numpy(*columns, None))
+        if list(vectorized) != batch:
+            raise Exception("NumPy fares differ from the pure Python fares")
+        columns = (np.array([DEFAULT_RATE_TABLE.type_codes[spot_type] for spot_type in types]), columns[1])
+        timed("RateTable.prices(), NumPy, codes", lambda: DEFAULT_RATE_TABLE._prices_numpy(*columns, None))
+    if not uncached == cached == batch:
+        raise Exception("Batch fares differ from the per-ticket fares")
+
+    # Tiered rates (cheaper after 3 hours) with an evening peak, entry hour as a third column
+    tiered = RateTable({spot_type: [(3, rate), (math.inf, rate * 0.75)]
+                        for spot_type, rate in zip(spot_types, (10, 20, 30, 50))},
+                       hour_multipliers=[1.5 if 17 <= hour < 20 else 1.0 for hour in range(24)])
+    timed("tiered + time of day, pure Python", lambda: tiered._prices_python(types, hours, entry_hours))
+    if np is not None:
+        columns = (np.array(types), np.array(hours), np.array(entry_hours))
+        timed("tiered + time of day, NumPy", lambda: tiered._prices_numpy(*columns))
+
+
+def bench_tickets(num_tickets=300_000, num_spots=50_000, days=30):
+    """Historical tickets: a list of ParkingTicket objects vs TicketRepository columns, memory and
+    lookups (open ticket of a spot, tickets that entered in a one hour window)."""
+    print(f"--- tickets: {num_tickets:,} tickets over {days} days, {num_spots:,} spots ---")
+    rng = random.Random(5)
+    spots = [spot_class(spot_id=i + 1) for i, spot_class in
+             enumerate(rng.choices(SPOT_CLASSES, SPOT_MIX, k=num_spots))]
+    start_time = 1_700_000_000.0
+    step = days * 86400 / num_tickets
+    rows = [(spots[rng.randrange(num_spots)], rng.choice(GATES), start_time + i * step) for i in range(num_tickets)]
+
+    tracemalloc.start()
+    objects = []
+    for spot, gate_id, entry_time in rows:
+        ticket = ParkingTicket(spot, gate_id)
+        ticket.issue_time = datetime.fromtimestamp(entry_time)
+        objects.append(ticket)
+    object_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    repository = TicketRepository()
+    open_spots = set()
+    for spot, gate_id, entry_time in rows:
+        if spot.spot_id in open_spots: # a spot has one open ticket at most, close the earlier one
+            repository.close_ticket(repository.open_ticket_for_spot(spot.spot_id), entry_time, 20.0)
+        repository.open_ticket(spot.spot_id, spot.get_type(), gate_id, entry_time=entry_time)
+        open_spots.add(spot.spot_id)
+    repository_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"ParkingTicket objects {object_bytes / num_tickets:6.1f} B/ticket, "
+          f"TicketRepository {repository_bytes / num_tickets:6.1f} B/ticket")
+
+    window_start = start_time + days * 86400 / 2
+    window_end = window_start + 3600
+    start = time.perf_counter()
+    scanned = [t for t in objects if window_start <= t.issue_time.timestamp() < window_end]
+    scan_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(100):
+        found = repository.tickets_entered_between(window_start, window_end)
+    range_us = (time.perf_counter() - start) / 100 * 1e6
+    if len(found) != len(scanned):
+        raise Exception("Range query and scan disagree")
+    print(f"one hour of entries ({len(found)} tickets): scan {scan_ms:7.1f} ms, index {range_us:7.1f} us")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        repository.tickets_entered_between(window_start, window_end, gate_id=GATES[0])
+    print(f"same hour, one gate: index {(time.perf_counter() - start) / 100 * 1e6:7.1f} us")
+
+    probes = [spot.spot_id for spot in rng.sample(spots, 1_000)]
+    start = time.perf_counter()
+    for spot_id in probes:
+        repository.open_ticket_for_spot(spot_id)
+    print(f"open ticket of a spot: {(time.perf_counter() - start) / len(probes) * 1e6:5.2f} us")
+
+
+def bench_simulation(num_scenarios=4, hours=48):
+    """Discrete-event simulator on the real manager and terminals: events per minute, and the same
+    scenarios one after another vs in worker processes (only faster with spare CPUs)."""
+    print(f"--- simulation: {num_scenarios} scenarios of {hours} virtual hours, {os.cpu_count()} CPU(s) ---")
+    scenarios = [Scenario(f"scenario-{i}", spots={"Handicapped": 250, "Compact": 3000, "Large": 1500, "TruckSpot": 250},
+                          arrival_rate=1500 + 250 * i, dwell="lognormal", hours=hours, seed=i)
+                 for i in range(num_scenarios)]
+    for label, run in (("serial", lambda: [run_scenario(scenario) for scenario in scenarios]),
+                       ("processes", lambda: run_scenarios(scenarios))):
+        start = time.perf_counter()
+        reports = run()
+        elapsed = time.perf_counter() - start
+        events = sum(report["events"] for report in reports)
+        print(f"{label:>10}: {events:,} events in {elapsed:5.1f} s, {events / elapsed * 60 / 1e6:5.2f} M events/min")
+    for report in reports:
+        print(f"{report['scenario']:>14}: rejected {report['rejection_rate']:6.1%}, revenue ₹{report['revenue']:,.0f}")
+
+
+def bench_journal(num_spots=50_000, num_events=300_000, target_occupancy=0.9):
+    """A day of entries / exits through journaled terminals, then a restart: the lot is rebuilt and the
+    journal recovered, with every record replayed vs from a snapshot plus the journal tail."""
+    print(f"--- journal: {num_spots:,} spots, {num_events:,} entry/exit events over one day ---")
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    directory = tempfile.mkdtemp()
+
+    def day(journal_options):
+        # -> (us per event, open tickets at the end, journal path)
+        registry = LotRegistry()
+        manager = build_lot(num_spots, manager=registry.add_lot("lot-1"))
+        path = os.path.join(directory, f"lot-{len(os.listdir(directory))}")
+        journal = LotJournal(path, manager, **journal_options) if journal_options is not None else None
+        clock = VirtualClock(datetime(2024, 1, 1))
+        options = {"lot_id": "lot-1", "registry": registry, "clock": clock.now, "quiet": True, "journal": journal}
+        entries = [EntryTerminal(f"entry-{gate_id}", gate_id, **options) for gate_id in GATES]
+        exits = [ExitTerminal(f"exit-{gate_id}", gate_id, **options) for gate_id in GATES]
+        rng = random.Random(6)
+        parked = []
+        filled = False # the morning: cars only arrive until the lot is target_occupancy full
+        start = time.perf_counter()
+        for event in range(num_events):
+            clock.advance_to(event * 86400 / num_events)
+            filled = filled or len(parked) >= num_spots * target_occupancy
+            if len(parked) >= num_spots * target_occupancy or (filled and rng.random() < 0.5):
+                index = rng.randrange(len(parked))
+                parked[index], parked[-1] = parked[-1], parked[index]
+                rng.choice(exits).accept_ticket(parked.pop())
+            else:
+                ticket = rng.choice(entries).get_ticket(rng.choices(spot_types, SPOT_MIX)[0])
+                if ticket is not None:
+                    parked.append(ticket)
+        if journal is not None:
+            journal.flush()
+        per_event_us = (time.perf_counter() - start) / num_events * 1e6
+        if journal is not None:
+            journal.close()
+        return per_event_us, {str(ticket.ticket_id) for ticket in parked}, path
+
+    try:
+        plain_us, _, _ = day(None)
+        print(f"{'no journal':>24}: {plain_us:5.1f} us per event")
+        for label, options in (("journal, no snapshot", {"snapshot_every": None}),
+                               ("journal, snapshots", {"snapshot_every": 100_000})):
+            per_event_us, open_tickets, path = day(options)
+            sizes = ", ".join(f"{os.path.basename(name)} {os.path.getsize(name) / 1e6:.1f} MB"
+                              for name in (path + ".snapshot", path + ".journal") if os.path.exists(name))
+            print(f"{label:>24}: {per_event_us:5.1f} us per event, {sizes}")
+
+            manager = build_lot(num_spots) # the restarted process sets the lot up again
+            journal = LotJournal(path, manager)
+            stats = journal.recovery_stats
+            journal.close()
+            if {str(ticket_id) for ticket_id in journal.recovered_tickets} != open_tickets:
+                raise Exception("Recovered tickets differ from the cars still parked")
+            if num_spots - sum(manager.free_spots(spot_type) for spot_type in spot_types) != len(open_tickets):
+                raise Exception("Recovered spot state differs from the cars still parked")
+            print(f"{'recovery':>24}: {stats['seconds'] * 1000:6.1f} ms ({stats['load_seconds'] * 1000:.0f} ms reading "
+                  f"files), {stats['snapshot_tickets']:,} tickets from the snapshot, "
+                  f"{stats['replayed_records']:,} records replayed, {len(open_tickets):,} open")
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_fallback(num_spots=50_000, num_events=500_000, target_occupancy=0.95):
+    """Cars of a full type taking a bigger spot: asking the manager type by type (one call and heap per
+    type, first hit wins) vs one allocate_compatible query per policy. Demand is mostly Compact on a lot
+    with few Compact spots, so most Compact cars need an upgrade."""
+    print(f"--- fallback: {num_events:,} entry/exit events on {num_spots:,} spots, ~{target_occupancy:.0%} full ---")
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    demand = [0.05, 0.8, 0.1, 0.05] # share of cars asking for each type, against SPOT_MIX of the lot
+
+    def type_by_type(manager, gate_id, spot_type):
+        for candidate in COMPATIBLE_TYPES[spot_type]:
+            spot = manager.get_nearest_available_spot(gate_id, candidate)
+            if spot is not None:
+                return spot
+        return None
+
+    runs = [("exact type", "exact", None), ("type by type", "exact", type_by_type)]
+    runs += [(f"policy {name}", name, None) for name in ("prefer_exact", "nearest", "upgrade_penalty")]
+    for label, policy_name, allocate in runs:
+        manager = build_lot(num_spots)
+        manager.set_allocation_policy(AllocationPolicyFactory.get_policy(policy_name))
+        allocate = allocate or (lambda manager, gate_id, spot_type: manager.get_nearest_available_spot(gate_id, spot_type))
+        rng = random.Random(7)
+        parked = []
+        rejected = upgraded = entries = 0
+        filled = False
+        start = time.perf_counter()
+        for _ in range(num_events):
+            filled = filled or len(parked) >= num_spots * target_occupancy
+            if len(parked) >= num_spots * target_occupancy or (filled and rng.random() < 0.5):
+                index = rng.randrange(len(parked))
+                parked[index], parked[-1] = parked[-1], parked[index]
+                manager.release_spot_by_id(parked.pop())
+            else:
+                entries += 1
+                spot_type = rng.choices(spot_types, demand)[0]
+                spot = allocate(manager, rng.choice(GATES), spot_type)
+                if spot is None:
+                    rejected += 1
+                else:
+                    upgraded += spot.get_type() != spot_type
+                    parked.append(spot.spot_id)
+        per_event_us = (time.perf_counter() - start) / num_events * 1e6
+        print(f"{label:>24}: {per_event_us:5.2f} us per event, {rejected / entries:6.1%} rejected, "
+              f"{upgraded / entries:6.1%} upgraded")
+
+
+def bench_booking(num_spots=50_000, num_gates=4, densities=(0, 10_000, 50_000, 200_000), num_events=100_000):
+    """Advance bookings over one week on a lot where every gate reaches every spot: booking, asking which
+    spots are free for a window (nearest 10 and all of them), and walk-in entries / exits while holds start
+    and end, as the number of bookings grows."""
+    print(f"--- booking: {num_spots:,} spots, {num_gates} gates, one week of bookings ---")
+    week = 7 * 86400
+    spot_types = [spot_class().get_type() for spot_class in SPOT_CLASSES]
+    for num_bookings in densities:
+        manager = build_matrix_lot(num_spots, num_gates)
+        gate_ids = list(manager.gates)
+        now = [0.0]
+        bookings = manager.enable_bookings(hold_ahead=3600, clock=lambda: now[0])
+        rng = random.Random(8)
+        for gate_id in gate_ids: # distance orders are built on first use, not part of the timings
+            for spot_type in spot_types:
+                bookings.free_spots(gate_id, spot_type, 0, 1, limit=1)
+
+        start = time.perf_counter()
+        booked = 0
+        for _ in range(num_bookings):
+            begin = rng.uniform(0, week)
+            booked += bookings.book(rng.choice(gate_ids), rng.choices(spot_types, SPOT_MIX)[0],
+                                    begin, begin + rng.uniform(1, 8) * 3600) is not None
+        book_us = (time.perf_counter() - start) / max(1, num_bookings) * 1e6
+
+        windows = []
+        for _ in range(200):
+            begin = rng.uniform(0, week)
+            windows.append((rng.choice(gate_ids), rng.choices(spot_types, SPOT_MIX)[0], begin, begin + 4 * 3600))
+        start = time.perf_counter()
+        for window in windows:
+            bookings.free_spots(*window, limit=10)
+        nearest_us = (time.perf_counter() - start) / len(windows) * 1e6
+        start = time.perf_counter()
+        for window in windows[:50]:
+            bookings.free_spots(*window)
+        all_ms = (time.perf_counter() - start) / 50 * 1000
+
+        # Walk-ins through the third day, ~30% of the lot, stays of a few hours; holds start and end as the clock moves
+        now[0] = 2 * 86400
+        bookings.advance() # the first two days of holds, not part of the timing
+        parked = []
+        filled = False
+        start = time.perf_counter()
+        for event in range(num_events):
+            now[0] = 2 * 86400 + event * 86400 / num_events
+            filled = filled or len(parked) >= num_spots * 0.3
+            if len(parked) >= num_spots * 0.3 or (filled and rng.random() < 0.5):
+                index = rng.randrange(len(parked))
+                parked[index], parked[-1] = parked[-1], parked[index]
+                manager.release_spot_by_id(parked.pop())
+            else:
+                spot = manager.get_nearest_available_spot(rng.choice(gate_ids), rng.choices(spot_types, SPOT_MIX)[0])
+                if spot is not None:
+                    parked.append(spot.spot_id)
+        walk_in_us = (time.perf_counter() - start) / num_events * 1e6
+        print(f"{num_bookings:>8,} bookings ({booked:,} placed): book {book_us:6.1f} us, nearest 10 free "
+              f"{nearest_us:6.1f} us, all free {all_ms:5.1f} ms, walk-in entry/exit {walk_in_us:5.1f} us, "
+              f"{bookings.moved} moved for overstaying walk-ins")
+
+
+BENCHMARKS = {
+    "churn": bench_churn,
+    "gates": bench_gates,
+    "terminals": bench_terminals,
+    "lots": bench_lots,
+    "board": bench_board,
+    "pricing": bench_pricing,
+    "tickets": bench_tickets,
+    "simulation": bench_simulation,
+    "journal": bench_journal,
+    "fallback": bench_fallback,
+    "booking": bench_booking,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(BENCHMARKS):
+        BENCHMARKS[name]()
@@ -0,0 +1,288 @@
+"""
+Advance bookings: a spot of a type at a gate, for a window [start, end) in epoch seconds.
+
+Storage:
+    per spot        sorted lists of start / end / booking id (bookings of one spot never overlap), so
+                    "is spot s free for [t1, t2)" is one bisect: O(log b), b = bookings of that spot
+    by_start        (start, booking_id) of every booking, sorted. The bookings overlapping [t1, t2) are the
+                    ones starting in [t1 - longest booking, t2) with end > t1: one bisect and a short slice
+    distance order  per gate & type, spot numbers sorted by distance, built on first use and again after
+                    the spot index layout changed (its version: spots, gates or distances added)
+
+free_spots(gate, type, t1, t2, limit) walks the distance order skipping the spots busy in the window: for
+the nearest few (book() asks for one) with a bisect per spot walked, stopping early; for all of them
+against the busy set of the window, O(spots of the type + bookings in the window).
+
+Walk-in cars: get_nearest_available_spot keeps its heap path. A booked spot is held (reserved through the
+spot index, like a parked car) from hold_ahead seconds before its start, so a walk-in is never handed a
+spot that is about to be booked. If a walk-in is still parked there when the hold should start, the booking
+moves to the nearest spot free for its window. A hold not claimed by the end of the window is released.
+Holds start and end in advance(), called by the manager before every allocation.
+"""
+from bisect import bisect_left, bisect_right, insort
+import heapq
+import threading
+import time
+
+from ParkingLot.parking_spot_1 import ParkingSpot
+from ParkingLot.spot_index_8 import SpotIndex
+
+BOOKED, HELD, CLAIMED, DONE, CANCELLED, UNASSIGNED = "booked", "held", "claimed", "done", "cancelled", "unassigned"
+EXPIRE, HOLD = 0, 1 # at the same time a window ends before the next one's hold starts
+
+
+class Booking:
+    def __init__(self, booking_id: int, gate_id, spot_type, start: float, end: float):
+        self.booking_id = booking_id
+        self.gate_id = gate_id
+        self.spot_type = spot_type
+        self.start = start
+        self.end = end
+        self.spot_number = None
+        self.state = BOOKED
+
+
+    def __repr__(self):
+        return f"Booking({self.booking_id}, {self.spot_type} at {self.gate_id}, [{self.start}, {self.end}), {self.state})"
+
+
+class BookingIndex:
+    def __init__(self, spot_index: SpotIndex, hold_ahead: float = 2 * 3600, clock=time.time):
+        # clock: returns epoch seconds, a simulation passes its virtual clock
+        self.spot_index = spot_index
+        self.hold_ahead = hold_ahead
+        self.clock = clock
+        self.bookings = {} # booking_id -> Booking
+        self.starts = {} # spot number -> sorted starts of its bookings
+        self.ends = {} # spot number -> ends, same order
+        self.ids = {} # spot number -> booking ids, same order
+        self.by_start = [] # sorted (start, booking_id)
+        self.longest = 0.0 # longest booking so far, bounds the by_start slice of a window query
+        self.orders = {} # (gate_id, spot_type) -> spot numbers nearest first
+        self.order_version = -1 # spot_index.version the orders were built from
+        self.events = [] # heap of (time, kind, booking_id): holds to start, windows to expire
+        self.next_id = 0
+        self.moved = 0 # bookings moved to another spot because a walk-in was still parked
+        self.lock = threading.Lock()
+
+
+    # ------------------- interval index -------------------
+    def _busy(self, number: int, start: float, end: float) -> bool:
+        ends = self.ends.get(number)
+        if not ends:
+            return False
+        position = bisect_right(ends, start) # first booking ending after start
+        return position < len(ends) and self.starts[number][position] < end
+
+
+    def is_free(self, spot_id, start: float, end: float) -> bool:
+        # No booking of the spot overlaps [start, end)
+        return not self._busy(self.spot_index.number_by_id[spot_id], start, end)
+
+
+    def _add_interval(self, booking: Booking, number: int):
+        starts = self.starts.setdefault(number, [])
+        position = bisect_left(starts, booking.start)
+        starts.insert(position, booking.start)
+        self.ends.setdefault(number, []).insert(position, booking.end)
+        self.ids.setdefault(number, []).insert(position, booking.booking_id)
+        booking.spot_number = number
+
+
+    def _remove_interval(self, booking: Booking):
+        number = booking.spot_number
+        position = self.ids[number].index(booking.booking_id, bisect_left(self.starts[number], booking.start))
+        del self.starts[number][position], self.ends[number][position], self.ids[number][position]
+        booking.spot_number = None
+
+
+    def busy_spots(self, start: float, end: float) -> set:
+        # Spot numbers with a booking overlapping [start, end)
+        low = bisect_left(self.by_start, (start - self.longest,))
+        high = bisect_left(self.by_start, (end,))
+        busy = set()
+        for _, booking_id in self.by_start[low:high]:
+            booking = self.bookings[booking_id]
+            if booking.end > start and booking.spot_number is not None:
+                busy.add(booking.spot_number)
+        return busy
+
+
+    def _order(self, gate_id, spot_type) -> list:
+        # Spot numbers of the type reachable from the gate, nearest first
+        index = self.spot_index
+        if self.order_version != index.version:
+            self.orders = {}
+            self.order_version = index.version
+        order = self.orders.get((gate_id, spot_type))
+        if order is None:
+            distances = index.distances.get(gate_id)
+            if distances is None:
+                raise Exception(f"No gate found for id: {gate_id}")
+            order = sorted((number for number, number_type in enumerate(index.types)
+                            if number_type == spot_type and distances[number] >= 0), key=distances.__getitem__)
+            self.orders[(gate_id, spot_type)] = order
+        return order
+
+
+    def free_spots(self, gate_id, spot_type, start: float, end: float, limit: int | None = None) -> list[ParkingSpot]:
+        # Spots of the type at the gate with no booking in [start, end), nearest first. When the window
+        # starts within hold_ahead, spots taken right now (parked or held) are left out too.
+        with self.lock:
+            return [self.spot_index.spots[number] for number in self._free_numbers(gate_id, spot_type, start, end, limit)]
+
+
+    def _free_numbers(self, gate_id, spot_type, start, end, limit=None) -> list[int]:
+        # The nearest few: a bisect per spot walked, so the cost is the spots skipped before enough are found.
+        # All of them: the set of spots busy in the window first, one slice of by_start.
+        skip_taken = start < self.clock() + self.hold_ahead
+        spots = self.spot_index.spots
+        free = []
+        if limit is None:
+            busy = self.busy_spots(start, end)
+            for number in self._order(gate_id, spot_type):
+                if number not in busy and not (skip_taken and spots[number].is_reserved):
+                    free.append(number)
+            return free
+        starts_of, ends_of = self.starts, self.ends
+        for number in self._order(gate_id, spot_type):
+            ends = ends_of.get(number)
+            if ends: # _busy inlined, this loop is what booking costs when the nearest spots are booked
+                position = bisect_right(ends, start)
+                if position < len(ends) and starts_of[number][position] < end:
+                    continue
+            if skip_taken and spots[number].is_reserved:
+                continue
+            free.append(number)
+            if len(free) >= limit:
+                break
+        return free
+
+
+    # ------------------- bookings -------------------
+    def book(self, gate_id, spot_type, start: float, end: float) -> Booking | None:
+        # Books the nearest spot free for the whole window, None if there is none
+        if end <= start:
+            raise Exception(f"Booking window [{start}, {end}) is empty")
+        with self.lock:
+            free = self._free_numbers(gate_id, spot_type, start, end, limit=1)
+            if not free:
+                return None
+            booking = Booking(self.next_id, gate_id, spot_type, start, end)
+            self.next_id += 1
+            self.bookings[booking.booking_id] = booking
+            self._add_interval(booking, free[0])
+            insort(self.by_start, (start, booking.booking_id))
+            self.longest = max(self.longest, end - start)
+            heapq.heappush(self.events, (start - self.hold_ahead, HOLD, booking.booking_id))
+            heapq.heappush(self.events, (end, EXPIRE, booking.booking_id))
+        self.advance() # a window starting within hold_ahead is held right away
+        return booking
+
+
+    def cancel(self, booking_id: int):
+        with self.lock:
+            booking = self.get(booking_id)
+            if booking.state in (DONE, CANCELLED):
+                return
+            if booking.state == CLAIMED:
+                raise Exception(f"Booking {booking_id} is in use, the car leaves through an exit terminal")
+            if booking.state == HELD:
+                self.spot_index.release(self.spot_index.spots[booking.spot_number].spot_id)
+            self._finish(booking, CANCELLED)
+
+
+    def claim(self, booking_id: int) -> ParkingSpot | None:
+        # The booker arrived: the spot held for them, now theirs like any allocated spot. None if the
+        # booking could not be given a spot.
+        self.advance()
+        with self.lock:
+            booking = self.get(booking_id)
+            if booking.state == BOOKED: # earlier than hold_ahead before the start
+                self._hold(booking, self.clock())
+            if booking.state != HELD:
+                return None
+            booking.state = CLAIMED
+            return self.spot_index.spots[booking.spot_number]
+
+
+    def get(self, booking_id: int) -> Booking:
+        booking = self.bookings.get(booking_id)
+        if booking is None:
+            raise Exception(f"No booking found for id: {booking_id}")
+        return booking
+
+
+    def _finish(self, booking: Booking, state: str):
+        if booking.spot_number is not None:
+            self._remove_interval(booking)
+        position = bisect_left(self.by_start, (booking.start, booking.booking_id))
+        del self.by_start[position]
+        booking.state = state
+
+
+    # ------------------- holds -------------------
+    def advance(self):
+        # Starts and ends the holds that are due. O(1) when nothing is due, which is nearly always.
+        events = self.events
+        now = self.clock()
+        if not events or events[0][0] > now:
+            return
+        with self.lock:
+            while events and events[0][0] <= now:
+                at, kind, booking_id = heapq.heappop(events)
+                booking = self.bookings[booking_id]
+                if kind == HOLD and booking.state == BOOKED:
+                    self._hold(booking, at)
+                elif kind == EXPIRE and booking.state in (BOOKED, HELD, UNASSIGNED):
+                    if booking.state == HELD: # no-show
+                        self.spot_index.release(self.spot_index.spots[booking.spot_number].spot_id)
+                    self._finish(booking, DONE)
+                elif kind == EXPIRE and booking.state == CLAIMED:
+                    # The car leaves through an exit terminal like any other, the window stops blocking the spot
+                    self._finish(booking, DONE)
+
+
+    def _hold(self, booking: Booking, now: float):
+        # Caller holds self.lock. now: when the hold is due, advance() may be catching up on several
+        number = booking.spot_number
+        position = self.ids[number].index(booking.booking_id, bisect_left(self.starts[number], booking.start))
+        if position > 0:
+            previous = self.bookings[self.ids[number][position - 1]]
+            if previous.state in (HELD, CLAIMED) and previous.end > now:
+                # Back to back with the booking before on this spot: hold it when that one ends
+                heapq.heappush(self.events, (previous.end, HOLD, booking.booking_id))
+                return
+        spot = self.spot_index.spots[number]
+        if self.spot_index.reserve(spot.spot_id):
+            booking.state = HELD
+            return
+        # A walk-in is still parked there: the nearest other spot free for the rest of the window
+        self._remove_interval(booking)
+        free = self._free_numbers(booking.gate_id, booking.spot_type, max(booking.start, now), booking.end, 1)
+        if free and self.spot_index.reserve(self.spot_index.spots[free[0]].spot_id):
+            self._add_interval(booking, free[0])
+            booking.state = HELD
+            self.moved += 1
+        else:
+            booking.state = UNASSIGNED
+
+
+# ------------------- TEST CASE -------------------
+if __name__ == "__main__":
+    from ParkingLot.parking_spot_1 import CompactSpot
+
+    index = SpotIndex()
+    for number in range(4):
+        # Spot 4 is not reachable from gate-A yet
+        index.add_spot(CompactSpot(spot_id=number + 1), {"gate-A": (number + 1) * 10} if number < 3 else {"gate-B": 5})
+    bookings = BookingIndex(index, clock=lambda: 0.0)
+    window = (10_000.0, 20_000.0)
+    first = bookings.book("gate-A", "Compact", *window)
+    assert index.spots[first.spot_number].spot_id == 1
+
+    # A new way in from gate-A makes spot 4 the nearest, with the same number of spots in the index
+    index.set_distance(4, "gate-A", 1)
+    second = bookings.book("gate-A", "Compact", *window)
+    assert index.spots[second.spot_number].spot_id == 4, second
+    print("After set_distance:", second, "on spot", index.spots[second.spot_number].spot_id)
@@ -0,0 +1,410 @@
+"""
+Journal of a lot: which spots are taken and which tickets are open survive a restart of the process.
+
+Terminals created with journal=... report every allocate (a ticket was issued), pay and release.
+Like the KV store's AOF, the terminal only appends a tuple to a deque; a writer thread packs the
+records, writes them with one write() call every flush_interval and fsyncs per policy:
+    everysec    fsync at most once a second, up to a second of events can be lost
+    never       leave flushing to the OS
+
+Files, next to each other:
+    <path>.journal      header: magic "LOTJRNL2" | generation u64 | layout crc32 u32
+                        records of 39 bytes: op u8 | gate u16 | spot number u32 | ticket u128 | time f64 | amount f64
+    <path>.snapshot     header: magic "LOTSNAP2" | generation u64 | spots u64 | gates u32 | layout crc32 u32 | open tickets u64
+                                | next ticket id u64
+                        one byte per spot (1 = reserved), then one allocate record per open ticket
+
+The writer applies every record it writes to its own copy of the state (reserved bytes, open tickets),
+so a snapshot is taken on the writer thread without stopping the terminals. Every snapshot_every records
+it writes the snapshot, then starts the journal over with the next generation. Recovery loads the
+snapshot and replays only the journal written after it; a journal of an older generation is already in
+the snapshot, a torn last record is skipped.
+
+Spots and gates are written as their position in the lot (spot number, gate order), the lot itself is
+rebuilt by the setup code on restart. The snapshot and the journal keep a crc32 of the spot and gate ids
+to notice a lot built differently. The gates are the ones in manager.gates when the journal is created:
+a ticket from any other gate is refused (check_gate, which Terminal calls when it is created), so every
+gate code on disk is a position the restarted lot has too. Ticket ids are integers (TicketRepository) or uuid strings (ParkingTicket).
+A TicketRepository starts over empty on restart, so the journal also keeps next_ticket_id, one past the
+highest integer id issued: TicketRepository.restore(journal.recovered_tickets, journal.next_ticket_id)
+gives the recovered tickets their rows back and new tickets ids that none of them has.
+"""
+from collections import deque
+from datetime import datetime
+import os
+import struct
+import threading
+import time
+import zlib
+
+from ParkingLot.parking_lot_manager_2 import ParkingLotManager
+from ParkingLot.parking_ticket_3 import ParkingTicket
+
+FSYNC_POLICIES = ("everysec", "never")
+
+JOURNAL_MAGIC = b"LOTJRNL2"
+SNAPSHOT_MAGIC = b"LOTSNAP2"
+JOURNAL_HEADER = struct.Struct("=8sQI")
+SNAPSHOT_HEADER = struct.Struct("=8sQQIIQQ")
+RECORD = struct.Struct("=BHIQQdd")
+
+ALLOCATE, RELEASE, PAY = 1, 2, 3
+UUID_TICKET = 0x80 # op flag: the ticket id is a uuid string, not an integer
+
+
+def _ticket_number(ticket_id) -> tuple[int, int]:
+    # -> (op flag, 128-bit number). Parsing the hex directly is several times cheaper than uuid.UUID()
+    if isinstance(ticket_id, int):
+        return 0, ticket_id
+    return UUID_TICKET, int(ticket_id.replace("-", ""), 16)
+
+
+def _ticket_id(flag: int, high: int, low: int):
+    if not flag & UUID_TICKET:
+        return high << 64 | low
+    digits = f"{high:016x}{low:016x}"
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}" # str(uuid.UUID(...))
+
+
+def layout_crc(manager: ParkingLotManager) -> int:
+    ids = [repr(list(manager.gates))] + [repr(spot.spot_id) for spot in manager.spot_index.spots]
+    return zlib.crc32("\n".join(ids).encode())
+
+
+class LotJournal:
+    def __init__(self, path: str, manager: ParkingLotManager, fsync: str = "everysec",
+                 flush_interval: float = 0.005, snapshot_every: int | None = 100_000):
+        # Recovers the state written by an earlier run into manager (built by the same setup code) first:
+        # its spots are reserved again and recovered_tickets holds its open tickets, ticket_id -> ParkingTicket.
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.journal_path = path + ".journal"
+        self.snapshot_path = path + ".snapshot"
+        self.manager = manager
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.gate_codes = {gate_id: code for code, gate_id in enumerate(manager.gates)}
+
+        # The writer's copy of the state
+        self.reserved = bytearray(len(manager.spot_index))
+        self.open_tickets = {} # (flag, ticket number) -> packed allocate record
+        self.next_ticket_id = 0 # one past the highest integer ticket id allocated
+        self.generation = 0
+
+        self.recovery_stats = {}
+        self.journal_current = False # set by _recover when the journal on disk can be appended to
+        self.recovered_tickets = self._recover()
+
+        self.pending = deque() # events waiting for the writer
+        self.records_since_snapshot = 0
+        if self.journal_current:
+            self.file = open(self.journal_path, "ab")
+        else:
+            self.file = None
+            self._start_journal()
+        self.last_fsync = time.monotonic()
+        self.unsynced = False # written since the last fsync
+        self.cond = threading.Condition()
+        self.passes_started = 0
+        self.passes_done = 0
+        self.snapshot_requested = False
+        self.running = True
+        self.writer_thread = threading.Thread(target=self._writer, daemon=True)
+        self.writer_thread.start()
+
+
+    # ------------------- terminal side, O(1) and no I/O -------------------
+    def check_gate(self, gate_id):
+        if gate_id not in self.gate_codes:
+            raise Exception(f"Gate {gate_id} is not a gate of lot {self.manager.lot_id}, its tickets cannot be journaled")
+
+
+    def allocated(self, ticket: ParkingTicket):
+        self.check_gate(ticket.gate_id)
+        self.pending.append((ALLOCATE, ticket))
+
+
+    def paid(self, ticket: ParkingTicket):
+        self.pending.append((PAY, ticket.ticket_id, ticket.parking_spot_id, ticket.exit_time, ticket.amount))
+
+
+    def released(self, spot_id):
+        self.pending.append((RELEASE, spot_id))
+
+
+    # ------------------- writer thread -------------------
+    def _encode(self, event: tuple) -> tuple:
+        # -> the fields of RECORD
+        number_by_id = self.manager.spot_index.number_by_id
+        if event[0] == ALLOCATE:
+            ticket = event[1]
+            gate_code = self.gate_codes[ticket.gate_id]
+            flag, number = _ticket_number(ticket.ticket_id)
+            return (ALLOCATE | flag, gate_code, number_by_id[ticket.parking_spot_id],
+                    number >> 64, number & 0xFFFFFFFFFFFFFFFF, ticket.issue_time.timestamp(), 0.0)
+        if event[0] == PAY:
+            _, ticket_id, spot_id, exit_time, amount = event
+            flag, number = _ticket_number(ticket_id)
+            return (PAY | flag, 0, number_by_id[spot_id], number >> 64, number & 0xFFFFFFFFFFFFFFFF,
+                    exit_time.timestamp() if exit_time else 0.0, amount)
+        return (RELEASE, 0, number_by_id[event[1]], 0, 0, 0.0, 0.0)
+
+
+    def _apply(self, record: bytes, op: int, spot_number: int, high: int, low: int):
+        # Keeps the writer's (or recovery's) copy of the state in step with the journal
+        if spot_number >= len(self.reserved):
+            self.reserved.extend(bytes(spot_number + 1 - len(self.reserved)))
+        kind = op & ~UUID_TICKET
+        if kind == ALLOCATE:
+            self.reserved[spot_number] = 1
+            self.open_tickets[(op & UUID_TICKET, high, low)] = record
+            if not op & UUID_TICKET and high << 64 | low >= self.next_ticket_id:
+                self.next_ticket_id = (high << 64 | low) + 1
+        elif kind == PAY:
+            self.open_tickets.pop((op & UUID_TICKET, high, low), None)
+        else:
+            self.reserved[spot_number] = 0
+
+
+    def _drain(self) -> int:
+        pending = self.pending
+        events = [pending.popleft() for _ in range(len(pending))]
+        if not events:
+            return 0
+        records = []
+        for event in events:
+            op, gate_code, spot_number, high, low, at, amount = self._encode(event)
+            record = RECORD.pack(op, gate_code, spot_number, high, low, at, amount)
+            self._apply(record, op, spot_number, high, low)
+            records.append(record)
+        self.file.write(b"".join(records))
+        self.file.flush()
+        self.records_since_snapshot += len(records)
+        return len(records)
+
+
+    def _writer(self):
+        while True:
+            with self.cond:
+                if not self.pending and self.running and not self.snapshot_requested:
+                    self.cond.wait(self.flush_interval)
+                running = self.running
+                self.passes_started += 1
+                current_pass = self.passes_started
+
+            if self._drain():
+                self.unsynced = True
+            now = time.monotonic()
+            # Also on a pass that wrote nothing, so the last events before a quiet spell get synced
+            if self.unsynced and self.fsync == "everysec" and now - self.last_fsync >= 1:
+                os.fsync(self.file.fileno())
+                self.last_fsync = now
+                self.unsynced = False
+            if running and (self.snapshot_requested or (self.snapshot_every is not None
+                                                        and self.records_since_snapshot >= self.snapshot_every)):
+                self._snapshot()
+
+            with self.cond:
+                self.passes_done = current_pass
+                self.cond.notify_all()
+            if not running:
+                return
+
+
+    def _snapshot(self):
+        # Runs on the writer thread: the state is exactly what the journal holds so far
+        self.snapshot_requested = False
+        self.generation += 1
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.generation, len(self.reserved), len(self.gate_codes),
+                                         layout_crc(self.manager), len(self.open_tickets), self.next_ticket_id))
+            f.write(self.reserved)
+            f.write(b"".join(self.open_tickets.values()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        # Everything in the old journal is in the snapshot now, start the next generation
+        self._start_journal()
+        self.records_since_snapshot = 0
+
+
+    def _start_journal(self):
+        # Empty journal of self.generation in place of the current one
+        temp_path = self.journal_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, self.generation, layout_crc(self.manager)))
+            f.flush()
+            os.fsync(f.fileno())
+        if self.file is not None:
+            self.file.close()
+        os.replace(temp_path, self.journal_path)
+        self.file = open(self.journal_path, "ab")
+        self.unsynced = False # what the old journal held is in the snapshot, which is synced
+
+
+    def flush(self):
+        # Blocks until everything reported so far is written
+        with self.cond:
+            target = self.passes_started + 1
+            self.cond.notify_all()
+            while self.passes_done < target and self.running:
+                self.cond.wait()
+
+
+    def snapshot(self):
+        # Asks the writer for a snapshot now and waits for it
+        with self.cond:
+            self.snapshot_requested = True
+        self.flush()
+
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.writer_thread.join()
+        self._drain()
+        if self.fsync != "never":
+            os.fsync(self.file.fileno())
+        self.file.close()
+
+
+    # ------------------- recovery -------------------
+    def _recover(self) -> dict:
+        started = time.perf_counter()
+        snapshot_records = 0
+        crc_now = layout_crc(self.manager)
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+            magic, self.generation, num_spots, _, crc, num_open, self.next_ticket_id = SNAPSHOT_HEADER.unpack_from(data)
+            if magic != SNAPSHOT_MAGIC:
+                raise Exception(f"{self.snapshot_path} is not a lot snapshot")
+            if crc != crc_now:
+                raise Exception(f"Lot layout changed since the snapshot {self.snapshot_path} was taken")
+            offset = SNAPSHOT_HEADER.size
+            self.reserved = bytearray(data[offset:offset + num_spots])
+            offset += num_spots
+            for position in range(num_open):
+                record = data[offset + position * RECORD.size:offset + (position + 1) * RECORD.size]
+                op, _, _, high, low, _, _ = RECORD.unpack(record)
+                self.open_tickets[(op & UUID_TICKET, high, low)] = record
+            snapshot_records = num_open
+
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+            if len(data) >= JOURNAL_HEADER.size:
+                magic, generation, crc = JOURNAL_HEADER.unpack_from(data)
+                if magic != JOURNAL_MAGIC:
+                    raise Exception(f"{self.journal_path} is not a lot journal")
+                if crc != crc_now:
+                    raise Exception(f"Lot layout changed since the journal {self.journal_path} was started")
+                if generation >= self.generation:
+                    # Only the tail written after the last snapshot; a torn last record is dropped
+                    end = JOURNAL_HEADER.size + (len(data) - JOURNAL_HEADER.size) // RECORD.size * RECORD.size
+                    body = memoryview(data)[JOURNAL_HEADER.size:end]
+                    # _apply inlined, this loop is most of the recovery time
+                    reserved, open_tickets, size = self.reserved, self.open_tickets, RECORD.size
+                    next_ticket_id = self.next_ticket_id
+                    for position, (op, _, spot_number, high, low, _, _) in enumerate(RECORD.iter_unpack(body)):
+                        if spot_number >= len(reserved):
+                            reserved.extend(bytes(spot_number + 1 - len(reserved)))
+                        kind = op & ~UUID_TICKET
+                        if kind == ALLOCATE:
+                            reserved[spot_number] = 1
+                            open_tickets[(op & UUID_TICKET, high, low)] = bytes(body[position * size:(position + 1) * size])
+                            if not op & UUID_TICKET and high << 64 | low >= next_ticket_id:
+                                next_ticket_id = (high << 64 | low) + 1
+                        elif kind == PAY:
+                            open_tickets.pop((op & UUID_TICKET, high, low), None)
+                        else:
+                            reserved[spot_number] = 0
+                    replayed = len(body) // size
+                    self.next_ticket_id = next_ticket_id
+                    self.generation = generation
+                    self.journal_current = True
+                    if end < len(data):
+                        with open(self.journal_path, "r+b") as f:
+                            f.truncate(end)
+                # else: a crash came between writing the snapshot and starting the next journal,
+                # this one is in the snapshot already and gets replaced
+
+        loaded = time.perf_counter()
+        # Hand the state back to the lot
+        spots = self.manager.spot_index.spots
+        for spot_number, reserved in enumerate(self.reserved):
+            if reserved:
+                self.manager.reserve_spot_by_id(spots[spot_number].spot_id)
+        gate_ids = list(self.gate_codes)
+        tickets = {}
+        for record in self.open_tickets.values():
+            op, gate_code, spot_number, high, low, issue_time, _ = RECORD.unpack(record)
+            spot = spots[spot_number]
+            ticket = ParkingTicket(spot, gate_ids[gate_code], self.manager.lot_id, datetime.fromtimestamp(issue_time),
+                                   _ticket_id(op, high, low))
+            tickets[ticket.ticket_id] = ticket
+        self.recovery_stats = {"snapshot_tickets": snapshot_records, "replayed_records": replayed,
+                               "load_seconds": loaded - started, "seconds": time.perf_counter() - started}
+        return tickets
+
+
+# ------------------- TEST CASE -------------------
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    from ParkingLot.lot_registry_9 import LotRegistry
+    from ParkingLot.parking_lot_manager_2 import Gate
+    from ParkingLot.parking_spot_1 import CompactSpot
+    from ParkingLot.parking_terminal_4 import EntryTerminal
+
+    def build(gate_ids) -> LotRegistry:
+        # The setup code of the lot, run again on every restart
+        registry = LotRegistry()
+        manager = registry.add_lot("lot-1")
+        for gate_id in gate_ids:
+            manager.add_gate(Gate(gate_id, gate_id))
+        for number in range(10):
+            manager.add_parking_spot_for_gates(CompactSpot(spot_id=number + 1), {gate_id: number for gate_id in gate_ids})
+        return registry
+
+    def refused(action) -> str:
+        try:
+            action()
+        except Exception as e:
+            return str(e)
+        raise AssertionError("was not refused")
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "lot-1")
+    try:
+        registry = build(["gate-A", "gate-B"])
+        manager = registry.get("lot-1")
+        journal = LotJournal(path, manager)
+        options = {"lot_id": "lot-1", "registry": registry, "quiet": True, "journal": journal}
+        kept = EntryTerminal("entry-B", "gate-B", **options).get_ticket("Compact")
+        # A gate the lot does not have: its terminal is refused before any spot is taken, and so is a
+        # ticket of that gate reported directly
+        print("Refused:", refused(lambda: EntryTerminal("entry-X", "gate-X", **options)))
+        stray = ParkingTicket(manager.spot_index.spots[5], "gate-X", "lot-1")
+        print("Refused:", refused(lambda: journal.allocated(stray)))
+        journal.close()
+
+        # Restart: the ticket comes back with its gate, one spot is reserved for it and no other
+        manager = build(["gate-A", "gate-B"]).get("lot-1")
+        journal = LotJournal(path, manager)
+        journal.close()
+        recovered = journal.recovered_tickets[kept.ticket_id]
+        assert list(journal.recovered_tickets) == [kept.ticket_id]
+        assert recovered.gate_id == "gate-B" and recovered.parking_spot_id == kept.parking_spot_id
+        assert manager.free_spots("Compact") == 9
+        print("Recovered", recovered, "from", recovered.gate_id)
+
+        # Gates registered in another order would map the gate codes on disk to the wrong gates
+        print("Refused:", refused(lambda: LotJournal(path, build(["gate-B", "gate-A"]).get("lot-1"))))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,253 @@
+"""
+Many parking lots in one service, instead of the one ParkingLotManager.get_instance() lot.
+
+LotRegistry             lot_id -> ParkingLotManager, all in this process
+PartitionedLotRegistry  lots spread over worker processes: one single-worker ProcessPoolExecutor per
+                        partition, a lot always lives in partition crc32(lot_id) % num_partitions,
+                        so lots of different partitions are served in parallel. get(lot_id) returns a
+                        RemoteLotManager proxy with the manager methods terminals call.
+                        A call to a worker costs a process round trip, execute_many() sends a whole
+                        batch of allocate / release requests with one round trip per partition.
+
+Terminals are routed by lot: EntryTerminal(terminal_id, gate_id, lot_id=..., registry=...).
+
+nearest_lot_with_capacity(spot_type, location) compares only lots whose free counter for that type is
+above zero, kept per spot type in with_capacity: a lot joins or leaves the set when its counter crosses
+zero, so full lots are never looked at. LotRegistry hears of the crossings from each manager's SpotIndex
+(capacity_listeners), PartitionedLotRegistry from its own mirror of the counters, updated from the result
+of every allocate / release.
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import math
+import os
+import threading
+import zlib
+
+from ParkingLot.parking_lot_manager_2 import Gate, ParkingLotManager
+from ParkingLot.parking_spot_1 import ParkingSpot
+
+
+class LotRegistry:
+    def __init__(self):
+        self.lots = {} # lot_id -> ParkingLotManager
+        self.locations = {} # lot_id -> (x, y)
+        self.with_capacity = defaultdict(set) # spot_type -> lot_ids with a free spot of that type
+        self.lock = threading.Lock()
+
+
+    def add_lot(self, lot_id, location=(0, 0)) -> ParkingLotManager:
+        with self.lock:
+            if lot_id in self.lots:
+                raise Exception(f"Lot {lot_id} is already registered")
+            manager = ParkingLotManager(lot_id)
+            manager.spot_index.capacity_listeners.append(partial(self._capacity_changed, lot_id))
+            self.lots[lot_id] = manager
+            self.locations[lot_id] = location
+        return manager
+
+
+    def _capacity_changed(self, lot_id, spot_type, has_free: bool):
+        # Called by the lot's SpotIndex under its type lock
+        with self.lock:
+            if has_free:
+                self.with_capacity[spot_type].add(lot_id)
+            else:
+                self.with_capacity[spot_type].discard(lot_id)
+
+
+    def get(self, lot_id) -> ParkingLotManager:
+        manager = self.lots.get(lot_id)
+        if manager is None:
+            raise Exception(f"No lot found for id: {lot_id}")
+        return manager
+
+
+    def nearest_lot_with_capacity(self, spot_type, location):
+        # O(lots with a free spot of that type)
+        with self.lock:
+            return min(((math.dist(location, self.locations[lot_id]), lot_id) for lot_id in self.with_capacity[spot_type]),
+                       default=(None, None))[1]
+
+
+# ------------------- worker process side -------------------
+_worker_registry = None
+
+
+def _init_worker():
+    global _worker_registry
+    _worker_registry = LotRegistry()
+
+
+def _add_lot(lot_id):
+    _worker_registry.add_lot(lot_id)
+
+
+def _add_gate(lot_id, gate: Gate):
+    _worker_registry.get(lot_id).add_gate(gate)
+
+
+def _add_spots(lot_id, rows: list[tuple[ParkingSpot, dict]]) -> dict:
+    manager = _worker_registry.get(lot_id)
+    for spot, distances in rows:
+        manager.add_parking_spot_for_gates(spot, distances)
+    return dict(manager.spot_index.free_count)
+
+
+def _set_allocation_policy(lot_id, policy):
+    _worker_registry.get(lot_id).set_allocation_policy(policy)
+
+
+def _allocate(lot_id, gate_id, spot_type) -> ParkingSpot | None:
+    return _worker_registry.get(lot_id).get_nearest_available_spot(gate_id, spot_type)
+
+
+def _release(lot_id, spot_id):
+    # Returns the type of the released spot, None if nothing was released
+    manager = _worker_registry.get(lot_id)
+    spot = manager.spot_index.get_spot(spot_id)
+    if spot is None or not manager.spot_index.release(spot_id):
+        return None
+    return spot.get_type()
+
+
+WORKER_OPERATIONS = {"allocate": _allocate, "release": _release}
+
+
+def _execute_many(requests: list[tuple]) -> list:
+    return [WORKER_OPERATIONS[operation](lot_id, *args) for lot_id, operation, *args in requests]
+
+
+class RemoteLotManager:
+    """Stands in for the ParkingLotManager of a lot living in a worker process."""
+
+    def __init__(self, registry: "PartitionedLotRegistry", lot_id):
+        self.registry = registry
+        self.lot_id = lot_id
+
+
+    def add_gate(self, gate: Gate):
+        self.registry._call(self.lot_id, _add_gate, gate)
+
+
+    def add_parking_spot_for_gates(self, spot: ParkingSpot, distances: dict):
+        self.registry.add_parking_spots(self.lot_id, [(spot, distances)])
+
+
+    def set_allocation_policy(self, policy):
+        # The policy object is sent to the worker
+        self.registry._call(self.lot_id, _set_allocation_policy, policy)
+
+
+    def get_nearest_available_spot(self, gate_id, spot_type) -> ParkingSpot | None:
+        # The spot is a copy, use its spot_id to release it
+        spot = self.registry._call(self.lot_id, _allocate, gate_id, spot_type)
+        if spot is not None:
+            self.registry._count(self.lot_id, spot.get_type(), -1) # an allocation policy may upgrade the type
+        return spot
+
+
+    def release_spot_by_id(self, spot_id):
+        spot_type = self.registry._call(self.lot_id, _release, spot_id)
+        if spot_type is not None:
+            self.registry._count(self.lot_id, spot_type, 1)
+
+
+    def free_spots(self, spot_type) -> int:
+        return self.registry.free[self.lot_id][spot_type]
+
+
+class PartitionedLotRegistry:
+    def __init__(self, num_partitions: int | None = None):
+        num_partitions = num_partitions or os.cpu_count() or 1
+        self.partitions = [ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+                           for _ in range(num_partitions)]
+        self.locations = {} # lot_id -> (x, y)
+        self.free = {} # lot_id -> spot_type -> free spots, mirrored from the workers
+        self.with_capacity = defaultdict(set) # spot_type -> lot_ids whose mirrored counter is above zero
+        self.lock = threading.Lock()
+
+
+    def _partition(self, lot_id) -> ProcessPoolExecutor:
+        # crc32 rather than hash(): the same lot must land in the same partition in every process
+        return self.partitions[zlib.crc32(str(lot_id).encode()) % len(self.partitions)]
+
+
+    def _call(self, lot_id, function, *args):
+        return self._partition(lot_id).submit(function, lot_id, *args).result()
+
+
+    def _count(self, lot_id, spot_type, delta: int):
+        with self.lock:
+            self._set_free(lot_id, spot_type, self.free[lot_id][spot_type] + delta)
+
+
+    def _set_free(self, lot_id, spot_type, count: int):
+        # Caller holds self.lock
+        free = self.free[lot_id]
+        if (free[spot_type] > 0) != (count > 0):
+            if count > 0:
+                self.with_capacity[spot_type].add(lot_id)
+            else:
+                self.with_capacity[spot_type].discard(lot_id)
+        free[spot_type] = count
+
+
+    def execute_many(self, requests: list[tuple]) -> list:
+        # requests: (lot_id, "allocate", gate_id, spot_type) or (lot_id, "release", spot_id).
+        # One round trip per partition, all partitions at once; results in request order
+        # (allocate -> spot copy or None, release -> type of the released spot or None).
+        positions_by_partition = defaultdict(list)
+        for position, request in enumerate(requests):
+            positions_by_partition[self._partition(request[0])].append(position)
+        futures = [(positions, partition.submit(_execute_many, [requests[p] for p in positions]))
+                   for partition, positions in positions_by_partition.items()]
+        results = [None] * len(requests)
+        for positions, future in futures:
+            for position, result in zip(positions, future.result()):
+                results[position] = result
+        with self.lock:
+            for request, result in zip(requests, results):
+                if result is None:
+                    continue
+                lot_id = request[0]
+                spot_type, delta = (result.get_type(), -1) if request[1] == "allocate" else (result, 1)
+                self._set_free(lot_id, spot_type, self.free[lot_id][spot_type] + delta)
+        return results
+
+
+    def add_lot(self, lot_id, location=(0, 0)) -> RemoteLotManager:
+        with self.lock:
+            if lot_id in self.locations:
+                raise Exception(f"Lot {lot_id} is already registered")
+            self.locations[lot_id] = location
+            self.free[lot_id] = defaultdict(int)
+        self._call(lot_id, _add_lot)
+        return RemoteLotManager(self, lot_id)
+
+
+    def add_parking_spots(self, lot_id, rows: list[tuple[ParkingSpot, dict]]):
+        # rows: (spot, {gate_id: distance}), sent to the worker in one call
+        free = self._call(lot_id, _add_spots, rows)
+        with self.lock:
+            for spot_type, count in free.items():
+                self._set_free(lot_id, spot_type, count)
+
+
+    def get(self, lot_id) -> RemoteLotManager:
+        if lot_id not in self.locations:
+            raise Exception(f"No lot found for id: {lot_id}")
+        return RemoteLotManager(self, lot_id)
+
+
+    def nearest_lot_with_capacity(self, spot_type, location):
+        # O(lots with a free spot of that type), no worker is asked
+        with self.lock:
+            return min(((math.dist(location, self.locations[lot_id]), lot_id) for lot_id in self.with_capacity[spot_type]),
+                       default=(None, None))[1]
+
+
+    def close(self):
+        for partition in self.partitions:
+            partition.shutdown()
@@ -1,6 +1,10 @@
-from collections import defaultdict
+import threading
+import time
+
+from ParkingLot.allocation_policy_14 import AllocationPolicy, ExactTypePolicy
+from ParkingLot.booking_15 import BookingIndex
 from ParkingLot.parking_spot_1 import ParkingSpot
-import heapq
+from ParkingLot.spot_index_8 import SpotIndex
 
 
 class Gate:
@@ -13,48 +17,96 @@ class Gate:
 
 
 class ParkingLotManager:
+    # get_instance() is the lot of a single-lot deployment. An operator with many lots creates one
+    # manager per lot and keeps them in a LotRegistry (see lot_registry_9.py).
     _instance = None
+    _instance_lock = threading.Lock()
 
     @staticmethod
     def get_instance():
+        # Double-checked so terminals starting together create one manager
         if ParkingLotManager._instance is None:
-            ParkingLotManager()
+            with ParkingLotManager._instance_lock:
+                if ParkingLotManager._instance is None:
+                    ParkingLotManager._instance = ParkingLotManager()
         return ParkingLotManager._instance
     
 
-    def __init__(self):
-        if ParkingLotManager._instance is not None:
-            raise Exception('Use get_instance() instead of constructor')
-        ParkingLotManager._instance = self
-
+    def __init__(self, lot_id=None):
+        self.lot_id = lot_id
         self.gates = {} # gate_id -> Gate object
-        self.spots_by_gate_and_type = defaultdict(lambda: defaultdict(list))  # gate_id -> spot_type -> minHeap
+        self.spot_index = SpotIndex()  # one record per spot, nearest free spot per gate & type (see spot_index_8.py)
         self.spot_id_map = {}  # spot_id → ParkingSpot mapping to release ParkingSpot while exiting
+        self.allocation_policy = None # None: exact type only, see set_allocation_policy
+        self.bookings = None # BookingIndex once enable_bookings() was called
 
     
     def add_gate(self, gate: Gate):
         self.gates[gate.gate_id] = gate
+        self.spot_index.add_gate(gate.gate_id)
 
     
     def add_parking_spot(self, gate_id, spot: ParkingSpot, distance_from_gate: int):
-        # We'll use a min-heap to store (distance, spot)
-        heapq.heappush(self.spots_by_gate_and_type[gate_id][spot.get_type()], (distance_from_gate, spot))
+        # Adding a spot that is already known gives it a distance from one more gate, it is not duplicated
+        if spot.spot_id in self.spot_id_map:
+            self.spot_index.set_distance(spot.spot_id, gate_id, distance_from_gate)
+        else:
+            self.add_parking_spot_for_gates(spot, {gate_id: distance_from_gate})
+
+
+    def add_parking_spot_for_gates(self, spot: ParkingSpot, distances: dict):
+        # distances: gate_id -> distance_from_gate, one row of the gate x spot distance matrix
+        self.spot_index.add_spot(spot, distances)
         self.spot_id_map[spot.spot_id] = spot
 
 
+    def set_allocation_policy(self, policy: AllocationPolicy | None):
+        # Lets cars take a bigger spot type when theirs is full (allocation_policy_14.py), None for exact type only
+        self.allocation_policy = None if isinstance(policy, ExactTypePolicy) else policy
+
+
+    def enable_bookings(self, hold_ahead: float = 2 * 3600, clock=time.time) -> BookingIndex:
+        # Advance bookings (booking_15.py): booked spots are held from hold_ahead seconds before their window
+        self.bookings = BookingIndex(self.spot_index, hold_ahead, clock)
+        return self.bookings
+
+
     def get_nearest_available_spot(self, gate_id, spot_type):
-        spot_heap = self.spots_by_gate_and_type[gate_id][spot_type]
-        # Keep popping till I find a available spot
-        while spot_heap:
-            dist, spot = heapq.heappop(spot_heap)
-            if not spot.is_reserved:
-                spot.reserve()
-                return spot
-        return None # No spot available
+        # O(log n). Spots taken through other gates are skipped lazily.
+        # With an allocation policy the spot may be of a compatible bigger type, check spot.get_type().
+        if self.bookings is not None:
+            self.bookings.advance() # spots booked soon are held before a walk-in can take them
+        policy = self.allocation_policy
+        if policy is None:
+            return self.spot_index.allocate(gate_id, spot_type) # None if no spot available
+        return self.spot_index.allocate_compatible(gate_id, policy.spot_types(spot_type), policy.cost)
     
 
     def release_spot_by_id(self, spot_id):
-        spot = self.spot_id_map.get(spot_id)
-        if spot:
-            spot.release()
+        # O(g log n): the spot goes back into the ordering of every gate that reaches it
+        self.spot_index.release(spot_id)
+
+
+    def reserve_spot_by_id(self, spot_id) -> bool:
+        # Marks a given spot occupied (used by journal recovery), False if it already was
+        return self.spot_index.reserve(spot_id)
+
+
+    def free_spots(self, spot_type) -> int:
+        # O(1), counter kept by the index
+        return self.spot_index.free_count[spot_type]
+
+
+    def free_spots_at_gate(self, gate_id, spot_type) -> int:
+        # O(1), spots of that type reachable from the gate and not reserved
+        return self.spot_index.board.free_spots(gate_id, spot_type)
+
+
+    def availability_board(self) -> dict:
+        # gate_id -> spot_type -> {"free": n, "occupied": n} in one call
+        return self.spot_index.availability_board()
+
 
+    def subscribe_availability(self):
+        # Push feed of {(gate_id, spot_type): (free, occupied)} changes for display boards
+        return self.spot_index.subscribe_availability()
@@ -1,6 +1,11 @@
 from abc import ABC, abstractmethod
+import threading
 import uuid
 
+# reserve() is check-then-set: a small pool of locks, picked by spot id, makes it atomic
+# without a lock object per spot
+RESERVE_LOCKS = [threading.Lock() for _ in range(64)]
+
 class ParkingSpot(ABC):
     def __init__(self, spot_id=None):
         self.spot_id = spot_id or uuid.uuid4()
@@ -11,9 +16,10 @@ class ParkingSpot(ABC):
         pass
 
     def reserve(self):
-        if self.is_reserved:
-            raise Exception(f'Spot {self.spot_id} is already reserved.')
-        self.is_reserved = True
+        with RESERVE_LOCKS[hash(self.spot_id) % len(RESERVE_LOCKS)]:
+            if self.is_reserved:
+                raise Exception(f'Spot {self.spot_id} is already reserved.')
+            self.is_reserved = True
         return True
     
     def release(self):
@@ -1,56 +1,120 @@
 from abc import ABC, abstractmethod
+from datetime import datetime
 from ParkingLot.parking_lot_manager_2 import ParkingLotManager
 from ParkingLot.parking_ticket_3 import ParkingTicket
-from ParkingLot.pricing_strategy_5 import PricingStrategyFactory
+from ParkingLot.pricing_strategy_5 import DEFAULT_RATE_TABLE, PricingStrategyFactory, RateTable
 
 
 class Terminal(ABC):
-    def __init__(self, terminal_id, gate_id):
+    def __init__(self, terminal_id, gate_id, lot_id=None, registry=None, tickets=None, clock=datetime.now,
+                 quiet=False, journal=None):
+        # Without a lot_id the terminal belongs to the single lot of ParkingLotManager.get_instance().
+        # With one, registry (LotRegistry or PartitionedLotRegistry) routes it to that lot's manager.
+        # tickets: optional TicketRepository (ticket_repository_11.py) keeping every ticket issued / paid here.
+        # clock: returns the current datetime; a simulation passes its virtual clock (see simulator_12.py).
+        # quiet: no printing, for simulations and benchmarks.
+        # journal: optional LotJournal (journal_13.py) recording allocate / pay / release for crash recovery.
         self.terminal_id = terminal_id
         self.gate_id = gate_id
+        self.lot_id = lot_id
+        self.registry = registry
+        self.tickets = tickets
+        self.clock = clock
+        self.quiet = quiet
+        self.journal = journal
+        if journal is not None:
+            journal.check_gate(gate_id) # the journal can only record gates the lot had when it was created
+
+
+    def get_manager(self):
+        if self.lot_id is None:
+            return ParkingLotManager.get_instance()
+        return self.registry.get(self.lot_id)
+
+
+    def log(self, *values):
+        # Arguments as for print(), only formatted when printed
+        if not self.quiet:
+            print(*values)
     
 
 class EntryTerminal(Terminal):
     def get_ticket(self, spot_type):
         # To create ticket I need spot, gate_id
-        manager = ParkingLotManager.get_instance()
+        manager = self.get_manager()
         spot = manager.get_nearest_available_spot(self.gate_id, spot_type)
 
         if not spot:
-            print(f"No available {spot_type} spots at gate {self.gate_id}")
+            self.log(f"No available {spot_type} spots at gate {self.gate_id}")
             return None
-        
-        ticket = ParkingTicket(spot, self.gate_id)
-        print(f"Issued ticket {ticket}")
+        return self._issue(spot)
+
+
+    def _issue(self, spot):
+        if self.tickets is not None:
+            ticket = self.tickets.issue(spot, self.gate_id, self.lot_id, self.clock()) # integer ticket_id
+        else:
+            ticket = ParkingTicket(spot, self.gate_id, self.lot_id, self.clock())
+        if self.journal is not None:
+            self.journal.allocated(ticket)
+        self.log("Issued ticket", ticket)
         return ticket
+
+
+    def get_ticket_for_booking(self, booking_id):
+        # The car booked in advance (manager.bookings, booking_15.py) and gets the spot held for it
+        manager = self.get_manager()
+        spot = manager.bookings.claim(booking_id)
+        if spot is None:
+            self.log(f"No spot could be kept for booking {booking_id}")
+            return None
+        return self._issue(spot)
     
 
-from datetime import datetime
+def billable_hours(issue_time: datetime, exit_time: datetime) -> int:
+    # Whole hours parked, at least one. total_seconds() so stays longer than a day are billed in full.
+    return max(1, int((exit_time - issue_time).total_seconds()) // 3600)
+
 
 class ExitTerminal(Terminal):
     def accept_ticket(self, ticket: ParkingTicket):
         if ticket.paid:
-            print("Ticket already paid")
+            self.log("Ticket already paid")
             return
         
         # Calculate parking fare
-        exit_time = datetime.now()
+        exit_time = self.clock()
         ticket.mark_exit(exit_time)
 
-        duration_hours = max(1, (exit_time - ticket.issue_time).seconds // 3600)
+        duration_hours = billable_hours(ticket.issue_time, exit_time)
         # rate_per_hour = 20
         # amount = duration_hours * rate_per_hour
 
         strategy = PricingStrategyFactory.get_strategy(ticket.parking_spot_type)
         amount = strategy.calculate_price(duration_hours)
 
-        print(f"Total due: ₹{amount} for {duration_hours} hour(s)")
+        self.log(f"Total due: ₹{amount} for {duration_hours} hour(s)")
         ticket.mark_paid(amount)
+        if self.tickets is not None:
+            self.tickets.close_ticket(ticket.ticket_id, exit_time.timestamp(), amount)
+        if self.journal is not None:
+            self.journal.paid(ticket)
 
         # Release the parking spot
-        manager = ParkingLotManager.get_instance()
-        manager.release_parking_spot(ticket.parking_spot_id)
-        # Need to find and release spot — assuming we maintain spot_id→spot_map
+        manager = self.get_manager()
+        manager.release_spot_by_id(ticket.parking_spot_id)
+        if self.journal is not None:
+            self.journal.released(ticket.parking_spot_id)
+
+        self.log(f"Payment successful for Ticket {ticket.ticket_id}. Spot is now free.")
+
 
-        print(f"Payment successful for Ticket {ticket.ticket_id}. Spot is now free.")
+    @staticmethod
+    def price_tickets(tickets: list[ParkingTicket], rate_table: RateTable = DEFAULT_RATE_TABLE):
+        # End-of-day settlement: fares of exited tickets, one column per field and one rate_table.prices() call.
+        # Tickets are not changed and no spot is released.
+        spot_types = [ticket.parking_spot_type for ticket in tickets]
+        hours = [billable_hours(ticket.issue_time, ticket.exit_time) for ticket in tickets]
+        entry_hours = [ticket.issue_time.hour for ticket in tickets]
+        return rate_table.prices(spot_types, hours, entry_hours)
 
@@ -2,12 +2,13 @@ import uuid
 from datetime import datetime
 
 class ParkingTicket:
-    def __init__(self, spot, gate_id):
-        self.ticket_id = str(uuid.uuid4())
+    def __init__(self, spot, gate_id, lot_id=None, issue_time=None, ticket_id=None):
+        self.ticket_id = ticket_id if ticket_id is not None else str(uuid.uuid4())
+        self.lot_id = lot_id
         self.parking_spot_id = spot.spot_id
         self.parking_spot_type = spot.get_type()
         self.gate_id = gate_id
-        self.issue_time = datetime.now()
+        self.issue_time = issue_time or datetime.now()
         self.exit_time = None
         self.paid = False
         self.amount = 0.0
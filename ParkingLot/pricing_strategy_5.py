@@ -5,8 +5,20 @@ Compact	20
 Large	30
 Truck	50
 
+Strategies are stateless, so PricingStrategyFactory hands out one cached instance per spot type.
+
+For settlement of many tickets at once, RateTable.prices() takes columns (spot types, hours parked,
+optional entry hour of day) and prices them all together: with NumPy in a few vectorized passes,
+without it in a plain loop over precomputed tiers. A RateTable can be tiered (different rate after
+the first hours) and scale fares by the hour of day the car entered.
 """
 from abc import ABC, abstractmethod
+import math
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional, RateTable.prices() falls back to pure Python
+    np = None
 
 
 class PricingStrategy(ABC):
@@ -32,16 +44,136 @@ class TruckPricing(PricingStrategy):
         return hours * 50
     
 
+class RateTable:
+    def __init__(self, tiers: dict, hour_multipliers: list[float] | None = None):
+        # tiers: spot_type -> [(up_to_hours, rate_per_hour), ...] in increasing order, the last one up to math.inf.
+        #        [(3, 20), (math.inf, 15)] charges 20/hour for the first 3 hours and 15/hour after.
+        # hour_multipliers: 24 factors by hour of day the car entered, e.g. 1.5 for the evening peak
+        if hour_multipliers is not None and len(hour_multipliers) != 24:
+            raise ValueError("hour_multipliers needs one factor per hour of the day")
+        self.tiers = {spot_type: list(type_tiers) for spot_type, type_tiers in tiers.items()}
+        self.hour_multipliers = hour_multipliers
+        self.type_codes = {spot_type: code for code, spot_type in enumerate(self.tiers)}
+        self.fare_functions = {spot_type: _fare_function(type_tiers) for spot_type, type_tiers in self.tiers.items()}
+
+        # Padded columns for the vectorized path: code -> tier -> (start hour, hours in tier, rate)
+        self.num_tiers = max(len(type_tiers) for type_tiers in self.tiers.values())
+        self.starts, self.widths, self.rates = [], [], []
+        for type_tiers in self.tiers.values():
+            starts, widths, rates = [], [], []
+            start = 0
+            for up_to_hours, rate in type_tiers:
+                starts.append(start)
+                widths.append(up_to_hours - start)
+                rates.append(rate)
+                start = up_to_hours
+            padding = self.num_tiers - len(type_tiers)
+            self.starts.append(starts + [0] * padding)
+            self.widths.append(widths + [0] * padding)
+            self.rates.append(rates + [0] * padding)
+
+
+    def price(self, spot_type: str, hours: float, entry_hour: int | None = None) -> float:
+        fare_function = self.fare_functions.get(spot_type)
+        if fare_function is None:
+            raise Exception(f"No pricing strategy found for type: {spot_type}")
+        fare = fare_function(hours)
+        if self.hour_multipliers is not None and entry_hour is not None:
+            fare *= self.hour_multipliers[entry_hour]
+        return fare
+
+
+    def prices(self, spot_types, hours, entry_hours=None):
+        # Columns of equal length. spot_types: names, or codes from self.type_codes. Returns a NumPy
+        # array when NumPy is installed, a list otherwise.
+        if np is None:
+            return self._prices_python(spot_types, hours, entry_hours)
+        return self._prices_numpy(spot_types, hours, entry_hours)
+
+
+    def _prices_python(self, spot_types, hours, entry_hours) -> list[float]:
+        # One fare function per type, looked up per row; codes are mapped to their function the same way
+        fare_functions = dict(self.fare_functions)
+        fare_functions.update(enumerate(self.fare_functions.values()))
+        try:
+            fares = [fare_functions[spot_type](hours_parked) for spot_type, hours_parked in zip(spot_types, hours)]
+        except KeyError as error:
+            raise Exception(f"No pricing strategy found for type: {error.args[0]}") from None
+        if entry_hours is not None and self.hour_multipliers is not None:
+            multipliers = self.hour_multipliers
+            fares = [fare * multipliers[entry_hour] for fare, entry_hour in zip(fares, entry_hours)]
+        return fares
+
+
+    def _prices_numpy(self, spot_types, hours, entry_hours):
+        spot_types = np.asarray(spot_types)
+        if spot_types.dtype.kind in "iu":
+            codes = spot_types
+        else:
+            # One vectorized comparison per known type, cheaper than sorting the column for np.unique
+            codes = np.full(len(spot_types), -1, dtype=np.intp)
+            for spot_type, code in self.type_codes.items():
+                codes[spot_types == spot_type] = code
+            if (codes < 0).any():
+                raise Exception(f"No pricing strategy found for type: {spot_types[codes < 0][0]}")
+        hours = np.asarray(hours, dtype=np.float64)
+        starts = np.array(self.starts, dtype=np.float64)[codes]
+        widths = np.array(self.widths, dtype=np.float64)[codes]
+        rates = np.array(self.rates, dtype=np.float64)[codes]
+        fares = (np.clip(hours[:, None] - starts, 0, widths) * rates).sum(axis=1)
+        if entry_hours is not None and self.hour_multipliers is not None:
+            fares *= np.array(self.hour_multipliers, dtype=np.float64)[np.asarray(entry_hours)]
+        return fares
+
+
+def _fare_function(type_tiers: list):
+    # Fare for hours parked under one type's tiers; a single tier is a plain multiplication
+    if len(type_tiers) == 1:
+        rate = type_tiers[0][1]
+        return lambda hours: hours * rate
+
+    def fare(hours):
+        total = 0
+        start = 0
+        for up_to_hours, rate in type_tiers:
+            if hours <= start:
+                break
+            total += (min(hours, up_to_hours) - start) * rate
+            start = up_to_hours
+        return total
+    return fare
+
+
+# Same rates as the strategies above. "Truck" is kept for callers using the old name of "TruckSpot".
+DEFAULT_RATE_TABLE = RateTable({
+    "Handicapped": [(math.inf, 10)],
+    "Compact": [(math.inf, 20)],
+    "Large": [(math.inf, 30)],
+    "TruckSpot": [(math.inf, 50)],
+    "Truck": [(math.inf, 50)],
+})
+
+
 class PricingStrategyFactory:
+    _strategies = {} # spot_type -> strategy, strategies hold no state so one instance is enough
+
     @staticmethod
     def get_strategy(spot_type: str) -> PricingStrategy:
+        strategy = PricingStrategyFactory._strategies.get(spot_type)
+        if strategy is None:
+            strategy = PricingStrategyFactory._create(spot_type)
+            PricingStrategyFactory._strategies[spot_type] = strategy
+        return strategy
+
+    @staticmethod
+    def _create(spot_type: str) -> PricingStrategy:
         if spot_type == 'Handicapped':
             return HandicappedPricing()
         elif spot_type == "Compact":
             return CompactPricing()
         elif spot_type == "Large":
             return LargePricing()
-        elif spot_type == "Truck":
+        elif spot_type in ("Truck", "TruckSpot"): # TruckSpot.get_type() is "TruckSpot"
             return TruckPricing()
         else:
             raise Exception(f"No pricing strategy found for type: {spot_type}")
\ No newline at end of file
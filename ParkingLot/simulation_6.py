@@ -1,9 +1,10 @@
-import time
-from datetime import timedelta
+from datetime import datetime
 from ParkingLot.parking_lot_manager_2 import ParkingLotManager, Gate
-from ParkingLot.pricing_strategy_5 import PricingStrategyFactory
 from ParkingLot.parking_spot_1 import HandicappedSpot, CompactSpot, LargeSpot, TruckSpot
 from ParkingLot.parking_terminal_4 import  EntryTerminal, ExitTerminal
+from ParkingLot.simulator_12 import VirtualClock
+
+# Three cars by hand. For arrivals at scale, occupancy and revenue see simulator_12.py.
 
 
 if __name__ == "__main__":
@@ -29,34 +30,26 @@ if __name__ == "__main__":
         manager.add_parking_spot("gate-B", LargeSpot(), distance_from_gate=16 + i)
         manager.add_parking_spot("gate-B", TruckSpot(), distance_from_gate=21 + i)
 
-    # STEP 3: Entry simulation
-    entry_terminal_a = EntryTerminal("entry-1", "gate-A")
-    entry_terminal_b = EntryTerminal("entry-2", "gate-B")
+    # STEP 3: Entry simulation, terminals read a virtual clock so no real waiting is needed
+    clock = VirtualClock(datetime(2024, 1, 1, 9))
+    entry_terminal_a = EntryTerminal("entry-1", "gate-A", clock=clock.now)
+    entry_terminal_b = EntryTerminal("entry-2", "gate-B", clock=clock.now)
 
     print("\n--- Vehicles Enter ---")
     ticket1 = entry_terminal_a.get_ticket("Compact")
-    ticket2 = entry_terminal_b.get_ticket("Truck")
+    ticket2 = entry_terminal_b.get_ticket("TruckSpot")
     ticket3 = entry_terminal_a.get_ticket("Handicapped")
 
-    # Fake a wait to simulate time passage
-    time.sleep(2)
+    # Each car stays 3 hours
+    clock.advance_to(3 * 3600)
 
     # STEP 4: Exit simulation
-    exit_terminal = ExitTerminal("exit-1", "gate-A")
+    exit_terminal = ExitTerminal("exit-1", "gate-A", clock=clock.now)
 
     print("\n--- Vehicles Exit ---")
     for ticket in [ticket1, ticket2, ticket3]:
         if ticket:
-            # Fake ticket.issue_time to simulate past time
-            ticket.issue_time -= timedelta(hours=3)  # Pretend each stayed 3 hours
-            strategy = PricingStrategyFactory.get_strategy(ticket.parking_spot_type)
-            hours_parked = 3
-            price = strategy.calculate_price(hours_parked)
-
-            ticket.mark_exit(ticket.issue_time + timedelta(hours=hours_parked))
-            ticket.mark_paid(price)
-            manager.release_spot_by_id(ticket.parking_spot_id)
-
-            print(f"Ticket {ticket.ticket_id}: {ticket.parking_spot_type} → ₹{price} for {hours_parked} hours")
+            exit_terminal.accept_ticket(ticket)
+            print(f"Ticket {ticket.ticket_id}: {ticket.parking_spot_type} → ₹{ticket.amount}")
 
     print("\n✅ Simulation Complete.")
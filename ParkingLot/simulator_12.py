@@ -0,0 +1,211 @@
+"""
+Discrete-event simulation of a lot for capacity planning.
+
+The real ParkingLotManager, EntryTerminal and ExitTerminal run against a virtual clock: events wait in a
+heap ordered by time, the clock jumps to the next one, nothing sleeps. Per scenario:
+    arrivals        Poisson process, arrival_rate cars per hour, each at a random gate
+    spot types      drawn from spot_mix, e.g. {"Compact": 0.6, "Large": 0.3, ...}
+    dwell           hours parked, from one of DWELL_DISTRIBUTIONS with mean mean_dwell_hours
+A car that gets no spot is rejected (it does not wait or come back). Every sample_hours the occupancy
+is recorded. The report has occupancy over time, rejection rate per type and revenue charged by the
+exit terminals.
+
+Independent scenarios run in parallel with run_scenarios(), one process per scenario at a time.
+Scenario only holds plain values so it can be sent to a worker process.
+
+To run, python3 -m ParkingLot.simulator_12 command from one level above ParkingLot folder.
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import heapq
+import math
+import random
+import time
+
+from ParkingLot.lot_registry_9 import LotRegistry
+from ParkingLot.parking_lot_manager_2 import Gate
+from ParkingLot.parking_spot_1 import CompactSpot, HandicappedSpot, LargeSpot, TruckSpot
+from ParkingLot.parking_terminal_4 import EntryTerminal, ExitTerminal
+
+SPOT_CLASSES = {"Handicapped": HandicappedSpot, "Compact": CompactSpot, "Large": LargeSpot, "TruckSpot": TruckSpot}
+
+# name -> function(rng, mean hours) returning hours parked
+DWELL_DISTRIBUTIONS = {
+    "exponential": lambda rng, mean: rng.expovariate(1 / mean),
+    # sigma 0.75: most stays near the mean, a long tail of all-day parkers
+    "lognormal": lambda rng, mean: rng.lognormvariate(math.log(mean) - 0.75 ** 2 / 2, 0.75),
+    "uniform": lambda rng, mean: rng.uniform(0, 2 * mean),
+    "fixed": lambda rng, mean: mean,
+}
+
+# Event kinds, in the order they are handled when they happen at the same time
+EXIT, ARRIVAL = 0, 1
+
+
+class VirtualClock:
+    def __init__(self, start: datetime):
+        self.start = start
+        self.seconds = 0.0 # since start
+
+
+    def now(self) -> datetime:
+        # Passed to the terminals in place of datetime.now
+        return self.start + timedelta(seconds=self.seconds)
+
+
+    def advance_to(self, seconds: float):
+        if seconds < self.seconds:
+            raise Exception(f"Clock cannot go back from {self.seconds} to {seconds}")
+        self.seconds = seconds
+
+
+class Scenario:
+    def __init__(self, name, spots: dict | None = None, num_gates=2, arrival_rate=300.0, spot_mix: dict | None = None,
+                 dwell="exponential", mean_dwell_hours=2.0, hours=24.0, sample_hours=1.0, seed=1):
+        # spots: spot_type -> number of spots; arrival_rate: cars per hour over all gates
+        if dwell not in DWELL_DISTRIBUTIONS:
+            raise Exception(f"No dwell distribution found for name: {dwell}")
+        self.name = name
+        self.spots = spots or {"Handicapped": 50, "Compact": 600, "Large": 300, "TruckSpot": 50}
+        self.num_gates = num_gates
+        self.arrival_rate = arrival_rate
+        self.spot_mix = spot_mix or {"Handicapped": 0.05, "Compact": 0.6, "Large": 0.3, "TruckSpot": 0.05}
+        self.dwell = dwell
+        self.mean_dwell_hours = mean_dwell_hours
+        self.hours = hours
+        self.sample_hours = sample_hours
+        self.seed = seed
+
+
+    def __repr__(self):
+        return f"Scenario({self.name}, {sum(self.spots.values())} spots, {self.arrival_rate}/h, {self.dwell} dwell)"
+
+
+class Simulation:
+    def __init__(self, scenario: Scenario):
+        self.scenario = scenario
+        self.rng = random.Random(scenario.seed)
+        self.clock = VirtualClock(datetime(2024, 1, 1))
+        self.events = [] # heap of (time in seconds, kind, sequence, payload)
+        self.sequence = 0
+
+        # A lot of its own, terminals reach it through the registry like in an operator setup
+        self.registry = LotRegistry()
+        self.manager = self.registry.add_lot(scenario.name)
+        self.gate_ids = [f"gate-{i}" for i in range(scenario.num_gates)]
+        for gate_id in self.gate_ids:
+            self.manager.add_gate(Gate(gate_id, gate_id))
+        spot_id = 0
+        for spot_type, count in scenario.spots.items():
+            for _ in range(count):
+                spot_id += 1
+                distances = {gate_id: self.rng.randint(1, 1000) for gate_id in self.gate_ids}
+                self.manager.add_parking_spot_for_gates(SPOT_CLASSES[spot_type](spot_id=spot_id), distances)
+        self.total_spots = spot_id
+        terminal_options = {"lot_id": scenario.name, "registry": self.registry, "clock": self.clock.now, "quiet": True}
+        self.entry_terminals = [EntryTerminal(f"entry-{gate_id}", gate_id, **terminal_options) for gate_id in self.gate_ids]
+        self.exit_terminals = [ExitTerminal(f"exit-{gate_id}", gate_id, **terminal_options) for gate_id in self.gate_ids]
+
+        self.arrivals = Counter() # spot_type -> cars
+        self.rejections = Counter() # spot_type -> cars turned away
+        self.revenue = 0.0
+        self.occupancy = [] # (hour, occupied spots)
+        self.processed = 0
+
+
+    def _schedule(self, at_seconds: float, kind: int, payload=None):
+        self.sequence += 1
+        heapq.heappush(self.events, (at_seconds, kind, self.sequence, payload))
+
+
+    def _schedule_arrival(self):
+        self._schedule(self.clock.seconds + self.rng.expovariate(self.scenario.arrival_rate) * 3600, ARRIVAL)
+
+
+    def _occupied(self) -> int:
+        return self.total_spots - sum(self.manager.free_spots(spot_type) for spot_type in self.scenario.spots)
+
+
+    def run(self) -> dict:
+        scenario = self.scenario
+        rng = self.rng
+        spot_types, weights = list(scenario.spot_mix), list(scenario.spot_mix.values())
+        dwell = DWELL_DISTRIBUTIONS[scenario.dwell]
+        end_seconds = scenario.hours * 3600
+        sample_every = scenario.sample_hours * 3600
+        next_sample = 0.0
+        events = self.events
+
+        self._schedule_arrival()
+        started = time.perf_counter()
+        while events and events[0][0] < end_seconds:
+            at_seconds, kind, _, ticket = heapq.heappop(events)
+            while next_sample <= at_seconds:
+                self.occupancy.append((next_sample / 3600, self._occupied()))
+                next_sample += sample_every
+            self.clock.advance_to(at_seconds)
+            self.processed += 1
+            if kind == ARRIVAL:
+                self._schedule_arrival()
+                spot_type = rng.choices(spot_types, weights)[0]
+                self.arrivals[spot_type] += 1
+                ticket = rng.choice(self.entry_terminals).get_ticket(spot_type)
+                if ticket is None:
+                    self.rejections[spot_type] += 1
+                else:
+                    self._schedule(at_seconds + dwell(rng, scenario.mean_dwell_hours) * 3600, EXIT, ticket)
+            else:
+                rng.choice(self.exit_terminals).accept_ticket(ticket)
+                self.revenue += ticket.amount
+        while next_sample < end_seconds:
+            self.occupancy.append((next_sample / 3600, self._occupied()))
+            next_sample += sample_every
+        elapsed = time.perf_counter() - started
+
+        arrivals = sum(self.arrivals.values())
+        return {
+            "scenario": scenario.name,
+            "spots": self.total_spots,
+            "events": self.processed,
+            "events_per_second": self.processed / elapsed if elapsed else 0.0,
+            "arrivals": arrivals,
+            "rejected": sum(self.rejections.values()),
+            "rejection_rate": sum(self.rejections.values()) / arrivals if arrivals else 0.0,
+            "rejection_rate_by_type": {spot_type: self.rejections[spot_type] / count
+                                       for spot_type, count in self.arrivals.items()},
+            "revenue": self.revenue,
+            "occupancy": self.occupancy, # (hour, occupied spots), still parked cars are not charged
+        }
+
+
+def run_scenario(scenario: Scenario) -> dict:
+    return Simulation(scenario).run()
+
+
+def run_scenarios(scenarios: list[Scenario], max_workers: int | None = None) -> list[dict]:
+    # Scenarios are independent, one worker process runs one at a time; reports in scenario order
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(run_scenario, scenarios))
+
+
+def print_report(report: dict):
+    print(f"--- {report['scenario']}: {report['spots']} spots, {report['events']:,} events "
+          f"({report['events_per_second'] / 1000:.0f}k events/s) ---")
+    print(f"arrivals {report['arrivals']:,}, rejected {report['rejected']:,} ({report['rejection_rate']:.1%}), "
+          f"revenue ₹{report['revenue']:,.0f}")
+    print("rejected by type: " + ", ".join(f"{spot_type} {rate:.1%}"
+                                           for spot_type, rate in report["rejection_rate_by_type"].items()))
+    peak_hour, peak = max(report["occupancy"], key=lambda sample: sample[1])
+    print(f"peak occupancy {peak / report['spots']:.0%} at hour {peak_hour:g}")
+    for hour, occupied in report["occupancy"][::max(1, len(report["occupancy"]) // 12)]:
+        share = occupied / report["spots"]
+        print(f"  hour {hour:6g} {'#' * round(share * 40):<40} {share:4.0%}")
+
+
+if __name__ == "__main__":
+    # Same lot, growing demand: where does it start turning cars away?
+    scenarios = [Scenario(f"{rate} cars/h", arrival_rate=rate, dwell="lognormal", hours=24 * 7)
+                 for rate in (300, 450, 600)]
+    for report in run_scenarios(scenarios):
+        print_report(report)
@@ -0,0 +1,270 @@
+"""
+Shared nearest-spot index for every gate of the lot.
+
+Every spot is stored once (a dense spot number), with its distance to each gate it can be reached from:
+    distances[gate_id]      array of distance per spot number, -1 when the gate does not reach the spot
+    gates[number]           tuple of the gates that reach the spot, kept with distances
+    heaps[gate_id][type]    min-heap of distance << 32 | spot number, one entry per spot and gate at most
+    in_heap[gate_id]        bytearray, 1 while the spot has an entry in that gate's heap
+
+Reserving through one gate does not touch the other gates (lazy invalidation): their entry for the spot
+stays in place and is dropped when it reaches the top of their heap while the spot is taken.
+Releasing pushes the spot back only into the heaps that dropped it, so a heap never holds duplicates.
+
+allocate    O(log n) amortized, every dropped entry was paid for by a reserve
+allocate_compatible  the same for the cheapest spot over a few types (see allocation_policy_14.py)
+release     O(g log n), g = gates whose heap dropped the spot meanwhile
+
+Thread safety: a spot's heaps (one per gate) only ever hold spots of its type, so allocate / release take
+the lock of that spot type only; terminals asking for different types never wait on each other.
+add_gate / add_spot / set_distance take self.lock as well and are meant for setting the lot up.
+"""
+from array import array
+from collections import defaultdict
+import heapq
+import threading
+
+from ParkingLot.availability_10 import AvailabilityBoard, AvailabilitySubscription
+from ParkingLot.parking_spot_1 import ParkingSpot
+
+SPOT_BITS = 32
+SPOT_MASK = (1 << SPOT_BITS) - 1
+
+
+class SpotIndex:
+    def __init__(self):
+        self.spots = [] # spot number -> ParkingSpot
+        self.number_by_id = {} # spot_id -> spot number
+        self.types = [] # spot number -> spot type
+        self.gates = [] # spot number -> tuple of gate_ids with a distance to it
+        self.distances = {} # gate_id -> array of distance per spot number
+        self.heaps = defaultdict(lambda: defaultdict(list)) # gate_id -> spot_type -> min-heap
+        self.in_heap = {} # gate_id -> bytearray per spot number
+        self.free_count = defaultdict(int) # spot_type -> free spots, changed under the type lock
+        self.capacity_listeners = [] # called with (spot_type, has free spots) when a free_count crosses zero
+        self.board = AvailabilityBoard() # free / occupied per gate & type (see availability_10.py)
+        self.lock = threading.Lock() # structure changes: gates and spots being added
+        self.type_locks = {} # spot_type -> Lock guarding allocate / release of that type
+        self.lock_orders = {} # tuple of spot types -> their locks in sorted order, for allocate_compatible
+        self.version = 0 # bumped by every gate, spot and distance added, for caches built on the layout
+
+
+    def _type_lock(self, spot_type) -> threading.Lock:
+        lock = self.type_locks.get(spot_type)
+        if lock is None:
+            with self.lock:
+                lock = self.type_locks.setdefault(spot_type, threading.Lock())
+        return lock
+
+
+    def add_gate(self, gate_id):
+        with self.lock:
+            self._add_gate(gate_id)
+
+
+    def _add_gate(self, gate_id):
+        # Caller holds self.lock
+        if gate_id not in self.distances:
+            self.distances[gate_id] = array("i", [-1]) * len(self.spots)
+            self.in_heap[gate_id] = bytearray(len(self.spots))
+            self.version += 1
+
+
+    def add_spot(self, spot: ParkingSpot, distances: dict) -> int:
+        # distances: gate_id -> distance from that gate. Gates left out do not offer the spot.
+        type_lock = self._type_lock(spot.get_type())
+        with self.lock, type_lock:
+            if spot.spot_id in self.number_by_id:
+                raise Exception(f"Spot {spot.spot_id} is already in the index")
+            for gate_id in distances:
+                self._add_gate(gate_id)
+            number = len(self.spots)
+            self.spots.append(spot)
+            self.number_by_id[spot.spot_id] = number
+            self.types.append(spot.get_type())
+            for gate_id, gate_distances in self.distances.items():
+                gate_distances.append(distances.get(gate_id, -1))
+                self.in_heap[gate_id].append(0)
+            self.gates.append(tuple(gate_id for gate_id, gate_distances in self.distances.items()
+                                    if gate_distances[number] >= 0))
+            self.version += 1
+            if not spot.is_reserved:
+                self._push(number, self.gates[number])
+                self._count(spot.get_type(), 1)
+            self.board.spot_added(self.gates[number], spot.get_type(), not spot.is_reserved)
+            return number
+
+
+    def set_distance(self, spot_id, gate_id, distance: int):
+        # Adds one more gate to a spot already in the index
+        number = self.number_by_id[spot_id]
+        type_lock = self._type_lock(self.types[number])
+        with self.lock, type_lock:
+            self._add_gate(gate_id)
+            if self.distances[gate_id][number] >= 0:
+                raise Exception(f"Spot {spot_id} already has a distance from gate {gate_id}")
+            self.distances[gate_id][number] = distance
+            self.version += 1
+            if distance >= 0:
+                self.gates[number] += (gate_id,)
+            if not self.spots[number].is_reserved:
+                self._push(number, (gate_id,))
+            self.board.spot_added((gate_id,), self.types[number], not self.spots[number].is_reserved)
+
+
+    def _count(self, spot_type, delta: int):
+        # Caller holds the type lock. Listeners only hear about 0 -> 1 and 1 -> 0.
+        count = self.free_count[spot_type] + delta
+        self.free_count[spot_type] = count
+        if count == 0 or count == delta:
+            for listener in self.capacity_listeners:
+                listener(spot_type, count > 0)
+
+
+    def _push(self, number: int, gate_ids):
+        # Caller holds the type lock of the spot
+        spot_type = self.types[number]
+        for gate_id in gate_ids:
+            distance = self.distances[gate_id][number]
+            if distance >= 0 and not self.in_heap[gate_id][number]:
+                heapq.heappush(self.heaps[gate_id][spot_type], distance << SPOT_BITS | number)
+                self.in_heap[gate_id][number] = 1
+
+
+    def peek(self, gate_id, spot_type) -> ParkingSpot | None:
+        # Nearest free spot without reserving it, another terminal may take it right after
+        with self._type_lock(spot_type):
+            return self._peek(gate_id, spot_type)
+
+
+    def _peek(self, gate_id, spot_type) -> ParkingSpot | None:
+        # Caller holds the type lock. Drops entries of spots taken through other gates.
+        heap = self.heaps[gate_id][spot_type]
+        in_heap = self.in_heap.get(gate_id)
+        while heap:
+            number = heap[0] & SPOT_MASK
+            spot = self.spots[number]
+            if not spot.is_reserved:
+                return spot
+            heapq.heappop(heap)
+            in_heap[number] = 0
+        return None
+
+
+    def allocate(self, gate_id, spot_type) -> ParkingSpot | None:
+        # Finding and reserving the spot happen under one lock, two terminals never get the same spot
+        with self._type_lock(spot_type):
+            if self._peek(gate_id, spot_type) is None:
+                return None
+            return self._take_top(gate_id, spot_type)
+
+
+    def allocate_compatible(self, gate_id, spot_types: list, cost) -> ParkingSpot | None:
+        # Cheapest free spot over several types, cost(level, distance) with level = position in spot_types.
+        # Each type's heap top is its nearest free spot, so the tops are the only candidates: one peek per
+        # type, one pop. The type locks are taken in sorted order, like _all_type_locks.
+        spot_types = tuple(spot_types)
+        locks = self.lock_orders.get(spot_types)
+        if locks is None:
+            locks = self.lock_orders[spot_types] = [self._type_lock(spot_type) for spot_type in sorted(spot_types)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            best_cost, best_type = None, None
+            for level, spot_type in enumerate(spot_types):
+                if best_cost is not None and cost(level, 0) >= best_cost:
+                    break # this level and the ones after cannot beat the best found
+                if self._peek(gate_id, spot_type) is not None:
+                    candidate = cost(level, self.heaps[gate_id][spot_type][0] >> SPOT_BITS)
+                    if best_cost is None or candidate < best_cost:
+                        best_cost, best_type = candidate, spot_type
+            if best_type is None:
+                return None
+            return self._take_top(gate_id, best_type)
+        finally:
+            for lock in locks:
+                lock.release()
+
+
+    def _take_top(self, gate_id, spot_type) -> ParkingSpot:
+        # Caller holds the type lock and has just peeked a free spot
+        number = heapq.heappop(self.heaps[gate_id][spot_type]) & SPOT_MASK
+        self.in_heap[gate_id][number] = 0
+        spot = self.spots[number]
+        spot.reserve()
+        self._count(spot_type, -1)
+        self.board.spot_taken(self.gates[number], spot_type)
+        return spot
+
+
+    def reserve(self, spot_id) -> bool:
+        # Takes this very spot, e.g. one that recovery found occupied. Heap entries stay and are dropped lazily.
+        number = self.number_by_id.get(spot_id)
+        if number is None:
+            return False
+        spot = self.spots[number]
+        with self._type_lock(self.types[number]):
+            if spot.is_reserved:
+                return False
+            spot.reserve()
+            self._count(self.types[number], -1)
+            self.board.spot_taken(self.gates[number], self.types[number])
+            return True
+
+
+    def release(self, spot_id) -> bool:
+        number = self.number_by_id.get(spot_id)
+        if number is None:
+            return False
+        spot = self.spots[number]
+        with self._type_lock(self.types[number]):
+            if not spot.is_reserved:
+                return False
+            spot.release()
+            self._push(number, self.gates[number])
+            self._count(self.types[number], 1)
+            self.board.spot_freed(self.gates[number], self.types[number])
+            return True
+
+
+    def _all_type_locks(self) -> list:
+        # Always taken in the same order, allocate / release only ever hold one of them
+        with self.lock:
+            return [self.type_locks[spot_type] for spot_type in sorted(self.type_locks)]
+
+
+    def availability_board(self) -> dict:
+        # Whole board in one call, consistent across types
+        locks = self._all_type_locks()
+        for lock in locks:
+            lock.acquire()
+        try:
+            return self.board.snapshot()
+        finally:
+            for lock in locks:
+                lock.release()
+
+
+    def subscribe_availability(self) -> AvailabilitySubscription:
+        # The first changes of the subscription are the whole board, everything after comes as it happens
+        locks = self._all_type_locks()
+        for lock in locks:
+            lock.acquire()
+        try:
+            subscription = self.board.subscribe()
+            subscription._push({(gate_id, spot_type): (counts["free"], counts["occupied"])
+                                for gate_id, types in self.board.snapshot().items()
+                                for spot_type, counts in types.items()})
+            return subscription
+        finally:
+            for lock in locks:
+                lock.release()
+
+
+    def get_spot(self, spot_id) -> ParkingSpot | None:
+        number = self.number_by_id.get(spot_id)
+        return self.spots[number] if number is not None else None
+
+
+    def __len__(self):
+        return len(self.spots)
@@ -0,0 +1,218 @@
+"""
+Ticket repository: every ticket ever issued, kept as columns instead of one ParkingTicket object each.
+
+A ticket is a row number (its integer ticket_id). Per row:
+    spot        array("I")  code of (lot_id, spot_id), the pairs are interned once in spot_keys
+    gate        array("I")  code of the entry gate, interned in gate_ids
+    spot_type   array("B")  code of the spot type, interned in spot_types
+    entry       array("d")  epoch seconds
+    exit        array("d")  epoch seconds, -1 while the ticket is open
+    amount      array("d")
+    paid        bytearray
+34 bytes of columns and 4 of entry index per ticket, plus a fixed cost per spot for interning and the
+open indexes; a ParkingTicket object takes ~285 bytes (python3 -m ParkingLot.benchmark_7 tickets).
+
+Indexes:
+    open_by_spot    (lot_id, spot_id) code -> ticket_id of the car parked there
+    open_by_gate    gate code -> set of open ticket_ids that entered there
+    buckets         entry // bucket_seconds -> array of ticket_ids, bucket_keys kept sorted
+tickets_entered_between(start, end) bisects bucket_keys and reads only the buckets overlapping
+[start, end); entry times are compared only in the two edge buckets.
+
+Writes take self.lock, so terminals of one lot can share a repository.
+
+After a restart the repository is empty; restore() puts back the open tickets a LotJournal recovered under
+their own ids. The rows of tickets closed before the restart are not journaled and stay blank (MISSING),
+new tickets are numbered after all of them.
+"""
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime
+import threading
+
+from ParkingLot.parking_spot_1 import ParkingSpot
+from ParkingLot.parking_ticket_3 import ParkingTicket
+
+OPEN = -1.0 # exit time of a ticket that has not left yet
+MISSING = -2.0 # exit time of a blank row, a ticket closed before a restart
+
+
+class TicketRepository:
+    def __init__(self, bucket_seconds: int = 3600):
+        self.bucket_seconds = bucket_seconds
+        # Interned values, code -> value and value -> code
+        self.spot_keys, self.spot_codes = [], {} # (lot_id, spot_id)
+        self.gate_ids, self.gate_codes = [], {}
+        self.spot_types, self.spot_type_codes = [], {}
+        # Columns, one entry per ticket_id
+        self.spot = array("I")
+        self.gate = array("I")
+        self.spot_type = array("B")
+        self.entry = array("d")
+        self.exit = array("d")
+        self.amount = array("d")
+        self.paid = bytearray()
+        # Indexes
+        self.open_by_spot = {} # spot code -> ticket_id
+        self.open_by_gate = {} # gate code -> set of ticket_ids
+        self.buckets = {} # entry bucket -> array of ticket_ids
+        self.bucket_keys = [] # sorted bucket numbers
+        self.lock = threading.Lock()
+
+
+    @staticmethod
+    def _intern(values: list, codes: dict, value) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+
+    def open_ticket(self, spot_id, spot_type, gate_id, lot_id=None, entry_time: float | None = None) -> int:
+        # entry_time in epoch seconds, now by default. Returns the new ticket_id.
+        if entry_time is None:
+            entry_time = datetime.now().timestamp()
+        with self.lock:
+            spot_code = self._intern(self.spot_keys, self.spot_codes, (lot_id, spot_id))
+            if spot_code in self.open_by_spot:
+                raise Exception(f"Spot {spot_id} already has open ticket {self.open_by_spot[spot_code]}")
+            return self._append(spot_code, spot_type, gate_id, entry_time)
+
+
+    def _append(self, spot_code: int, spot_type, gate_id, entry_time: float) -> int:
+        # A new open row, under self.lock
+        gate_code = self._intern(self.gate_ids, self.gate_codes, gate_id)
+        ticket_id = len(self.entry)
+        self.spot.append(spot_code)
+        self.gate.append(gate_code)
+        self.spot_type.append(self._intern(self.spot_types, self.spot_type_codes, spot_type))
+        self.entry.append(entry_time)
+        self.exit.append(OPEN)
+        self.amount.append(0.0)
+        self.paid.append(0)
+
+        self.open_by_spot[spot_code] = ticket_id
+        self.open_by_gate.setdefault(gate_code, set()).add(ticket_id)
+        bucket_key = int(entry_time // self.bucket_seconds)
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self.buckets[bucket_key] = array("I")
+            insort(self.bucket_keys, bucket_key) # tickets come in time order, so this is an append
+        bucket.append(ticket_id)
+        return ticket_id
+
+
+    def issue(self, spot: ParkingSpot, gate_id, lot_id=None, issue_time: datetime | None = None) -> ParkingTicket:
+        # What EntryTerminal uses: stores the ticket and returns it with its integer ticket_id
+        ticket = ParkingTicket(spot, gate_id, lot_id, issue_time)
+        ticket.ticket_id = self.open_ticket(spot.spot_id, spot.get_type(), gate_id, lot_id,
+                                            ticket.issue_time.timestamp())
+        return ticket
+
+
+    def restore(self, tickets: dict, next_ticket_id: int):
+        # Into an empty repository after a restart: tickets is LotJournal.recovered_tickets (ticket_id ->
+        # ParkingTicket) and next_ticket_id LotJournal.next_ticket_id. Each integer ticket gets its row back,
+        # the rows in between are blank and the next ticket issued is next_ticket_id.
+        with self.lock:
+            if len(self.entry):
+                raise Exception(f"Tickets can only be restored into an empty repository, this one has {len(self.entry)}")
+            for ticket_id in sorted(ticket_id for ticket_id in tickets if isinstance(ticket_id, int)):
+                ticket = tickets[ticket_id]
+                self._pad(ticket_id - len(self.entry))
+                spot_code = self._intern(self.spot_keys, self.spot_codes, (ticket.lot_id, ticket.parking_spot_id))
+                self._append(spot_code, ticket.parking_spot_type, ticket.gate_id, ticket.issue_time.timestamp())
+            self._pad(next_ticket_id - len(self.entry))
+
+
+    def _pad(self, count: int):
+        # count blank rows, under self.lock
+        if count <= 0:
+            return
+        for column in (self.spot, self.gate, self.spot_type, self.entry, self.amount):
+            column.frombytes(bytes(count * column.itemsize))
+        self.exit.extend(array("d", [MISSING]) * count)
+        self.paid.extend(bytes(count))
+
+
+    def _check(self, ticket_id: int):
+        if not 0 <= ticket_id < len(self.entry):
+            raise Exception(f"No ticket found for id: {ticket_id}")
+        if self.exit[ticket_id] == MISSING:
+            raise Exception(f"Ticket {ticket_id} was closed before the restart, it is not journaled")
+
+
+    def close_ticket(self, ticket_id: int, exit_time: float | None = None, amount: float | None = None):
+        # Marks the car as gone (exit_time in epoch seconds, now by default) and paid when amount is given
+        if exit_time is None:
+            exit_time = datetime.now().timestamp()
+        with self.lock:
+            self._check(ticket_id)
+            if self.exit[ticket_id] == OPEN:
+                self.exit[ticket_id] = exit_time
+                del self.open_by_spot[self.spot[ticket_id]]
+                self.open_by_gate[self.gate[ticket_id]].discard(ticket_id)
+            if amount is not None:
+                self.amount[ticket_id] = amount
+                self.paid[ticket_id] = 1
+
+
+    def get(self, ticket_id: int) -> ParkingTicket:
+        # A ParkingTicket rebuilt from the columns, changing it does not change the repository
+        self._check(ticket_id)
+        lot_id, spot_id = self.spot_keys[self.spot[ticket_id]]
+        ticket = ParkingTicket.__new__(ParkingTicket)
+        ticket.ticket_id = ticket_id
+        ticket.lot_id = lot_id
+        ticket.parking_spot_id = spot_id
+        ticket.parking_spot_type = self.spot_types[self.spot_type[ticket_id]]
+        ticket.gate_id = self.gate_ids[self.gate[ticket_id]]
+        ticket.issue_time = datetime.fromtimestamp(self.entry[ticket_id])
+        exit_time = self.exit[ticket_id]
+        ticket.exit_time = None if exit_time == OPEN else datetime.fromtimestamp(exit_time)
+        ticket.paid = bool(self.paid[ticket_id])
+        ticket.amount = self.amount[ticket_id]
+        return ticket
+
+
+    def open_ticket_for_spot(self, spot_id, lot_id=None) -> int | None:
+        # O(1)
+        spot_code = self.spot_codes.get((lot_id, spot_id))
+        return self.open_by_spot.get(spot_code) if spot_code is not None else None
+
+
+    def open_tickets_at_gate(self, gate_id) -> list[int]:
+        # O(open tickets of that gate)
+        gate_code = self.gate_codes.get(gate_id)
+        with self.lock:
+            return sorted(self.open_by_gate.get(gate_code, ()))
+
+
+    def tickets_entered_between(self, start: float, end: float, gate_id=None) -> list[int]:
+        # Ticket ids with start <= entry < end (epoch seconds), optionally only those of one gate.
+        # Reads the buckets overlapping the range, never the whole table.
+        gate_code = None
+        if gate_id is not None:
+            gate_code = self.gate_codes.get(gate_id)
+            if gate_code is None:
+                return []
+        first, last = int(start // self.bucket_seconds), int(end // self.bucket_seconds)
+        entry, gate = self.entry, self.gate
+        ticket_ids = []
+        with self.lock:
+            keys = self.bucket_keys[bisect_left(self.bucket_keys, first):bisect_left(self.bucket_keys, last + 1)]
+            for key in keys:
+                bucket = self.buckets[key]
+                if first < key < last and gate_code is None:
+                    ticket_ids.extend(bucket) # bucket lies inside the range
+                elif first < key < last:
+                    ticket_ids.extend(t for t in bucket if gate[t] == gate_code)
+                else:
+                    ticket_ids.extend(t for t in bucket if start <= entry[t] < end
+                                      and (gate_code is None or gate[t] == gate_code))
+        return ticket_ids
+
+
+    def __len__(self):
+        return len(self.entry)